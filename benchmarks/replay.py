@@ -0,0 +1,430 @@
+"""
+Replay a recorded video through the detection pipeline and score it
+
+    python -m benchmarks.replay carPark.mp4 --annotations carPark.json
+    python -m benchmarks.replay carPark.mp4 --annotations carPark.json --threshold 0.1 --output run.json
+    python -m benchmarks.replay carPark.mp4 --record carPark.json --record-every 30
+
+Frames are read as fast as they decode (no real-time pacing) and go
+through the same preprocessing, occupancy scoring and line counting as
+the detection tab. Occupancy and line counts are compared with an
+annotation file and reported next to frames/second and the per-stage
+timings, so a speed-up can be checked for accuracy regressions. The
+config directory is only read; a legacy position file is converted in
+memory, not saved.
+
+Annotation file (JSON):
+
+    {
+      "video": "carPark.mp4",
+      "reference_image": "carParkImg.png",
+      "spaces": 69,
+      "frames": [
+        {"frame": 0, "occupied": [0, 3, 4]},
+        {"frame": 240, "count": 3}
+      ]
+    }
+
+"occupied" lists the indices (in layout order) of the spaces taken in
+that frame; all other spaces are free. "count" is the number of vehicles
+that crossed the counting line up to and including that frame. Frames
+are numbered from 0 and only annotated frames are scored. --record
+writes the pipeline's own output in this format, as a starting point
+for hand-correction or as a reference for later runs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from models.parking_manager import ParkingManager
+from utils.detection_postprocess import empty_detections, rescale
+from utils.image_processor import (PreprocessParams, detect_vehicles_traditional,
+                                   preprocess_frame_for_parking_detection, process_ml_detections,
+                                   process_parking_spaces)
+from utils.instrumentation import Instrumentation
+from utils.occupancy import score_parking_spaces
+from utils.resource_manager import load_parking_layout, load_preprocess_params
+
+DEFAULT_REFERENCE_IMAGE = "carParkImg.png"
+ML_INPUT_SIZE = (640, 360)  # Frames are downscaled to this for ML detection, as in the detection tab
+ML_FRAME_SKIP = 8
+
+
+class ReplayParams:
+    """The detection settings that are otherwise tuned live in the GUI"""
+
+    def __init__(self, parking_threshold=ParkingManager.DEFAULT_THRESHOLD, use_space_thresholds=True,
+                 line_height=ParkingManager.DEFAULT_LINE_HEIGHT, offset=ParkingManager.DEFAULT_OFFSET,
+                 min_contour_width=ParkingManager.MIN_CONTOUR_SIZE,
+                 min_contour_height=ParkingManager.MIN_CONTOUR_SIZE, ml_frame_skip=ML_FRAME_SKIP, preprocess=None):
+        self.parking_threshold = parking_threshold  # Fill ratio, 0-1
+        self.use_space_thresholds = use_space_thresholds
+        self.line_height = line_height
+        self.offset = offset
+        self.min_contour_width = min_contour_width
+        self.min_contour_height = min_contour_height
+        self.ml_frame_skip = ml_frame_skip
+        self.preprocess = preprocess or PreprocessParams()
+
+    def as_dict(self):
+        values = dict(vars(self))
+        values["preprocess"] = self.preprocess.as_dict()
+        return values
+
+
+class Annotations:
+    """Ground truth occupancy and line counts for some frames of a video"""
+
+    def __init__(self, occupancy=None, counts=None, video=None, reference_image=None, spaces=None):
+        self.occupancy = occupancy or {}  # frame -> indices of the occupied spaces
+        self.counts = counts or {}  # frame -> cumulative line count
+        self.video = video
+        self.reference_image = reference_image
+        self.spaces = spaces
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an annotation file
+
+        Raises:
+            ValueError: If an occupancy entry names a space outside the layout
+        """
+        with open(path) as f:
+            data = json.load(f)
+
+        spaces = data.get("spaces")
+        annotations = cls(video=data.get("video"), reference_image=data.get("reference_image"), spaces=spaces)
+        for entry in data.get("frames", []):
+            frame = int(entry["frame"])
+            if "occupied" in entry:
+                indices = np.asarray(entry["occupied"], dtype=np.int64)
+                if spaces is not None and len(indices) and (indices.min() < 0 or indices.max() >= spaces):
+                    raise ValueError(f"Frame {frame} marks a space outside 0..{spaces - 1} as occupied")
+                annotations.occupancy[frame] = indices
+            if "count" in entry:
+                annotations.counts[frame] = int(entry["count"])
+        return annotations
+
+    def occupied_mask(self, frame, num_spaces):
+        """(num_spaces,) bool ground truth for an annotated frame"""
+        mask = np.zeros(num_spaces, dtype=bool)
+        indices = self.occupancy[frame]
+        mask[indices[indices < num_spaces]] = True
+        return mask
+
+    def save(self, path):
+        frames = sorted(set(self.occupancy) | set(self.counts))
+        entries = []
+        for frame in frames:
+            entry = {"frame": frame}
+            if frame in self.occupancy:
+                entry["occupied"] = [int(i) for i in self.occupancy[frame]]
+            if frame in self.counts:
+                entry["count"] = self.counts[frame]
+            entries.append(entry)
+
+        data = {"video": self.video, "reference_image": self.reference_image, "spaces": self.spaces,
+                "frames": entries}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+
+
+class OccupancyScore:
+    """Per-space confusion counts over the annotated frames"""
+
+    def __init__(self):
+        self.frames = 0
+        self.true_occupied = 0
+        self.false_occupied = 0
+        self.true_free = 0
+        self.false_free = 0
+        self.free_count_error = 0
+
+    def update(self, predicted, truth):
+        self.frames += 1
+        self.true_occupied += int(np.count_nonzero(predicted & truth))
+        self.false_occupied += int(np.count_nonzero(predicted & ~truth))
+        self.true_free += int(np.count_nonzero(~predicted & ~truth))
+        self.false_free += int(np.count_nonzero(~predicted & truth))
+        self.free_count_error += abs(int(np.count_nonzero(~predicted)) - int(np.count_nonzero(~truth)))
+
+    def metrics(self):
+        checks = self.true_occupied + self.false_occupied + self.true_free + self.false_free
+        predicted_occupied = self.true_occupied + self.false_occupied
+        occupied = self.true_occupied + self.false_free
+        precision = self.true_occupied / predicted_occupied if predicted_occupied else 0.0
+        recall = self.true_occupied / occupied if occupied else 0.0
+        return {
+            "frames": self.frames,
+            "space_checks": checks,
+            "accuracy": (self.true_occupied + self.true_free) / checks if checks else 0.0,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "false_occupied": self.false_occupied,
+            "false_free": self.false_free,
+            "free_count_mae": self.free_count_error / self.frames if self.frames else 0.0,
+        }
+
+
+class CountScore:
+    """Line count error at the annotated frames"""
+
+    def __init__(self):
+        self.errors = []
+        self.final = None  # (predicted, expected) at the last annotated frame
+
+    def update(self, predicted, expected):
+        self.errors.append(predicted - expected)
+        self.final = (predicted, expected)
+
+    def metrics(self):
+        errors = np.abs(self.errors)
+        return {
+            "checkpoints": len(self.errors),
+            "mae": float(errors.mean()) if len(errors) else 0.0,
+            "max_error": int(errors.max()) if len(errors) else 0,
+            "final_count": self.final[0] if self.final else None,
+            "expected_count": self.final[1] if self.final else None,
+        }
+
+
+def scale_positions(positions, reference_dimensions, frame_size):
+    """Scale (x, y, w, h) positions from the reference image size to the frame size, as the app does"""
+    if not reference_dimensions or tuple(reference_dimensions) == tuple(frame_size):
+        return [tuple(int(v) for v in position) for position in positions]
+    width_scale = frame_size[0] / reference_dimensions[0]
+    height_scale = frame_size[1] / reference_dimensions[1]
+    return [(int(x * width_scale), int(y * height_scale), int(w * width_scale), int(h * height_scale))
+            for x, y, w, h in positions]
+
+
+def replay(video_path, annotations=None, params=None, layout=None, detector=None, max_frames=0,
+           record_every=0):
+    """
+    Run the pipeline over every frame of a video
+
+    Args:
+        video_path: Video file to read
+        annotations: Annotations to score against, or None to only time (and record)
+        params: ReplayParams, defaults to the GUI defaults
+        layout: ParkingLayout for occupancy; without one only line counting runs
+        detector: Object with detect_vehicles(frame) for ML counting; motion-based counting otherwise
+        max_frames: Stop after this many frames (0 = whole video)
+        record_every: Also record the pipeline's output every this many frames (0 = off)
+
+    Returns:
+        Result dictionary with throughput, accuracy metrics and stage timings;
+        under "recorded" the Annotations recorded if record_every was set
+    """
+    params = params or ReplayParams()
+    annotations = annotations or Annotations()
+    metrics = Instrumentation()
+    occupancy_score = OccupancyScore()
+    count_score = CountScore()
+    recorded = Annotations(video=os.path.basename(video_path), spaces=len(layout) if layout is not None else None)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {video_path}")
+
+    score_occupancy = layout is not None and len(layout) > 0
+    score_counts = bool(annotations.counts) or record_every > 0 or not score_occupancy
+    space_thresholds = None
+    if score_occupancy and params.use_space_thresholds and layout.has_thresholds():
+        space_thresholds = layout.thresholds
+
+    positions = None
+    prev_frame = None
+    matches = []
+    vehicle_count = 0
+    last_detections = empty_detections()
+    frame_index = 0
+    started = time.perf_counter()
+    try:
+        while not max_frames or frame_index < max_frames:
+            frame_started = time.perf_counter()
+            with metrics.stage("capture"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            height, width = frame.shape[:2]
+            record = record_every and frame_index % record_every == 0
+
+            if score_occupancy:
+                if positions is None:
+                    positions = scale_positions(layout.positions.tolist(), layout.reference_dimensions,
+                                                (width, height))
+                with metrics.stage("preprocess"):
+                    img_pro = preprocess_frame_for_parking_detection(frame, params.preprocess)
+                with metrics.stage("occupancy"):
+                    scores = score_parking_spaces(img_pro, positions, params.parking_threshold, space_thresholds)
+                with metrics.stage("annotate"):
+                    process_parking_spaces(img_pro, frame.copy(), positions, params.parking_threshold,
+                                           scores=scores)
+
+                occupied = scores[0]
+                if frame_index in annotations.occupancy:
+                    occupancy_score.update(occupied, annotations.occupied_mask(frame_index, len(positions)))
+                if record:
+                    recorded.occupancy[frame_index] = np.flatnonzero(occupied)
+
+            if score_counts:
+                # The first frame only primes the frame difference, as in the detection tab
+                if prev_frame is not None:
+                    if detector is not None:
+                        if (frame_index + 1) % params.ml_frame_skip == 0:
+                            with metrics.stage("detection"):
+                                small = cv2.resize(frame, ML_INPUT_SIZE)
+                                last_detections = rescale(detector.detect_vehicles(small),
+                                                          width / ML_INPUT_SIZE[0], height / ML_INPUT_SIZE[1])
+                        with metrics.stage("annotate"):
+                            _, matches, vehicle_count = process_ml_detections(
+                                frame, last_detections, params.line_height, params.offset, matches,
+                                vehicle_count, getattr(detector, 'classes', []))
+                    else:
+                        with metrics.stage("detection"):
+                            _, matches, vehicle_count = detect_vehicles_traditional(
+                                frame, prev_frame, params.line_height, params.min_contour_width,
+                                params.min_contour_height, params.offset, matches, vehicle_count)
+                prev_frame = frame
+
+                if frame_index in annotations.counts:
+                    count_score.update(vehicle_count, annotations.counts[frame_index])
+                if record:
+                    recorded.counts[frame_index] = vehicle_count
+
+            metrics.frame_done(time.perf_counter() - frame_started)
+            frame_index += 1
+    finally:
+        cap.release()
+
+    seconds = time.perf_counter() - started
+    result = {
+        "video": video_path,
+        "frames": frame_index,
+        "seconds": seconds,
+        "fps": frame_index / seconds if seconds > 0 else 0.0,
+        "params": params.as_dict(),
+        "detector": getattr(detector, 'model_type', None) if detector is not None else "motion",
+        "stages": metrics.snapshot()["stages"],
+    }
+    if occupancy_score.frames:
+        result["occupancy"] = occupancy_score.metrics()
+    if count_score.errors:
+        result["counting"] = count_score.metrics()
+    if record_every:
+        result["recorded"] = recorded
+    result["summary"] = metrics.summary("Stage timings (ms)")
+    return result
+
+
+def format_report(result):
+    lines = [f"Replay of {result['video']}: {result['frames']} frames in {result['seconds']:.2f} s "
+             f"({result['fps']:.1f} FPS)"]
+    occupancy = result.get("occupancy")
+    if occupancy:
+        lines.append(f"Occupancy: {occupancy['frames']} frames, {occupancy['space_checks']} space checks, "
+                     f"accuracy {occupancy['accuracy']:.1%}, precision {occupancy['precision']:.1%}, "
+                     f"recall {occupancy['recall']:.1%}, F1 {occupancy['f1']:.1%}, "
+                     f"free count MAE {occupancy['free_count_mae']:.2f}")
+    counting = result.get("counting")
+    if counting:
+        lines.append(f"Counting ({result['detector']}): {counting['checkpoints']} checkpoints, "
+                     f"final {counting['final_count']} vs {counting['expected_count']} expected, "
+                     f"MAE {counting['mae']:.2f}, max error {counting['max_error']}")
+    if not occupancy and not counting:
+        lines.append("No annotated frames were scored")
+    lines.append(result["summary"])
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    defaults = ReplayParams()
+    parser = argparse.ArgumentParser(description="Replay a video through the pipeline and score it")
+    parser.add_argument("video", help="Recorded video to replay")
+    parser.add_argument("--annotations", help="Ground truth annotation file (JSON)")
+    parser.add_argument("--config-dir", default="config", help="Directory holding the parking layouts")
+    parser.add_argument("--reference-image", help="Layout to use (default: from the annotations, else "
+                                                  f"{DEFAULT_REFERENCE_IMAGE})")
+    parser.add_argument("--no-layout", action="store_true", help="Skip occupancy; only count vehicles")
+    parser.add_argument("--threshold", type=float, default=defaults.parking_threshold,
+                        help="Global fill ratio threshold (0-1)")
+    parser.add_argument("--no-space-thresholds", action="store_true",
+                        help="Ignore the per-space thresholds saved with the layout")
+    parser.add_argument("--line-height", type=int, default=defaults.line_height)
+    parser.add_argument("--offset", type=int, default=defaults.offset)
+    parser.add_argument("--min-contour-width", type=int, default=defaults.min_contour_width)
+    parser.add_argument("--min-contour-height", type=int, default=defaults.min_contour_height)
+    parser.add_argument("--backend", help="Count with this ML detection backend instead of frame differencing")
+    parser.add_argument("--confidence", type=float, default=ParkingManager.DEFAULT_CONFIDENCE)
+    parser.add_argument("--max-frames", type=int, default=0)
+    parser.add_argument("--output", help="Write the result as JSON")
+    parser.add_argument("--record", help="Write the pipeline's output as an annotation file")
+    parser.add_argument("--record-every", type=int, default=30, help="Frames between recorded entries")
+    parser.add_argument("--min-accuracy", type=float,
+                        help="Exit with 1 if occupancy accuracy is below this (0-1)")
+    parser.add_argument("--max-count-error", type=int,
+                        help="Exit with 1 if the final line count is off by more than this")
+    args = parser.parse_args(argv)
+
+    annotations = Annotations.load(args.annotations) if args.annotations else None
+
+    layout = None
+    reference_image = None
+    if not args.no_layout:
+        reference_image = (args.reference_image or (annotations and annotations.reference_image)
+                           or DEFAULT_REFERENCE_IMAGE)
+        layout = load_parking_layout(args.config_dir, reference_image, persist=False)
+        if layout is None:
+            print(f"No parking layout for {reference_image}; only counting vehicles")
+        elif annotations and annotations.spaces is not None and annotations.spaces != len(layout):
+            print(f"Annotations are for {annotations.spaces} spaces but the layout has {len(layout)}")
+            return 1
+
+    detector = None
+    if args.backend:
+        from models.vehicle_detector import VehicleDetector
+
+        detector = VehicleDetector(confidence_threshold=args.confidence, backend=args.backend)
+        if detector.model is None:
+            print("No detection backend could be loaded")
+            return 1
+
+    params = ReplayParams(args.threshold, not args.no_space_thresholds, args.line_height, args.offset,
+                          args.min_contour_width, args.min_contour_height,
+                          preprocess=load_preprocess_params(args.config_dir))
+    result = replay(args.video, annotations, params, layout, detector, args.max_frames,
+                    args.record_every if args.record else 0)
+    print(format_report(result))
+
+    if args.record:
+        recorded = result.pop("recorded")
+        recorded.reference_image = reference_image if layout is not None else None
+        recorded.save(args.record)
+        print(f"Recorded {len(recorded.occupancy) or len(recorded.counts)} frames to {args.record}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({key: value for key, value in result.items() if key != "summary"}, f, indent=2)
+
+    occupancy = result.get("occupancy")
+    if args.min_accuracy is not None and (not occupancy or occupancy["accuracy"] < args.min_accuracy):
+        print(f"Occupancy accuracy below {args.min_accuracy:.1%}")
+        return 1
+    counting = result.get("counting")
+    if args.max_count_error is not None and (
+            not counting or abs(counting["final_count"] - counting["expected_count"]) > args.max_count_error):
+        print(f"Final line count off by more than {args.max_count_error}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Benchmarks for the vision and allocation hot paths
+
+    python -m benchmarks.suite                       # run everything
+    python -m benchmarks.suite --only allocate_parking --sizes 1000 5000
+    python -m benchmarks.suite --save-baseline       # record this machine's baseline
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+Each benchmark runs on synthetic inputs (see benchmarks.synthetic) at
+several sizes. A case is timed like timeit: calls are batched until a
+batch takes at least --min-time, and the per-call time of --repeat
+batches is reported. Peak Python/NumPy allocation of one call is
+measured separately with tracemalloc; OpenCV's own buffers are not
+visible to it, so the process peak RSS is recorded as well.
+
+Results are written as JSON to benchmarks/results/. When a baseline is
+given, cases whose median time (or peak allocation) grew by more than
+--tolerance are reported and the exit code is 1. Baselines only compare
+meaningfully on the machine and thread settings they were recorded with.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import (FRAME_SIZES, LAYOUT_SIZES, synthetic_detections, synthetic_layout,
+                                  synthetic_lot_frame, synthetic_occupancy, synthetic_spaces_data,
+                                  synthetic_traffic_frames)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+DETECTION_COUNTS = (10, 50, 200)
+
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.2  # Seconds per timed batch
+DEFAULT_MAX_CASE_SECONDS = 30.0
+DEFAULT_TOLERANCE = 0.25
+MIN_MEMORY_REGRESSION = 1 << 20  # Ignore allocation growth below 1 MiB
+
+BENCHMARKS = {}
+
+
+class Benchmark:
+    """A function under test and how to build its input at each size"""
+
+    def __init__(self, name, setup, sizes, unit):
+        self.name = name
+        self.setup = setup  # setup(size, workdir) -> (zero-argument callable, items per call)
+        self.sizes = sizes
+        self.unit = unit
+
+
+def benchmark(name, sizes, unit):
+    """Register a setup function as a benchmark"""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, sizes, unit)
+        return setup
+    return register
+
+
+def _lot(size):
+    layout = synthetic_layout(size)
+    occupied = synthetic_occupancy(size)
+    return layout, occupied, synthetic_lot_frame(layout, occupied)
+
+
+@benchmark("preprocess_frame_for_parking_detection", FRAME_SIZES, "pixels")
+def _preprocess(size, workdir):
+    from utils.image_processor import preprocess_frame_for_parking_detection
+
+    width, height = FRAME_SIZES[size]
+    frame = synthetic_traffic_frames(width, height, count=1)[0]
+    return (lambda: preprocess_frame_for_parking_detection(frame)), width * height
+
+
+@benchmark("process_parking_spaces", LAYOUT_SIZES, "spaces")
+def _process_parking_spaces(size, workdir):
+    from utils.image_processor import preprocess_frame_for_parking_detection, process_parking_spaces
+
+    layout, occupied, frame = _lot(size)
+    img_pro = preprocess_frame_for_parking_detection(frame)
+    # Drawing is in place; redrawing the same frame costs the same every call
+    display = frame.copy()
+    return (lambda: process_parking_spaces(img_pro, display, layout.positions, 0.2)), size
+
+
+@benchmark("detect_vehicles_traditional", FRAME_SIZES, "pixels")
+def _detect_vehicles_traditional(size, workdir):
+    from utils.image_processor import detect_vehicles_traditional
+
+    width, height = FRAME_SIZES[size]
+    prev_frame, frame = synthetic_traffic_frames(width, height, count=2)
+    line_height = height // 2
+    return (lambda: detect_vehicles_traditional(frame, prev_frame, line_height, 40, 40, 10, [], 0)), width * height
+
+
+@benchmark("process_ml_detections", DETECTION_COUNTS, "detections")
+def _process_ml_detections(size, workdir):
+    from models.detector_backends import COCO_CLASSES
+    from utils.image_processor import process_ml_detections
+
+    width, height = FRAME_SIZES["720p"]
+    frame = synthetic_traffic_frames(width, height, count=1)[0]
+    detections = synthetic_detections(size, width, height)
+    return (lambda: process_ml_detections(frame, detections, height // 2, 10, [], 0, COCO_CLASSES)), size
+
+
+@benchmark("DeepSORTTracker.update", DETECTION_COUNTS, "detections")
+def _deepsort_update(size, workdir):
+    from models.deep_sort_tracker import DeepSORTTracker
+
+    width, height = FRAME_SIZES["720p"]
+    frame = synthetic_traffic_frames(width, height, count=1)[0]
+    detections = synthetic_detections(size, width, height)
+    tracker = DeepSORTTracker()
+
+    def update():
+        tracker.update(frame, detections)
+        tracker.track_history.clear()  # Keep the history from growing across calls
+
+    return update, size
+
+
+@benchmark("ParkingAllocationEngine.allocate_parking", LAYOUT_SIZES, "spaces")
+def _allocate_parking(size, workdir):
+    from models.allocation_engine import ParkingAllocationEngine
+
+    layout = synthetic_layout(size)
+    spaces = synthetic_spaces_data(layout, synthetic_occupancy(size))
+    engine = ParkingAllocationEngine(config_dir=workdir)
+    engine.initialize_parking_spaces(spaces)
+
+    def allocate():
+        engine.allocate_parking(spaces, vehicle_size=2)
+        engine.allocation_history.clear()
+
+    return allocate, size
+
+
+@benchmark("ParkingVisualizer.mark_parking_spaces", LAYOUT_SIZES, "spaces")
+def _mark_parking_spaces(size, workdir):
+    from models.parking_visualizer import ParkingVisualizer
+
+    layout, occupied, frame = _lot(size)
+    visualizer = ParkingVisualizer(config_dir=workdir, logs_dir=os.path.join(workdir, "logs"))
+    visualizer.initialize_parking_spaces(layout.positions)
+    visualizer.update_parking_status(list(visualizer.parking_data), [bool(o) for o in occupied])
+    display = frame.copy()
+    return (lambda: visualizer.mark_parking_spaces(display)), size
+
+
+def measure(func, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, max_seconds=DEFAULT_MAX_CASE_SECONDS):
+    """
+    Time func like timeit.autorange
+
+    Returns:
+        (per-call times of each batch, calls per batch)
+    """
+    # Calibrate the batch size; this also warms up caches and lazy imports
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - started) / loops)
+        if time.perf_counter() > deadline:
+            break  # Slow cases get fewer batches rather than stalling the suite
+    return times, loops
+
+
+def peak_allocation(func):
+    """Peak bytes allocated through Python's allocators during one call"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(bench, size, workdir, repeat, min_time, max_seconds):
+    func, items = bench.setup(size, workdir)
+    times, loops = measure(func, repeat, min_time, max_seconds)
+    median = statistics.median(times)
+    return {
+        "benchmark": bench.name,
+        "size": str(size),
+        "unit": bench.unit,
+        "items": items,
+        "calls": loops * len(times),
+        "min_s": min(times),
+        "median_s": median,
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "calls_per_s": 1.0 / median if median else None,
+        "items_per_s": items / median if median else None,
+        "peak_alloc_bytes": peak_allocation(func),
+    }
+
+
+def case_key(result):
+    return f"{result['benchmark']}[{result['size']}]"
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def run_suite(only=None, sizes=None, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME,
+              max_seconds=DEFAULT_MAX_CASE_SECONDS, log=print):
+    """
+    Run the selected benchmarks
+
+    Args:
+        only: Substrings of benchmark names to run, or None for all
+        sizes: Size labels to run (e.g. "1000", "720p"), or None for all
+
+    Returns:
+        Result document with environment, settings and per-case results
+    """
+    workdir = tempfile.mkdtemp(prefix="parking-bench-")
+    results = []
+    try:
+        for bench in BENCHMARKS.values():
+            if only and not any(pattern in bench.name for pattern in only):
+                continue
+            for size in bench.sizes:
+                if sizes and str(size) not in sizes:
+                    continue
+                try:
+                    result = run_case(bench, size, workdir, repeat, min_time, max_seconds)
+                except Exception as e:
+                    log(f"{bench.name}[{size}]: failed: {str(e)}")
+                    continue
+                results.append(result)
+                log(f"{case_key(result):<50} {result['median_s'] * 1000:>10.3f} ms "
+                    f"{result['items_per_s']:>14,.0f} {bench.unit}/s "
+                    f"{result['peak_alloc_bytes'] / (1 << 20):>8.1f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {"repeat": repeat, "min_time": min_time, "max_case_seconds": max_seconds},
+        "peak_rss_bytes": peak_rss(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Cases that got slower or allocate more than the baseline allows
+
+    Returns:
+        List of (case, metric, baseline value, current value, ratio)
+    """
+    previous = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+
+        ratio = result["median_s"] / old["median_s"] if old["median_s"] else 1.0
+        if ratio > 1.0 + tolerance:
+            regressions.append((case_key(result), "median_s", old["median_s"], result["median_s"], ratio))
+
+        old_peak, peak = old.get("peak_alloc_bytes", 0), result["peak_alloc_bytes"]
+        if old_peak and peak > old_peak * (1.0 + tolerance) and peak - old_peak > MIN_MEMORY_REGRESSION:
+            regressions.append((case_key(result), "peak_alloc_bytes", old_peak, peak, peak / old_peak))
+    return regressions
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vision and allocation hot paths")
+    parser.add_argument("--only", nargs="+", help="Run benchmarks whose name contains any of these")
+    parser.add_argument("--sizes", nargs="+", help="Run only these sizes (e.g. 1000 5000 720p)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed batches per case")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME,
+                        help="Minimum seconds per timed batch")
+    parser.add_argument("--max-case-seconds", type=float, default=DEFAULT_MAX_CASE_SECONDS,
+                        help="Stop adding batches to a case after this long")
+    parser.add_argument("--threads", type=int, help="OpenCV thread count (default: OpenCV's choice)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Compare against this result file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"Also write the results to {os.path.relpath(BASELINE_FILE)}")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for bench in BENCHMARKS.values():
+            print(f"{bench.name}: {', '.join(str(size) for size in bench.sizes)}")
+        return 0
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    report = run_suite(args.only, args.sizes, args.repeat, args.min_time, args.max_case_seconds)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    write_json(output, report)
+    print(f"Results written to {output}")
+    if args.save_baseline:
+        write_json(BASELINE_FILE, report)
+        print(f"Baseline written to {BASELINE_FILE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for case, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {case} {metric}: {old:.6g} -> {new:.6g} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
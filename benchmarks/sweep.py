@@ -0,0 +1,290 @@
+"""
+Parameter sweep over the parking preprocessing and occupancy threshold
+
+    python -m benchmarks.sweep carPark.mp4 --annotations carPark.json \\
+        --block-size 15 25 35 --c 8 12 16 --median-size 0 3 5 --dilate 0 1 2 \\
+        --thresholds 0.05 0.08 0.11 --output sweep.json
+
+The video is decoded once. The annotated frames are copied into shared
+memory, and every combination of preprocessing settings is evaluated by
+a pool of worker processes that read those frames zero-copy. Fill ratios
+do not depend on the occupancy threshold, so each preprocessing
+combination is timed once and then scored at every threshold.
+
+Workers run OpenCV single-threaded, so timings compare combinations
+with each other rather than predicting the multi-threaded GUI speed.
+The result is the speed/accuracy Pareto front: the combinations that no
+other combination beats on both ms/frame and the chosen metric. --save
+stores the most accurate preprocessing settings on the front for the
+detection tab; without it the config directory is only read.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from benchmarks.replay import DEFAULT_REFERENCE_IMAGE, Annotations, OccupancyScore, scale_positions
+from utils.image_processor import PreprocessParams, preprocess_frame_for_parking_detection
+from utils.occupancy import positions_to_array, score_parking_spaces
+from utils.resource_manager import load_parking_layout, save_preprocess_params
+from utils.shared_frames import SharedArray
+
+METRICS = ("accuracy", "f1")
+DEFAULT_THRESHOLDS = (0.04, 0.06, 0.08, 0.10, 0.12)
+DEFAULT_REPEAT = 3
+
+# Sweep option -> PreprocessParams field
+GRID_OPTIONS = {
+    "blur_size": "blur-size",
+    "blur_sigma": "blur-sigma",
+    "block_size": "block-size",
+    "c": "c",
+    "median_size": "median-size",
+    "dilate_iterations": "dilate",
+    "erode_iterations": "erode",
+    "kernel_size": "kernel-size",
+}
+
+# Worker process state, set once by _init_worker
+_frames = None
+_positions = None
+_truths = None
+
+
+def _init_worker(frames_spec, positions, truths):
+    global _frames, _positions, _truths
+    cv2.setNumThreads(1)
+    _frames = SharedArray.attach(frames_spec)
+    _positions = positions
+    _truths = truths
+
+
+def evaluate(frames, positions, truths, params, thresholds, repeat=DEFAULT_REPEAT):
+    """
+    Time one preprocessing combination and score it at every threshold
+
+    Args:
+        frames: (F, H, W, 3) annotated frames
+        positions: (N, 4) space positions in frame pixels
+        truths: (F, N) bool ground truth occupancy
+        params: PreprocessParams to evaluate
+        thresholds: Global fill ratio thresholds to score
+        repeat: Timed passes over the frames; the fastest is kept
+
+    Returns:
+        List of result dictionaries, one per threshold
+    """
+    best = None
+    for _ in range(repeat):
+        ratios = []
+        started = time.perf_counter()
+        for frame in frames:
+            img_pro = preprocess_frame_for_parking_detection(frame, params)
+            _, frame_ratios, valid = score_parking_spaces(img_pro, positions)
+            ratios.append(frame_ratios)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    # valid only depends on the positions and frame size, so it is the same for every frame
+    ms_per_frame = best / max(1, len(frames)) * 1000
+    results = []
+    for threshold in thresholds:
+        score = OccupancyScore()
+        for frame_ratios, truth in zip(ratios, truths):
+            score.update((frame_ratios >= threshold) | ~valid, truth)
+        results.append({"preprocess": params.as_dict(), "threshold": threshold,
+                        "ms_per_frame": ms_per_frame, **score.metrics()})
+    return results
+
+
+def _evaluate_task(values, thresholds, repeat):
+    return evaluate(_frames.array, _positions, _truths, PreprocessParams.from_dict(values), thresholds, repeat)
+
+
+def parameter_grid(options):
+    """
+    Every valid PreprocessParams combination of the given values
+
+    Args:
+        options: {PreprocessParams field: list of values}; missing fields keep their defaults
+
+    Returns:
+        (combinations, number of invalid combinations skipped)
+    """
+    names = list(options)
+    combinations = []
+    skipped = 0
+    for values in itertools.product(*(options[name] for name in names)):
+        try:
+            combinations.append(PreprocessParams(**dict(zip(names, values))))
+        except ValueError:
+            skipped += 1
+    return combinations, skipped
+
+
+def pareto_front(results, metric="accuracy"):
+    """Results not beaten on both ms_per_frame and metric by any other, fastest first"""
+    front = []
+    best = -1.0
+    for result in sorted(results, key=lambda r: (r["ms_per_frame"], -r[metric])):
+        if result[metric] > best:
+            front.append(result)
+            best = result[metric]
+    return front
+
+
+def decode_annotated_frames(video_path, frame_indices):
+    """
+    Decode the video once and keep the annotated frames in shared memory
+
+    Returns:
+        (SharedArray of shape (F, H, W, 3), list of the frame indices found)
+    """
+    wanted = set(frame_indices)
+    last = max(wanted)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {video_path}")
+
+    shared = None
+    found = []
+    try:
+        index = 0
+        while index <= last:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index in wanted:
+                if shared is None:
+                    shared = SharedArray.create((len(wanted),) + frame.shape, frame.dtype)
+                shared.array[len(found)] = frame
+                found.append(index)
+            index += 1
+    finally:
+        cap.release()
+
+    if shared is None:
+        raise ValueError(f"None of the annotated frames are in {video_path}")
+    if len(found) < len(wanted):
+        # Keep the shared block, but only the frames that exist are evaluated
+        print(f"Video ended after {index} frames; {len(wanted) - len(found)} annotated frames are missing")
+    return shared, found
+
+
+def run_sweep(video_path, annotations, layout, options, thresholds=DEFAULT_THRESHOLDS, workers=None,
+              repeat=DEFAULT_REPEAT, log=print):
+    """
+    Evaluate every combination in parallel
+
+    Returns:
+        List of result dictionaries (one per combination and threshold)
+    """
+    combinations, skipped = parameter_grid(options)
+    if skipped:
+        log(f"Skipped {skipped} invalid combinations")
+
+    frame_indices = sorted(annotations.occupancy)
+    if not frame_indices:
+        raise ValueError("The annotations have no occupancy frames")
+
+    shared, found = decode_annotated_frames(video_path, frame_indices)
+    try:
+        height, width = shared.shape[1:3]
+        positions = positions_to_array(scale_positions(layout.positions.tolist(), layout.reference_dimensions,
+                                                       (width, height)))
+        truths = np.array([annotations.occupied_mask(frame, len(positions)) for frame in found])
+        frames_spec = (shared.name, (len(found),) + shared.shape[1:], shared.dtype.str)
+
+        log(f"Evaluating {len(combinations)} combinations x {len(thresholds)} thresholds on "
+            f"{len(found)} frames with {workers or os.cpu_count()} workers")
+        results = []
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(frames_spec, positions, truths)) as pool:
+            futures = [pool.submit(_evaluate_task, params.as_dict(), list(thresholds), repeat)
+                       for params in combinations]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    log(f"Error evaluating a combination: {str(e)}")
+                if done % max(1, len(futures) // 10) == 0:
+                    log(f"{done}/{len(futures)} combinations in {time.perf_counter() - started:.1f} s")
+        return results
+    finally:
+        shared.unlink()
+
+
+def format_front(front, metric):
+    lines = [f"Pareto front ({metric} vs ms/frame):",
+             f"{'ms/frame':>9} {metric:>9} {'threshold':>9}  preprocessing"]
+    defaults = PreprocessParams().as_dict()
+    for result in front:
+        changed = {key: value for key, value in result["preprocess"].items() if defaults[key] != value}
+        settings = ", ".join(f"{key}={value}" for key, value in changed.items()) or "defaults"
+        lines.append(f"{result['ms_per_frame']:>9.2f} {result[metric]:>9.1%} {result['threshold']:>9.3f}  {settings}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    defaults = PreprocessParams()
+    parser = argparse.ArgumentParser(description="Sweep preprocessing settings and occupancy thresholds")
+    parser.add_argument("video", help="Recorded video")
+    parser.add_argument("--annotations", required=True, help="Ground truth annotation file (see benchmarks.replay)")
+    parser.add_argument("--config-dir", default="config", help="Directory holding the parking layouts")
+    parser.add_argument("--reference-image", help="Layout to use (default: from the annotations)")
+    grid = parser.add_argument_group("grid (each defaults to the current setting)")
+    for field, option in GRID_OPTIONS.items():
+        kind = float if field == "blur_sigma" else int
+        grid.add_argument(f"--{option}", dest=field, type=kind, nargs="+", default=[getattr(defaults, field)])
+    grid.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS),
+                      help="Global fill ratio thresholds (0-1)")
+    parser.add_argument("--metric", choices=METRICS, default="accuracy", help="Accuracy measure for the front")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed passes per combination")
+    parser.add_argument("--output", help="Write all results and the front as JSON")
+    parser.add_argument("--save", action="store_true",
+                        help="Save the most accurate preprocessing settings on the front to the config directory")
+    args = parser.parse_args(argv)
+
+    annotations = Annotations.load(args.annotations)
+    reference_image = args.reference_image or annotations.reference_image or DEFAULT_REFERENCE_IMAGE
+    layout = load_parking_layout(args.config_dir, reference_image, persist=False)
+    if layout is None or len(layout) == 0:
+        print(f"No parking layout for {reference_image}")
+        return 1
+
+    options = {field: getattr(args, field) for field in GRID_OPTIONS}
+    results = run_sweep(args.video, annotations, layout, options, args.thresholds, args.workers, args.repeat)
+    if not results:
+        print("No combination could be evaluated")
+        return 1
+
+    front = pareto_front(results, args.metric)
+    print(format_front(front, args.metric))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"video": args.video, "annotations": args.annotations, "metric": args.metric,
+                       "grid": options, "thresholds": args.thresholds, "results": results, "front": front},
+                      f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.save:
+        best = front[-1]
+        if save_preprocess_params(PreprocessParams.from_dict(best["preprocess"]), args.config_dir):
+            print(f"Saved preprocessing settings to {args.config_dir}; set the threshold to {best['threshold']:.3f} "
+                  f"in the detection tab")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
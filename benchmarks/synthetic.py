@@ -0,0 +1,162 @@
+"""
+Synthetic inputs for the benchmarks
+
+Everything is generated from a seed, so two runs with the same arguments
+time exactly the same work. Layouts are rows of spaces facing each other
+across aisles, like the lots the app is used on, and frames are drawn
+asphalt with lane markings and car-shaped blobs in the occupied spaces.
+"""
+
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from models.allocation_core import section_from_space_id
+from utils.detection_postprocess import DETECTION_DTYPE
+
+DEFAULT_SEED = 1234
+
+# Frame sizes used for the frame-level benchmarks
+FRAME_SIZES = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+# Layout sizes used for the per-space benchmarks
+LAYOUT_SIZES = (10, 100, 1000, 5000)
+
+SPACE_SIZE = (22, 44)  # Width, height in pixels
+SPACE_GAP = 3
+AISLE_HEIGHT = 24
+MARGIN = 20
+
+ASPHALT = 90
+CAR_COLORS = ((40, 40, 40), (200, 200, 200), (30, 30, 160), (150, 80, 20), (220, 220, 230), (20, 90, 20))
+
+
+class SyntheticLayout:
+    """Space positions plus the frame size they fit in"""
+
+    def __init__(self, positions, width, height):
+        self.positions = positions
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def synthetic_layout(num_spaces, space_size=SPACE_SIZE, gap=SPACE_GAP, aisle=AISLE_HEIGHT):
+    """
+    Double rows of spaces separated by aisles, roughly square overall
+
+    Returns:
+        SyntheticLayout with num_spaces (x, y, w, h) positions
+    """
+    w, h = space_size
+    columns = max(1, int(np.ceil(np.sqrt(num_spaces * h / w))))
+    positions = []
+    for i in range(num_spaces):
+        row, column = divmod(i, columns)
+        aisles = row // 2  # Two rows of spaces share each aisle
+        x = MARGIN + column * (w + gap)
+        y = MARGIN + row * (h + gap) + aisles * aisle
+        positions.append((x, y, w, h))
+
+    rows = (num_spaces + columns - 1) // columns
+    width = MARGIN * 2 + columns * (w + gap)
+    height = MARGIN * 2 + rows * (h + gap) + (rows // 2) * aisle
+    return SyntheticLayout(positions, width, height)
+
+
+def synthetic_occupancy(num_spaces, occupancy=0.5, seed=DEFAULT_SEED):
+    """(N,) bool with about occupancy of the spaces taken"""
+    return np.random.default_rng(seed).random(num_spaces) < occupancy
+
+
+def _asphalt(width, height, rng):
+    noise = rng.normal(ASPHALT, 8, (height, width)).clip(0, 255).astype(np.uint8)
+    return cv2.cvtColor(noise, cv2.COLOR_GRAY2BGR)
+
+
+def _draw_car(img, x, y, w, h, color):
+    inset_x, inset_y = max(2, w // 8), max(2, h // 10)
+    cv2.rectangle(img, (x + inset_x, y + inset_y), (x + w - inset_x, y + h - inset_y), color, -1)
+    # Windscreen, so the blob has some inner edges like a real car
+    cv2.rectangle(img, (x + inset_x + 2, y + h // 4), (x + w - inset_x - 2, y + h // 3),
+                  (60, 60, 70), -1)
+
+
+def synthetic_lot_frame(layout, occupied, seed=DEFAULT_SEED):
+    """BGR frame of the layout with a car in every occupied space"""
+    rng = np.random.default_rng(seed)
+    img = _asphalt(layout.width, layout.height, rng)
+    colors = rng.integers(0, len(CAR_COLORS), len(layout))
+    for i, (x, y, w, h) in enumerate(layout.positions):
+        cv2.rectangle(img, (x, y), (x + w, y + h), (235, 235, 235), 1)  # Lane markings
+        if occupied[i]:
+            _draw_car(img, x, y, w, h, CAR_COLORS[colors[i]])
+    return img
+
+
+def synthetic_traffic_frames(width, height, count=2, vehicles=8, speed=12, seed=DEFAULT_SEED):
+    """
+    Frames of cars driving down a road, for the motion-based counter
+
+    Returns:
+        List of count BGR frames; consecutive frames differ by one step of motion
+    """
+    rng = np.random.default_rng(seed)
+    background = _asphalt(width, height, rng)
+    car_w, car_h = max(20, width // 16), max(36, height // 8)
+    xs = rng.integers(0, max(1, width - car_w), vehicles)
+    ys = rng.integers(0, max(1, height - car_h), vehicles)
+    colors = rng.integers(0, len(CAR_COLORS), vehicles)
+
+    frames = []
+    for step in range(count):
+        frame = background.copy()
+        for x, y, color in zip(xs, ys, colors):
+            y = int((y + step * speed) % max(1, height - car_h))
+            _draw_car(frame, int(x), y, car_w, car_h, CAR_COLORS[color])
+        frames.append(frame)
+    return frames
+
+
+def synthetic_detections(count, width, height, seed=DEFAULT_SEED):
+    """Structured detection array of count car-sized boxes, sorted by score"""
+    rng = np.random.default_rng(seed)
+    detections = np.empty(count, dtype=DETECTION_DTYPE)
+    sizes = rng.integers(30, 120, (count, 2))
+    corners = rng.integers(0, [max(1, width - 120), max(1, height - 120)], (count, 2))
+    detections['box'] = np.hstack([corners, corners + sizes])
+    detections['score'] = np.sort(rng.uniform(0.5, 1.0, count))[::-1]
+    detections['class_id'] = rng.choice([3, 4, 6, 8], count)
+    return detections
+
+
+def synthetic_spaces_data(layout, occupied, seed=DEFAULT_SEED):
+    """
+    Parking data dictionary in the shape ParkingManager builds
+
+    Space IDs follow the "S<n>-<section>" scheme with sections A1, A2, B1
+    and B2 by frame quadrant.
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.now()
+    ages = rng.integers(0, 3600, len(layout))
+    spaces = {}
+    for i, (x, y, w, h) in enumerate(layout.positions):
+        section = ("A" if x < layout.width / 2 else "B") + ("1" if y < layout.height / 2 else "2")
+        space_id = f"S{i + 1}-{section}"
+        spaces[space_id] = {
+            'position': (x, y, w, h),
+            'occupied': bool(occupied[i]),
+            'vehicle_id': f"V{i + 1}" if occupied[i] else None,
+            'last_state_change': now - timedelta(seconds=int(ages[i])),
+            'distance_to_entrance': x + y,
+            'section': section_from_space_id(space_id),
+        }
+    return spaces
@@ -1,10 +1,162 @@
-from tkinter import Tk
-from ui.app import ParkingManagementSystem
-from utils.style_config import apply_styling
-from utils.window_manager import WindowManager
+import argparse
 import os
+import time
+from datetime import datetime
+from tkinter import Tk
+from utils.lazy_import import ImportProfiler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smart Parking Management System")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Report the import cost of every module at startup and on exit")
+
+    detection = parser.add_argument_group("detection")
+    detection.add_argument("--headless", metavar="VIDEO",
+                           help="Run vehicle detection over a video without the UI and print a summary")
+    detection.add_argument("--backend", default="fasterrcnn",
+                           help="Detection backend for headless runs, e.g. fasterrcnn, yolov8, onnx_yolov8")
+    detection.add_argument("--confidence", type=float, default=0.6, help="Detection confidence threshold")
+    detection.add_argument("--max-frames", type=int, default=0, help="Stop a headless run after this many frames")
+    detection.add_argument("--onnx-threads", type=int, default=0,
+                           help="ONNX Runtime intra-op threads (0 = one per physical core)")
+    detection.add_argument("--onnx-optimization", default="all", choices=["disabled", "basic", "extended", "all"],
+                           help="ONNX Runtime graph optimization level")
+    detection.add_argument("--onnx-int8", action="store_true",
+                           help="Use the int8 quantized ONNX models where they have been exported")
+    detection.add_argument("--torch-threads", type=int, default=0,
+                           help="PyTorch intra-op threads (0 = PyTorch's default)")
+    detection.add_argument("--torch-interop-threads", type=int, default=0,
+                           help="PyTorch inter-op threads (0 = PyTorch's default)")
+    detection.add_argument("--detector-process", action="store_true",
+                           help="Run the ML detector in a separate worker process, pipelined with capture")
+
+    ingestion = parser.add_argument_group("ingestion")
+    ingestion.add_argument("--ingest", nargs=argparse.REMAINDER, metavar="ARGS",
+                           help="Ingest camera streams without the UI; the remaining arguments are passed "
+                                "to utils.ingestion (e.g. --ingest north=rtsp://cam1/stream carPark.mp4 --fps 2)")
+
+    monitoring = parser.add_argument_group("monitoring")
+    monitoring.add_argument("--metrics-port", type=int, default=0,
+                            help="Serve Prometheus metrics at http://HOST:PORT/metrics (0 = disabled)")
+    monitoring.add_argument("--metrics-host", default="127.0.0.1",
+                            help="Interface for the metrics endpoint; use 0.0.0.0 to allow remote scrapes")
+    return parser.parse_args()
+
+
+def run_headless(video_path, backend, confidence, max_frames=0, detector_process=False):
+    """Detect vehicles in every frame of a video and print throughput"""
+    import cv2
+    from models.detector_backends import ONNX_BACKENDS
+    from utils.instrumentation import pipeline
+    if detector_process:
+        from models.detector_worker import DetectorWorker as VehicleDetector
+    else:
+        from models.vehicle_detector import VehicleDetector
+
+    # An explicitly chosen ONNX backend must not silently fall back to PyTorch
+    candidates = ONNX_BACKENDS if backend in ONNX_BACKENDS else None
+    detector = VehicleDetector(confidence_threshold=confidence, backend=backend, candidates=candidates)
+    try:
+        if detector.model is None:
+            print("No detection backend could be loaded")
+            return 1
+        if detector.model_type != backend:
+            print(f"Backend {backend} unavailable; using {detector.model_type}")
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Could not open video {video_path}")
+            return 1
+
+        frames = 0
+        vehicles = 0
+        pipeline.reset()
+        started_run = time.perf_counter()
+        try:
+            while not max_frames or frames < max_frames:
+                started = time.perf_counter()
+                with pipeline.stage("capture"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                if detector_process:
+                    # The worker times "detection" itself; the next frame is decoded while it runs
+                    with pipeline.stage("submit"):
+                        detector.submit(frame, wait=True)
+                    for _, detections in detector.poll():
+                        vehicles += len(detections)
+                else:
+                    with pipeline.stage("detection"):
+                        detections = detector.detect_vehicles(frame)
+                    vehicles += len(detections)
+                pipeline.frame_done(time.perf_counter() - started)
+                frames += 1
+            while detector_process and detector.pending:
+                for _, detections in detector.poll(timeout=1.0):
+                    vehicles += len(detections)
+        finally:
+            cap.release()
+        elapsed = time.perf_counter() - started_run
+
+        if frames:
+            detection = pipeline.histogram("detection")
+            print(f"{detector.model_type}: {frames} frames, {vehicles / frames:.1f} vehicles/frame, "
+                  f"{detection.mean * 1000:.1f} ms/frame detection, {frames / max(elapsed, 1e-9):.1f} FPS overall")
+            print(pipeline.summary(f"{detector.model_type} timings (ms)"))
+        return 0
+    finally:
+        if hasattr(detector, 'close'):
+            detector.close()
+
+
+def write_import_profile(profiler, title, log_dir="logs"):
+    """Print the import profile and save it to the log directory"""
+    report = profiler.report(title=title)
+    print(report)
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        filename = os.path.join(log_dir, f"import_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        with open(filename, 'a') as f:
+            f.write(report + "\n\n")
+    except OSError as e:
+        print(f"Error saving import profile: {str(e)}")
+
 
 if __name__ == "__main__":
+    args = parse_args()
+
+    # Start profiling before the application modules are imported
+    profiler = None
+    if args.profile_imports:
+        profiler = ImportProfiler()
+        profiler.start()
+
+    from models.detector_backends import configure_onnx, configure_torch
+    configure_onnx(threads=args.onnx_threads, graph_optimization=args.onnx_optimization, quantized=args.onnx_int8)
+    configure_torch(threads=args.torch_threads, interop_threads=args.torch_interop_threads)
+
+    if args.headless or args.ingest is not None:
+        metrics_server = None
+        if args.metrics_port:
+            from utils.metrics_server import MetricsServer
+            metrics_server = MetricsServer(args.metrics_port, args.metrics_host).start()
+        try:
+            if args.ingest is not None:
+                from utils.ingestion import main as run_ingestion
+                exit_code = run_ingestion(args.ingest)
+            else:
+                exit_code = run_headless(args.headless, args.backend, args.confidence, args.max_frames,
+                                         args.detector_process)
+        finally:
+            if metrics_server is not None:
+                metrics_server.stop()
+        raise SystemExit(exit_code)
+
+    from ui.app import ParkingManagementSystem
+    from utils.style_config import apply_styling
+    from utils.window_manager import WindowManager
+
     root = Tk()
     # Apply consistent styling
     style = apply_styling(root)
@@ -19,13 +171,25 @@ if __name__ == "__main__":
 
     # Create the application
     app = ParkingManagementSystem(root)
+    app.detector_process = args.detector_process
+    if args.metrics_port:
+        app.start_metrics_server(args.metrics_port, args.metrics_host)
+
+    if profiler:
+        # Report once the window is up; lazy imports made later show up in the exit report
+        root.after_idle(lambda: write_import_profile(profiler, "Startup import profile"))
 
 
     # Save window position on exit
     def on_closing():
         window_manager.save_window_position()
+        app.close_ml_detectors()
         root.destroy()
 
 
     root.protocol("WM_DELETE_WINDOW", on_closing)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+    if profiler:
+        profiler.stop()
+        write_import_profile(profiler, "Session import profile")
\ No newline at end of file
@@ -0,0 +1,274 @@
+"""
+Vectorized scoring core for the allocation engine
+
+Keeps one feature row per parking space in a persistent NumPy matrix so
+allocation does not rebuild Python feature lists or DataFrames. Rows are
+only rewritten for spaces whose occupancy changed; scoring all free
+spaces is a single model call plus one vectorized expression.
+"""
+
+import time
+
+import numpy as np
+
+# Model input columns, in the order the allocation model was trained on
+FEATURE_NAMES = ['distance_to_entrance', 'time_since_last_occupied', 'vehicle_size']
+
+# Columns of the cached per-space matrix
+DISTANCE = 0
+LAST_CHANGE = 1  # Unix time of the last occupancy change
+SECTION = 2
+
+DEFAULT_SECTION = 'A'
+PREFERRED_SECTION_BOOST = 1.2
+
+
+def section_from_space_id(space_id):
+    """Section part of an "S<n>-<section>" space ID"""
+    parts = space_id.split('-')
+    return parts[1] if len(parts) > 1 else DEFAULT_SECTION
+
+
+def _timestamp(value):
+    """Unix time of a datetime, or the value itself if it is already a number"""
+    if value is None:
+        return time.time()
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return float(value)
+
+
+class AllocationCore:
+    """Cached feature matrix and occupancy vector for all parking spaces"""
+
+    def __init__(self):
+        self.space_ids = []
+        self.index = {}
+        self.sections = []
+        self.features = np.zeros((0, 3), dtype=np.float64)
+        self.occupied = np.zeros(0, dtype=bool)
+        self.section_total = np.zeros(0, dtype=np.int64)
+        self.section_occupied = np.zeros(0, dtype=np.int64)
+
+        # Bumped whenever rows are renumbered, so dependent indexes know to rebuild
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.space_ids)
+
+    def rebuild(self, spaces_data):
+        """Rebuild the matrix from a {space_id: data} dictionary"""
+        self.space_ids = list(spaces_data)
+        self.index = {space_id: i for i, space_id in enumerate(self.space_ids)}
+
+        count = len(self.space_ids)
+        features = np.zeros((count, 3), dtype=np.float64)
+        occupied = np.zeros(count, dtype=bool)
+        sections = {}
+
+        for i, (space_id, data) in enumerate(spaces_data.items()):
+            section = data.get('section') or section_from_space_id(space_id)
+            features[i, DISTANCE] = data['distance_to_entrance']
+            features[i, LAST_CHANGE] = _timestamp(data.get('last_state_change'))
+            features[i, SECTION] = sections.setdefault(section, len(sections))
+            occupied[i] = data['occupied']
+
+        self.sections = list(sections)
+        self.features = features
+        self.occupied = occupied
+        self.generation += 1
+
+        section_index = features[:, SECTION].astype(np.intp)
+        self.section_total = np.bincount(section_index, minlength=len(self.sections))
+        self.section_occupied = np.bincount(section_index, weights=occupied,
+                                            minlength=len(self.sections)).astype(np.int64)
+
+    def sync(self, spaces_data):
+        """
+        Bring the cache up to date with spaces_data
+
+        Only rows whose occupancy flag differs from the cache are re-read;
+        the whole matrix is rebuilt if the set of spaces changed.
+
+        Returns:
+            Indices of the rows that changed
+        """
+        if len(spaces_data) != len(self.space_ids) or list(spaces_data) != self.space_ids:
+            self.rebuild(spaces_data)
+            return np.arange(len(self.space_ids))
+
+        occupied = np.fromiter((data['occupied'] for data in spaces_data.values()),
+                               dtype=bool, count=len(self.space_ids))
+        changed = np.flatnonzero(occupied != self.occupied)
+        for i in changed:
+            data = spaces_data[self.space_ids[i]]
+            self.features[i, LAST_CHANGE] = _timestamp(data.get('last_state_change'))
+        np.add.at(self.section_occupied, self.features[changed, SECTION].astype(np.intp),
+                  np.where(occupied[changed], 1, -1))
+        self.occupied = occupied
+        return changed
+
+    def set_occupied(self, space_id, occupied, timestamp=None):
+        """
+        Record a single occupancy transition
+
+        Returns:
+            Row of the space if its state changed, otherwise None
+        """
+        i = self.index.get(space_id)
+        if i is None or self.occupied[i] == bool(occupied):
+            return None
+        self.occupied[i] = occupied
+        self.features[i, LAST_CHANGE] = _timestamp(timestamp)
+        self.section_occupied[int(self.features[i, SECTION])] += 1 if occupied else -1
+        return i
+
+    def section_stats(self):
+        """
+        Per-section totals and occupancy
+
+        Returns:
+            (total, occupied, occupancy_rate) arrays indexed like self.sections
+        """
+        total = self.section_total
+        occupied = self.section_occupied
+        rate = np.divide(occupied, total, out=np.zeros(len(total)), where=total > 0)
+        return total, occupied, rate
+
+    def model_inputs(self, rows, vehicle_size, now=None):
+        """Model feature matrix (len(rows), 3) for the given rows"""
+        if now is None:
+            now = time.time()
+        X = np.empty((len(rows), len(FEATURE_NAMES)), dtype=np.float32)
+        X[:, 0] = self.features[rows, DISTANCE]
+        X[:, 1] = (now - self.features[rows, LAST_CHANGE]) / 60  # minutes
+        X[:, 2] = vehicle_size
+        return X
+
+    def model_inputs_by_size(self, rows, vehicle_sizes, now=None):
+        """Model feature matrix for every (size, row) pair, size-major"""
+        base = self.model_inputs(rows, 0, now)
+        X = np.tile(base, (len(vehicle_sizes), 1))
+        X[:, 2] = np.repeat(vehicle_sizes, len(rows))
+        return X
+
+    def balance(self, model_scores, section_index, preferred_section=None, load_balancing_weight=0.3,
+                rates=None):
+        """Combine model scores with section emptiness and preference"""
+        if rates is None:
+            _, _, rates = self.section_stats()
+        preference = np.where(section_index == self.section_id(preferred_section), PREFERRED_SECTION_BOOST, 1.0)
+        return ((1 - load_balancing_weight) * model_scores
+                + load_balancing_weight * (1.0 - rates[section_index])) * preference
+
+    def section_id(self, section):
+        """Index of a section name, -1 if unknown or None"""
+        try:
+            return self.sections.index(section)
+        except ValueError:
+            return -1
+
+    def score_free_spaces(self, predict, vehicle_size=1, preferred_section=None,
+                          load_balancing_weight=0.3, now=None):
+        """
+        Balanced allocation scores for every free space
+
+        Args:
+            predict: Callable mapping a model feature matrix to P(good allocation)
+            vehicle_size: Size of vehicle (1=small, 2=medium, 3=large)
+            preferred_section: Optional section whose spaces get a score boost
+            load_balancing_weight: Weight of section emptiness vs. the model score
+            now: Unix time used for the vacancy feature
+
+        Returns:
+            (rows, balanced_scores, X) where rows index self.space_ids
+        """
+        rows, scores, inputs = self.score_vehicles(predict, [vehicle_size], [preferred_section],
+                                                   load_balancing_weight, now)
+        return rows, scores[0], inputs[vehicle_size]
+
+    def score_vehicles(self, predict, vehicle_sizes, preferred_sections=None,
+                       load_balancing_weight=0.3, now=None):
+        """
+        Balanced scores of every (vehicle, free space) pair
+
+        The model is called once for all distinct vehicle sizes.
+
+        Args:
+            predict: Callable mapping a model feature matrix to P(good allocation)
+            vehicle_sizes: Size of each vehicle
+            preferred_sections: Optional preferred section (or None) of each vehicle
+            load_balancing_weight: Weight of section emptiness vs. the model score
+            now: Unix time used for the vacancy feature
+
+        Returns:
+            (rows, scores, inputs): free space rows, a (vehicles, len(rows)) score
+            matrix and the model feature matrix of each vehicle size
+        """
+        rows = np.flatnonzero(~self.occupied)
+        sizes = np.asarray(vehicle_sizes)
+        unique_sizes, size_index = np.unique(sizes, return_inverse=True)
+
+        X = self.model_inputs_by_size(rows, unique_sizes, now)
+        inputs = {size.item(): X[k * len(rows):(k + 1) * len(rows)] for k, size in enumerate(unique_sizes)}
+
+        if len(rows) == 0:
+            return rows, np.zeros((len(sizes), 0)), inputs
+
+        model_scores = np.asarray(predict(X), dtype=np.float64).reshape(len(unique_sizes), len(rows))
+        model_scores = model_scores[size_index.ravel()]
+
+        _, _, rates = self.section_stats()
+        section_index = self.features[rows, SECTION].astype(np.intp)
+        if preferred_sections is None:
+            preferred_sections = [None] * len(sizes)
+
+        balanced = np.empty(model_scores.shape)
+        for v, section in enumerate(preferred_sections):
+            balanced[v] = self.balance(model_scores[v], section_index, section, load_balancing_weight, rates)
+        return rows, balanced, inputs
+
+
+def solve_assignment(scores):
+    """
+    Jointly assign vehicles (rows) to free spaces (columns)
+
+    Maximizes the total score with the Hungarian algorithm when scipy is
+    available, otherwise lets each vehicle take its best remaining space in
+    arrival order. If there are more vehicles than spaces, the earliest
+    vehicles are served.
+
+    Returns:
+        Column assigned to every row, -1 where no space was left
+    """
+    num_vehicles, num_spaces = scores.shape
+    assignment = np.full(num_vehicles, -1, dtype=np.intp)
+    served = min(num_vehicles, num_spaces)
+    if served == 0:
+        return assignment
+
+    scores = scores[:served]
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        linear_sum_assignment = None
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(scores, maximize=True)
+        assignment[rows] = cols
+        return assignment
+
+    # Vehicles with the same size and preference share one sorted candidate list
+    unique_rows, inverse = np.unique(scores, axis=0, return_inverse=True)
+    orders = np.argsort(-unique_rows, axis=1, kind='stable')
+    cursors = np.zeros(len(unique_rows), dtype=np.intp)
+    taken = np.zeros(num_spaces, dtype=bool)
+    for vehicle, group in enumerate(inverse.ravel()):
+        order = orders[group]
+        cursor = cursors[group]
+        while taken[order[cursor]]:
+            cursor += 1
+        taken[order[cursor]] = True
+        assignment[vehicle] = order[cursor]
+        cursors[group] = cursor + 1
+    return assignment
@@ -1,11 +1,19 @@
 import numpy as np
-import pandas as pd
 from datetime import datetime
-import xgboost as xgb
-import pickle
 import os
 import threading
 
+from utils.instrumentation import timed
+from utils.lazy_import import lazy_import
+
+from models.allocation_core import AllocationCore, FEATURE_NAMES, section_from_space_id, solve_assignment
+from models.allocation_index import AllocationIndex
+from models.model_registry import get_registry
+from models.model_trainer import BackgroundTrainer, FeedbackStore, FEEDBACK_FILE
+
+pd = lazy_import("pandas")
+xgb = lazy_import("xgboost")
+
 
 class ParkingAllocationEngine:
     """
@@ -16,23 +24,30 @@ class ParkingAllocationEngine:
     def __init__(self, config_dir="config", model_file="parking_allocation_model.pkl"):
 
         self.config_dir = config_dir
-        self.model_file = model_file
-        self.model_path = os.path.join(config_dir, "models", model_file)
+        self.model_name = os.path.splitext(model_file)[0]
 
         # Create models directory if not exists
         model_dir = os.path.join(config_dir, "models")
         if not os.path.exists(model_dir):
             os.makedirs(model_dir)
 
-        # Load or create the model
-        self.model = self._load_or_create_model()
+        # The model is shared with other consumers and loaded on first allocation
+        self.registry = get_registry(config_dir)
+        self.registry.subscribe(self.model_name, self._on_model_published)
 
         # Track allocation history for adaptation
         self.allocation_history = []
-        self.feedback_data = []
+
+        # Feedback accumulates across runs; retraining happens in a worker process
+        self.feedback_store = FeedbackStore(os.path.join(model_dir, FEEDBACK_FILE))
+        self.trainer = BackgroundTrainer()
+        self.retrain_interval = 10  # New feedback entries between retraining rounds
+        self.feedback_since_retrain = 0
 
         # Track parking lot statistics for load balancing
         self.parking_stats = {}
+        self.core = AllocationCore()
+        self.index = AllocationIndex(self.core, self._predict)
         self.load_balancing_weight = 0.3  # How much weight to give to load balancing vs. convenience
 
         # Lock for thread safety
@@ -42,103 +57,81 @@ class ParkingAllocationEngine:
         with self.lock:
             # Store the parking spaces data
             self.parking_data = spaces_data
+            self.core.rebuild(spaces_data)
 
-            # Update parking statistics for load balancing
-            self.update_parking_stats(spaces_data)
-
-    def _load_or_create_model(self):
-        """Load existing model or create a new one if none exists"""
-        if os.path.exists(self.model_path):
-            try:
-                with open(self.model_path, 'rb') as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error loading model: {e}. Creating a new one.")
-                return self._create_new_model()
-        else:
-            return self._create_new_model()
-
-    def _create_new_model(self):
-        """Create and train a new XGBoost model with initial data"""
-        # Create XGBoost classifier with optimized parameters
-        model = xgb.XGBClassifier(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            gamma=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            objective='binary:logistic',
-            scale_pos_weight=1,
-            random_state=42
-        )
-
-        # Create initial training data - with CORRECT feature names
-        X = pd.DataFrame({
-            'distance_to_entrance': [10, 20, 50, 30, 40, 60, 70, 25, 35, 45],
-            'time_since_last_occupied': [60, 30, 15, 120, 45, 90, 10, 50, 75, 110],  # Changed from 'time_vacant'
-            'vehicle_size': [1, 2, 3, 1, 2, 3, 1, 2, 2, 1]
-            # Removed 'section_occupancy_rate' as it's not in the model
-        })
-
-        # Initial target labels (1 = good allocation)
-        y = np.array([1, 1, 0, 1, 0, 1, 0, 1, 0, 1])
-
-        # Train model with initial data
-        model.fit(X, y)
-
-        # Save the model
-        with open(self.model_path, 'wb') as f:
-            pickle.dump(model, f)
-
-        return model
-
-    def update_parking_stats(self, spaces_data):
+        # Update parking statistics for load balancing
+        self.update_parking_stats(spaces_data)
+
+    @property
+    def model(self):
+        """The shared allocation model, loaded on first use"""
+        return self.registry.get(self.model_name)
+
+    def _on_model_published(self, model):
+        with self.lock:
+            self.index.invalidate()
+
+    def update_parking_stats(self, spaces_data=None):
         """
         Update the statistics about parking sections for load balancing
 
         Args:
-            spaces_data: Dictionary of parking spaces with occupancy info
+            spaces_data: Dictionary of parking spaces with occupancy info; only
+                spaces whose occupancy changed since the last call are re-read
         """
         with self.lock:
-            # Group spaces by section
-            sections = {}
-            for space_id, data in spaces_data.items():
-                # Extract section from space_id (assuming format like "S1-A" where A is section)
-                parts = space_id.split('-')
-                section = parts[1] if len(parts) > 1 else 'A'  # Default to section A
-
-                if section not in sections:
-                    sections[section] = {'total': 0, 'occupied': 0}
-
-                sections[section]['total'] += 1
-                if data['occupied']:
-                    sections[section]['occupied'] += 1
-
-            # Calculate occupancy rates
-            for section, stats in sections.items():
-                if stats['total'] > 0:
-                    occupancy_rate = stats['occupied'] / stats['total']
-                else:
-                    occupancy_rate = 0
-
-                self.parking_stats[section] = {
-                    'total': stats['total'],
-                    'occupied': stats['occupied'],
-                    'occupancy_rate': occupancy_rate
-                }
+            if spaces_data is not None:
+                self.index.update(self.core.sync(spaces_data))
+            self._refresh_parking_stats()
+
+    def _refresh_parking_stats(self):
+        total, occupied, rates = self.core.section_stats()
+        self.parking_stats = {
+            section: {
+                'total': int(total[i]),
+                'occupied': int(occupied[i]),
+                'occupancy_rate': float(rates[i])
+            }
+            for i, section in enumerate(self.core.sections)
+        }
+
+    def update_space_status(self, space_id, occupied, timestamp=None):
+        """
+        Record a single occupancy transition without rescanning all spaces
+
+        Args:
+            space_id: ID of the space that changed
+            occupied: New occupancy state
+            timestamp: Time of the change (datetime or Unix time), defaults to now
+        """
+        with self.lock:
+            row = self.core.set_occupied(space_id, occupied, timestamp)
+            if row is not None:
+                self.index.update([row])
+            self._refresh_parking_stats()
 
     def get_section_from_space_id(self, space_id):
         """Extract section from space ID"""
-        parts = space_id.split('-')
-        return parts[1] if len(parts) > 1 else 'A'  # Default to section A
+        return section_from_space_id(space_id)
+
+    def _predict(self, X):
+        """Probability of a good allocation for each row of a model feature matrix"""
+        if isinstance(self.model, xgb.XGBModel):
+            # Skip the DataFrame round trip; columns are already in training order
+            return self.model.get_booster().inplace_predict(X, validate_features=False)
+        return self.model.predict_proba(pd.DataFrame(X, columns=FEATURE_NAMES))[:, 1]
 
+    @timed("allocation_request")
     def allocate_parking(self, spaces_data, vehicle_size=1, preferred_section=None):
         """
         Find the optimal parking space for a vehicle using XGBoost model and load balancing
 
+        Free spaces are looked up in the allocation index, so only the best
+        space of each section is compared.
+
         Args:
-            spaces_data: Dictionary of parking spaces with their data
+            spaces_data: Dictionary of parking spaces with their data, or None if
+                occupancy is kept current through update_space_status
             vehicle_size: Size of vehicle (1=small, 2=medium, 3=large)
             preferred_section: Optional preferred parking section
 
@@ -146,79 +139,32 @@ class ParkingAllocationEngine:
             best_space_id: The ID of the optimal parking space
             allocation_score: The confidence score of the allocation
         """
-        # Update parking statistics for load balancing - OUTSIDE the lock to avoid UI freezes
-        self.update_parking_stats(spaces_data)
-
-        # Filter for available spaces
-        available_spaces = {space_id: data for space_id, data in spaces_data.items()
-                            if not data['occupied']}
-
-        if not available_spaces:
-            return None, 0  # No available spaces
-
-        # Prepare features for prediction
         current_time = datetime.now()
-        features_list = []
-        space_ids = []
-
-        for space_id, data in available_spaces.items():
-            # Calculate time since space became vacant (in minutes)
-            time_since_last_occupied = (current_time - data['last_state_change']).total_seconds() / 60
-
-            # Prepare features for this space - ONLY include the features the model expects!
-            features = [
-                data['distance_to_entrance'],
-                time_since_last_occupied,  # Changed from 'time_vacant' to 'time_since_last_occupied'
-                vehicle_size
-            ]
-
-            features_list.append(features)
-            space_ids.append(space_id)
+        now = current_time.timestamp()
 
-        # Only lock for the actual model prediction to minimize lock time
         with self.lock:
-            # Convert to DataFrame with CORRECT feature names matching the model
-            X_pred = pd.DataFrame(features_list, columns=[
-                'distance_to_entrance',
-                'time_since_last_occupied',  # Changed to match the model's expected name
-                'vehicle_size'
-            ])
-
-            # Get prediction scores from model
-            prediction_scores = self.model.predict_proba(X_pred)[:, 1]  # Probability of class 1
-
-        # Apply load balancing adjustment
-        balanced_scores = []
-        for i, space_id in enumerate(space_ids):
-            score = prediction_scores[i]
-
-            # Get section
-            section = self.get_section_from_space_id(space_id)
-
-            # Apply load balancing adjustment based on section occupancy
-            section_occupancy = self.parking_stats.get(section, {}).get('occupancy_rate', 0.5)
-            load_balance_score = 1.0 - section_occupancy  # Higher score for less occupied sections
-
-            # If preferred section is specified, boost its score
-            section_preference = 1.0
-            if preferred_section and section == preferred_section:
-                section_preference = 1.2
-
-            # Combine model score and load balancing with weightings
-            balanced_score = (
-                                     (1 - self.load_balancing_weight) * score +
-                                     self.load_balancing_weight * load_balance_score
-                             ) * section_preference
-
-            balanced_scores.append(balanced_score)
-
-        # Find best space
-        if not balanced_scores:
-            return None, 0
-
-        best_idx = np.argmax(balanced_scores)
-        best_space_id = space_ids[best_idx]
-        best_score = balanced_scores[best_idx]
+            if spaces_data is not None:
+                # Only rows whose occupancy changed are re-read
+                self.index.update(self.core.sync(spaces_data), now)
+                self._refresh_parking_stats()
+
+            if vehicle_size in self.index.vehicle_sizes:
+                best = self.index.best(vehicle_size, preferred_section, self.load_balancing_weight, now)
+                if best is None:
+                    return None, 0  # No available spaces
+                best_row, best_score, _ = best
+                features = self.core.model_inputs([best_row], vehicle_size, now)[0]
+            else:
+                # Unusual size class without a heap: score every free space
+                rows, balanced_scores, X = self.core.score_free_spaces(
+                    self._predict, vehicle_size, preferred_section, self.load_balancing_weight, now)
+                if len(rows) == 0:
+                    return None, 0
+                best_idx = int(np.argmax(balanced_scores))
+                best_row, best_score = rows[best_idx], float(balanced_scores[best_idx])
+                features = X[best_idx]
+
+            best_space_id = self.core.space_ids[best_row]
 
         # Log the allocation for model improvement
         allocation = {
@@ -226,12 +172,69 @@ class ParkingAllocationEngine:
             'space_id': best_space_id,
             'vehicle_size': vehicle_size,
             'score': best_score,
-            'features': features_list[best_idx]
+            'features': features.tolist()
         }
         self.allocation_history.append(allocation)
 
         return best_space_id, best_score
 
+    @timed("allocation_batch")
+    def allocate_many(self, spaces_data, vehicles, preferred_section=None):
+        """
+        Allocate a queue of vehicles at once
+
+        All (vehicle, free space) pairs are scored with a single model call and
+        the spaces are assigned jointly, so no space is given to two vehicles.
+        Like allocate_parking, spaces_data is not modified.
+
+        Args:
+            spaces_data: Dictionary of parking spaces with their data
+            vehicles: List of (vehicle_id, vehicle_size) or
+                (vehicle_id, vehicle_size, preferred_section) tuples in arrival order
+            preferred_section: Preferred section for vehicles that do not name one
+
+        Returns:
+            List of (vehicle_id, space_id, score) in the order of vehicles;
+            space_id is None for vehicles that did not get a space
+        """
+        vehicles = [tuple(vehicle) for vehicle in vehicles]
+        if not vehicles:
+            return []
+
+        vehicle_ids = [vehicle[0] for vehicle in vehicles]
+        sizes = [vehicle[1] if len(vehicle) > 1 else 1 for vehicle in vehicles]
+        preferences = [vehicle[2] if len(vehicle) > 2 else preferred_section for vehicle in vehicles]
+        current_time = datetime.now()
+
+        with self.lock:
+            self.index.update(self.core.sync(spaces_data))
+            self._refresh_parking_stats()
+
+            rows, scores, inputs = self.core.score_vehicles(
+                self._predict, sizes, preferences,
+                self.load_balancing_weight, current_time.timestamp())
+
+        assignment = solve_assignment(scores)
+
+        results = []
+        for v, col in enumerate(assignment):
+            if col < 0:
+                results.append((vehicle_ids[v], None, 0))
+                continue
+
+            space_id = self.core.space_ids[rows[col]]
+            score = float(scores[v, col])
+            self.allocation_history.append({
+                'timestamp': current_time,
+                'space_id': space_id,
+                'vehicle_size': sizes[v],
+                'score': score,
+                'features': inputs[sizes[v]][col].tolist()
+            })
+            results.append((vehicle_ids[v], space_id, score))
+
+        return results
+
     def add_feedback(self, space_id, vehicle_size, successful):
         """
         Add user feedback about allocation quality for model improvement
@@ -242,9 +245,6 @@ class ParkingAllocationEngine:
             successful: Whether the allocation was successful (user satisfaction)
         """
         with self.lock:
-            # Get the section from the space ID
-            section = self.get_section_from_space_id(space_id)
-
             # Find the allocation in history
             allocation = None
             for entry in reversed(self.allocation_history):
@@ -252,57 +252,53 @@ class ParkingAllocationEngine:
                     allocation = entry
                     break
 
-            if allocation:
-                feedback = {
-                    'timestamp': datetime.now(),
-                    'space_id': space_id,
-                    'section': section,
-                    'vehicle_size': vehicle_size,
-                    'features': allocation['features'],
-                    'successful': 1 if successful else 0
-                }
+        if not allocation:
+            return
 
-                self.feedback_data.append(feedback)
+        self.feedback_store.add(
+            allocation['features'], successful,
+            timestamp=datetime.now().isoformat(),
+            space_id=space_id,
+            section=self.get_section_from_space_id(space_id),
+            vehicle_size=vehicle_size)
+        self.feedback_since_retrain += 1
 
-                # Update model if we have enough feedback
-                if len(self.feedback_data) >= 10:
-                    self._retrain_model()
+        # Update model if we have enough new feedback
+        if self.feedback_since_retrain >= self.retrain_interval:
+            self.feedback_since_retrain = 0
+            self._retrain_model()
 
     def _retrain_model(self):
-        """Retrain the model with collected feedback data"""
-        if not self.feedback_data:
-            return
+        """Retrain the model with all stored feedback in the background"""
+        self.trainer.submit(self._training_snapshot, self._install_model)
+
+    def _training_snapshot(self):
+        """Current model and all stored feedback; training refits the trees added on top of the base model"""
+        X, y = self.feedback_store.training_data()
+        if len(y) == 0:
+            return None
 
         with self.lock:
-            try:
-                # Prepare features and labels
-                features_list = []
-                labels = []
-
-                for feedback in self.feedback_data:
-                    # Make sure to only include the first 3 features that the model expects
-                    features_list.append(feedback['features'][:3])  # Only first 3 features
-                    labels.append(feedback['successful'])
-
-                # Convert to DataFrame with CORRECT feature names
-                X = pd.DataFrame(features_list, columns=[
-                    'distance_to_entrance',
-                    'time_since_last_occupied',  # Changed from 'time_vacant'
-                    'vehicle_size'
-                ])
-                y = np.array(labels)
-
-                # Update model with new data
-                self.model.fit(X, y)
-
-                # Save updated model
-                with open(self.model_path, 'wb') as f:
-                    pickle.dump(self.model, f)
-
-                # Clear feedback data
-                self.feedback_data = []
-
-                print("Model retrained with new feedback data")
-
-            except Exception as e:
-                print(f"Error retraining model: {e}")
\ No newline at end of file
+            model_bytes = bytes(self.model.get_booster().save_raw('ubj'))
+            params = {key: value for key, value in self.model.get_xgb_params().items() if value is not None}
+        return model_bytes, params, X, y
+
+    def _install_model(self, model_bytes):
+        """Swap in a retrained model; called from the trainer when training finishes"""
+        if model_bytes is None:
+            return
+
+        try:
+            model = xgb.XGBClassifier()
+            model.load_model(bytearray(model_bytes))
+        except Exception as e:
+            print(f"Error loading retrained model: {e}")
+            return
+
+        # Swaps the shared model, saves a new version and invalidates the index
+        version = self.registry.publish(self.model_name, model)
+        print(f"Model retrained with new feedback data (version {version})")
+
+    def close(self):
+        """Stop the retraining worker"""
+        self.trainer.shutdown()
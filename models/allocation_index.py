@@ -0,0 +1,153 @@
+"""
+Priority-queue index of free parking spaces
+
+Within a section the load-balancing and preference terms of the balanced
+score are the same for every space, so the best space of a section is
+simply the one with the highest model score. The index keeps one max-heap
+per (section, vehicle size) of free spaces keyed by model score; an
+allocation only compares the top of each section's heap.
+
+Entries are invalidated lazily: occupancy changes bump a per-row version
+and stale entries are discarded when they reach the top of a heap.
+"""
+
+import heapq
+import time
+
+import numpy as np
+
+from models.allocation_core import SECTION
+
+VEHICLE_SIZES = (1, 2, 3)
+
+# Model scores depend on how long a space has been free; re-key everything this often
+DEFAULT_REBUILD_INTERVAL = 60.0
+
+
+class AllocationIndex:
+    """Per-section, per-vehicle-size heaps of free spaces over an AllocationCore"""
+
+    def __init__(self, core, predict, vehicle_sizes=VEHICLE_SIZES, rebuild_interval=DEFAULT_REBUILD_INTERVAL):
+        """
+        Args:
+            core: AllocationCore holding the feature matrix
+            predict: Callable mapping a model feature matrix to P(good allocation)
+            vehicle_sizes: Vehicle size classes to keep heaps for
+            rebuild_interval: Seconds after which all keys are recomputed
+        """
+        self.core = core
+        self.predict = predict
+        self.vehicle_sizes = tuple(vehicle_sizes)
+        self.rebuild_interval = rebuild_interval
+
+        self.heaps = {}
+        self.versions = np.zeros(0, dtype=np.int64)
+        self.built_generation = None
+        self.built_at = 0.0
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup, e.g. after the model changed"""
+        self.built_generation = None
+
+    def is_stale(self, now=None):
+        if now is None:
+            now = time.time()
+        return self.built_generation != self.core.generation or now - self.built_at > self.rebuild_interval
+
+    def rebuild(self, now=None):
+        """Score every free space for every size class and heapify per section"""
+        if now is None:
+            now = time.time()
+        core = self.core
+        rows = np.flatnonzero(~core.occupied)
+
+        self.versions = np.zeros(len(core), dtype=np.int64)
+        self.heaps = {(section, size): [] for section in range(len(core.sections)) for size in self.vehicle_sizes}
+
+        if len(rows):
+            scores = self._score(rows, now)
+            sections = core.features[rows, SECTION].astype(np.intp)
+            for k, size in enumerate(self.vehicle_sizes):
+                for section in range(len(core.sections)):
+                    mask = sections == section
+                    heap = [(-score, row, 0) for score, row in zip(scores[k, mask].tolist(), rows[mask].tolist())]
+                    heapq.heapify(heap)
+                    self.heaps[(section, size)] = heap
+
+        self.built_generation = core.generation
+        self.built_at = now
+
+    def _score(self, rows, now):
+        """(len(vehicle_sizes), len(rows)) model scores from one model call"""
+        X = self.core.model_inputs_by_size(rows, self.vehicle_sizes, now)
+        return np.asarray(self.predict(X), dtype=np.float64).reshape(len(self.vehicle_sizes), len(rows))
+
+    def update(self, rows, now=None):
+        """
+        Apply occupancy changes of the given rows
+
+        Rows that became occupied are dropped lazily; rows that became free
+        are scored in one batch and pushed.
+        """
+        if self.built_generation != self.core.generation:
+            return
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return
+        if now is None:
+            now = time.time()
+
+        self.versions[rows] += 1
+        freed = rows[~self.core.occupied[rows]]
+        if len(freed) == 0:
+            return
+
+        scores = self._score(freed, now)
+        sections = self.core.features[freed, SECTION].astype(np.intp)
+        for k, size in enumerate(self.vehicle_sizes):
+            for score, row, section in zip(scores[k].tolist(), freed.tolist(), sections.tolist()):
+                heapq.heappush(self.heaps[(section, size)], (-score, row, int(self.versions[row])))
+
+    def _peek(self, section, vehicle_size):
+        """Best valid (score, row) of a heap, discarding stale entries"""
+        heap = self.heaps[(section, vehicle_size)]
+        while heap:
+            neg_score, row, version = heap[0]
+            if version == self.versions[row] and not self.core.occupied[row]:
+                return -neg_score, row
+            heapq.heappop(heap)
+        return None
+
+    def best(self, vehicle_size=1, preferred_section=None, load_balancing_weight=0.3, now=None):
+        """
+        Best free space for a vehicle
+
+        Args:
+            vehicle_size: Size of vehicle; must be one of vehicle_sizes
+            preferred_section: Optional section whose spaces get a score boost
+            load_balancing_weight: Weight of section emptiness vs. the model score
+            now: Unix time, used to decide whether keys are due for a rebuild
+
+        Returns:
+            (row, balanced_score, model_score), or None if no space is free
+        """
+        if self.is_stale(now):
+            self.rebuild(now)
+
+        core = self.core
+        _, _, rates = core.section_stats()
+
+        candidates = []
+        for section in range(len(core.sections)):
+            top = self._peek(section, vehicle_size)
+            if top is not None:
+                candidates.append((top[0], top[1], section))
+        if not candidates:
+            return None
+
+        model_scores = np.array([candidate[0] for candidate in candidates])
+        sections = np.array([candidate[2] for candidate in candidates], dtype=np.intp)
+        balanced = core.balance(model_scores, sections, preferred_section, load_balancing_weight, rates)
+
+        best = int(np.argmax(balanced))
+        return candidates[best][1], float(balanced[best]), float(model_scores[best])
@@ -3,6 +3,8 @@ import cv2
 from pathlib import Path
 import os
 
+from utils.detection_postprocess import as_detections
+
 
 class DeepSORTTracker:
     """
@@ -32,20 +34,15 @@ class DeepSORTTracker:
                     self.next_id = 1
                     self.tracked_objects = {}
 
-                def update(self, frame, detections):
-                    results = []
-
-                    # Assign IDs to detections
-                    for det in detections:
-                        bbox, score, class_id = det
-                        # For simplicity, just assign a new ID to each detection
-                        track_id = self.next_id
-                        self.next_id += 1
+                def update(self, bbox_xywh, scores, features):
+                    # For simplicity, just assign a new ID to each detection
+                    ids = np.arange(self.next_id, self.next_id + len(bbox_xywh))
+                    self.next_id += len(bbox_xywh)
 
-                        # Store in results
-                        results.append((track_id, bbox, class_id))
-
-                    return results
+                    # Same rows as DeepSORT: x1, y1, x2, y2, track_id
+                    corners = np.hstack([bbox_xywh[:, :2] - bbox_xywh[:, 2:] / 2,
+                                         bbox_xywh[:, :2] + bbox_xywh[:, 2:] / 2])
+                    return np.column_stack([corners, ids])
 
             print("Initialized simple tracker as fallback")
             return SimpleTracker()
@@ -58,12 +55,11 @@ class DeepSORTTracker:
                 def __init__(self):
                     self.next_id = 1
 
-                def update(self, frame, detections):
+                def update(self, bbox_xywh, scores, features):
                     results = []
-                    for i, det in enumerate(detections):
-                        bbox, score, class_id = det
-                        results.append((self.next_id + i, bbox, class_id))
-                    self.next_id += len(detections)
+                    for i, (cx, cy, w, h) in enumerate(bbox_xywh):
+                        results.append([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, self.next_id + i])
+                    self.next_id += len(bbox_xywh)
                     return results
 
             return VerySimpleTracker()
@@ -74,31 +70,23 @@ class DeepSORTTracker:
 
         Args:
             frame: Current video frame
-            detections: List of detection tuples (bbox, confidence, class_id)
+            detections: Structured detection array, or list of (bbox, confidence, class_id)
 
         Returns:
             List of tracks (ID, bbox, class_id)
         """
-        if not detections:
+        if detections is None or len(detections) == 0:
             return []
 
         try:
             # Extract bounding boxes, confidence scores, and class IDs
-            bboxes = np.array([d[0] for d in detections])
-            scores = np.array([d[1] for d in detections])
-            class_ids = np.array([d[2] for d in detections])
-
-            # Convert to format expected by DeepSORT [x1, y1, x2, y2] to [x, y, w, h]
-            bbox_xywh = []
-            for bbox in bboxes:
-                x1, y1, x2, y2 = bbox
-                bbox_xywh.append([
-                    (x1 + x2) / 2,  # x center
-                    (y1 + y2) / 2,  # y center
-                    x2 - x1,  # width
-                    y2 - y1  # height
-                ])
-            bbox_xywh = np.array(bbox_xywh)
+            detections = as_detections(detections)
+            bboxes = detections['box']
+            scores = detections['score']
+            class_ids = detections['class_id']
+
+            # Convert to format expected by DeepSORT [x1, y1, x2, y2] to [x center, y center, w, h]
+            bbox_xywh = np.column_stack([(bboxes[:, :2] + bboxes[:, 2:]) / 2, bboxes[:, 2:] - bboxes[:, :2]])
 
             # Get DeepSORT features
             features = self._get_features(frame, bbox_xywh)
@@ -183,7 +171,7 @@ class DeepSORTTracker:
 
         # Return the class ID with highest IoU
         if best_iou > 0.5 and best_idx < len(all_class_ids):
-            return all_class_ids[best_idx]
+            return int(all_class_ids[best_idx])
         return 0  # Default class ID if no good match
 
     def _calculate_iou(self, box1, box2):
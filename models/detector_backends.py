@@ -0,0 +1,501 @@
+"""
+Registry of vehicle detection backends
+
+Each backend describes one way of running a detection model: the modules
+and files it needs, its input size, whether it can batch, how its class
+ids map to the shared COCO class list, and reference CPU latency and
+accuracy figures. Backends are probed once (imports and files only, no
+model is loaded), and select_backends() orders them for a caller:
+
+    1. the explicitly preferred backend, if available
+    2. available backends meeting the accuracy target, fastest first
+    3. the remaining available backends, most accurate first
+
+VehicleDetector, YOLODetector and initialize_tracker all load their model
+through load_backend(). The onnx_* backends run models exported by
+models.onnx_export with ONNX Runtime; configure_onnx() sets their thread
+count, graph optimization level and whether the int8 copy is used.
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from utils.detection_postprocess import class_lookup, empty_detections, postprocess
+from utils.lazy_import import is_available, lazy_import
+
+torch = lazy_import("torch")
+
+# Canonical class list; every backend maps its own class ids onto these indices
+COCO_CLASSES = [
+    'background', 'person', 'bicycle', 'car', 'motorcycle',
+    'airplane', 'bus', 'train', 'truck', 'boat'
+]
+VEHICLE_CLASSES = (3, 4, 6, 8)  # car, motorcycle, bus, truck
+
+# Minimum COCO box mAP a backend must reach to be preferred for speed
+DEFAULT_ACCURACY_TARGET = 0.30
+
+# ONNX Runtime session settings shared by the onnx_* backends (see configure_onnx)
+ONNX_SETTINGS = {
+    "threads": 0,  # intra-op threads; 0 lets ONNX Runtime use all physical cores
+    "graph_optimization": "all",  # disabled, basic, extended or all
+    "quantized": False,  # Use the int8 copy of the model when it exists
+}
+# PyTorch thread pools used by the torch backends (see configure_torch); 0 keeps PyTorch's default
+TORCH_SETTINGS = {
+    "threads": 0,  # intra-op threads
+    "interop_threads": 0,
+}
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+# Grey used by YOLOv8 to pad letterboxed inputs
+LETTERBOX_COLOR = 114
+
+BACKENDS = {}
+_probe_results = {}
+_probe_lock = threading.Lock()
+
+
+def register_backend(cls):
+    """Class decorator adding a backend to the registry"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def configure_onnx(threads=None, graph_optimization=None, quantized=None):
+    """Change the settings used by ONNX Runtime backends loaded from now on"""
+    if threads is not None:
+        ONNX_SETTINGS["threads"] = max(0, int(threads))
+    if graph_optimization is not None:
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization}")
+        ONNX_SETTINGS["graph_optimization"] = graph_optimization
+    if quantized is not None:
+        ONNX_SETTINGS["quantized"] = bool(quantized)
+
+
+def configure_torch(threads=None, interop_threads=None):
+    """
+    Change the thread pools of PyTorch backends loaded from now on
+
+    Called before torch is imported, this also sets OMP_NUM_THREADS and
+    MKL_NUM_THREADS so the native libraries start with the same pool size.
+    """
+    if threads is not None:
+        TORCH_SETTINGS["threads"] = max(0, int(threads))
+    if interop_threads is not None:
+        TORCH_SETTINGS["interop_threads"] = max(0, int(interop_threads))
+    if TORCH_SETTINGS["threads"] and not torch.is_loaded:
+        os.environ["OMP_NUM_THREADS"] = str(TORCH_SETTINGS["threads"])
+        os.environ["MKL_NUM_THREADS"] = str(TORCH_SETTINGS["threads"])
+
+
+def apply_torch_settings():
+    """Apply TORCH_SETTINGS to the torch runtime of this process"""
+    if TORCH_SETTINGS["threads"]:
+        torch.set_num_threads(TORCH_SETTINGS["threads"])
+    if TORCH_SETTINGS["interop_threads"]:
+        try:
+            torch.set_num_interop_threads(TORCH_SETTINGS["interop_threads"])
+        except RuntimeError as e:
+            # Only allowed before the first parallel operation of the process
+            print(f"Could not set PyTorch inter-op threads: {e}")
+
+
+def quantized_path(model_path):
+    """Where the int8 copy of an ONNX model is stored"""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.int8{ext}"
+
+
+def resolve_device(use_cuda=False):
+    """'cuda' if requested and usable, otherwise 'cpu'"""
+    if use_cuda and is_available("torch"):
+        try:
+            if torch.cuda.is_available():
+                return "cuda"
+        except Exception:
+            pass
+    return "cpu"
+
+
+class DetectorBackend:
+    """One way of running a vehicle detector"""
+
+    name = ""
+    label = ""
+    requires = ()  # Importable modules
+    files = ()  # Files that must exist
+    uses_torch = False  # Runs on PyTorch, so TORCH_SETTINGS apply
+    input_size = (640, 640)  # (height, width) the model runs at
+    supports_batch = False
+    class_map = {}  # Model class id -> index into COCO_CLASSES
+    nms_threshold = None  # Set for models whose raw output still needs NMS
+
+    # Reference figures for the selection policy: CPU, batch 1, at input_size
+    expected_latency_ms = 0.0
+    accuracy = 0.0  # COCO box mAP@[.5:.95]
+
+    def __init__(self, device="cpu"):
+        self.device = device
+        self.model = None
+        self._class_table = class_lookup(self.class_map)
+
+    @classmethod
+    def probe(cls):
+        """
+        Check whether the backend can run here without loading it
+
+        Returns:
+            (available, reason)
+        """
+        for module in cls.requires:
+            if not is_available(module):
+                return False, f"module '{module}' is not installed"
+        for path in cls.files:
+            if not os.path.exists(path):
+                return False, f"missing {path}"
+        return True, "ok"
+
+    def load(self):
+        """Load the model; raises on failure"""
+        raise NotImplementedError
+
+    def predict(self, image):
+        """
+        Run the model on a BGR image
+
+        Returns:
+            (boxes, scores, class_ids): (N, 4) x1, y1, x2, y2 in image pixels,
+            (N,) confidences and (N,) model class ids
+        """
+        raise NotImplementedError
+
+    def detect(self, image, confidence_threshold=0.5):
+        """
+        Vehicle detections in the detect_vehicles format
+
+        Returns:
+            Structured array (see utils.detection_postprocess) with class ids indexing COCO_CLASSES
+        """
+        boxes, scores, class_ids = self.predict(image)
+        if len(scores) == 0:
+            return empty_detections()
+        return postprocess(boxes, scores, class_ids, confidence_threshold, class_map=self._class_table,
+                           keep_classes=VEHICLE_CLASSES, nms_threshold=self.nms_threshold)
+
+
+@register_backend
+class FasterRCNNBackend(DetectorBackend):
+    name = "fasterrcnn"
+    label = "Faster R-CNN ResNet50-FPN (torchvision)"
+    requires = ("torch", "torchvision")
+    uses_torch = True
+    input_size = (800, 1333)
+    supports_batch = True
+    class_map = {3: 3, 4: 4, 6: 6, 8: 8}  # torchvision uses COCO category ids
+    expected_latency_ms = 2500.0
+    accuracy = 0.370
+
+    def load(self):
+        from torchvision.models import detection
+        from torchvision.models.detection import FasterRCNN_ResNet50_FPN_Weights
+
+        model = detection.fasterrcnn_resnet50_fpn(weights=FasterRCNN_ResNet50_FPN_Weights.DEFAULT)
+        model.eval()
+        model = model.to(self.device)
+        # Use TorchScript to optimize model if possible
+        try:
+            model = torch.jit.script(model)
+            print("Model optimized with TorchScript")
+        except Exception as e:
+            print(f"Could not optimize with TorchScript: {e}")
+        self.model = model
+
+    def predict(self, image):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        tensor = torch.from_numpy(rgb.transpose((2, 0, 1))).float().div(255.0).to(self.device)
+        with torch.no_grad():
+            output = self.model([tensor])
+        if isinstance(output, tuple):
+            output = output[1]  # Scripted models return (losses, detections)
+        prediction = output[0]
+        return (prediction['boxes'].cpu().numpy(), prediction['scores'].cpu().numpy(),
+                prediction['labels'].cpu().numpy())
+
+
+@register_backend
+class YOLOv8Backend(DetectorBackend):
+    name = "yolov8"
+    label = "YOLOv8n (ultralytics)"
+    requires = ("ultralytics",)
+    uses_torch = True
+    input_size = (640, 640)
+    supports_batch = True
+    class_map = {2: 3, 3: 4, 5: 6, 7: 8}  # Zero-based COCO indices
+    expected_latency_ms = 120.0
+    accuracy = 0.373
+
+    def __init__(self, device="cpu", weights="yolov8n.pt"):
+        super().__init__(device)
+        self.weights = weights
+
+    def load(self):
+        from ultralytics import YOLO
+        self.model = YOLO(self.weights)
+
+    def predict(self, image):
+        result = self.model(image, verbose=False, device=self.device)[0]
+        boxes = result.boxes
+        return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()
+
+
+@register_backend
+class YOLOv5Backend(DetectorBackend):
+    name = "yolov5"
+    label = "YOLOv5s (yolov5 package)"
+    requires = ("yolov5",)
+    uses_torch = True
+    input_size = (640, 640)
+    supports_batch = True
+    class_map = {2: 3, 3: 4, 5: 6, 7: 8}
+    expected_latency_ms = 100.0
+    accuracy = 0.374
+
+    def __init__(self, device="cpu", weights=None):
+        super().__init__(device)
+        self.weights = weights
+
+    def load(self):
+        import yolov5
+        weights = self.weights if self.weights and os.path.exists(self.weights) else 'yolov5s.pt'
+        self.model = yolov5.load(weights)
+        self.model.to(self.device)
+
+    def predict(self, image):
+        results = self.model(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        detections = results.xyxy[0].cpu().numpy()
+        return detections[:, :4], detections[:, 4], detections[:, 5]
+
+
+@register_backend
+class MobileNetSSDBackend(DetectorBackend):
+    name = "mobilenet_ssd"
+    label = "MobileNet-SSD (OpenCV DNN, Caffe)"
+    files = ("models/MobileNetSSD_deploy.prototxt", "models/MobileNetSSD_deploy.caffemodel")
+    input_size = (300, 300)
+    class_map = {6: 6, 7: 3, 14: 4}  # VOC: bus, car, motorbike
+    expected_latency_ms = 25.0
+    accuracy = 0.20  # Rough COCO equivalent; trained on VOC
+
+    def load(self):
+        self.model = cv2.dnn.readNetFromCaffe(*self.files)
+
+    def predict(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 0.007843, (300, 300), 127.5)
+        self.model.setInput(blob)
+        detections = self.model.forward()[0, 0]
+        boxes = detections[:, 3:7] * np.array([width, height, width, height])
+        return boxes, detections[:, 2], detections[:, 1]
+
+
+class OnnxRuntimeBackend(DetectorBackend):
+    """Runs an exported model (see models.onnx_export) with ONNX Runtime on the CPU"""
+
+    requires = ("onnxruntime",)
+    model_path = ""
+
+    def __init__(self, device="cpu", model_path=None, threads=None, graph_optimization=None, quantized=None):
+        super().__init__("cpu")
+        self.model_path = model_path or self.model_path
+        self.threads = ONNX_SETTINGS["threads"] if threads is None else threads
+        self.graph_optimization = graph_optimization or ONNX_SETTINGS["graph_optimization"]
+        self.quantized = ONNX_SETTINGS["quantized"] if quantized is None else quantized
+        self.session = None
+        self.input_name = None
+
+    @classmethod
+    def probe(cls):
+        available, reason = super().probe()
+        if available and not os.path.exists(cls.model_path):
+            return False, f"missing {cls.model_path} (run python -m models.onnx_export)"
+        return available, reason
+
+    def load(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel,
+                                                   GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization])
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        path = self.model_path
+        if self.quantized:
+            if os.path.exists(quantized_path(path)):
+                path = quantized_path(path)
+            else:
+                print(f"No int8 model at {quantized_path(path)}; using {path}")
+
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.model = self.session
+        self.label = f"{self.label} [{os.path.basename(path)}]"
+
+
+def letterbox(image, size, color=LETTERBOX_COLOR):
+    """
+    Resize an image into size keeping its aspect ratio, padding the rest
+
+    Args:
+        image: BGR frame
+        size: (height, width) of the result
+        color: Grey level of the padding
+
+    Returns:
+        (padded image, ratio, (pad_x, pad_y)); a point (x, y) of the padded
+        image is ((x - pad_x) / ratio, (y - pad_y) / ratio) in the frame
+    """
+    height, width = image.shape[:2]
+    target_height, target_width = size
+    ratio = min(target_width / width, target_height / height)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (target_width - new_width) // 2
+    pad_y = (target_height - new_height) // 2
+    padded = cv2.copyMakeBorder(image, pad_y, target_height - new_height - pad_y,
+                                pad_x, target_width - new_width - pad_x,
+                                cv2.BORDER_CONSTANT, value=(color, color, color))
+    return padded, ratio, (pad_x, pad_y)
+
+
+@register_backend
+class OnnxYOLOv8Backend(OnnxRuntimeBackend):
+    name = "onnx_yolov8"
+    label = "YOLOv8n (ONNX Runtime)"
+    model_path = "models/weights/yolov8n.onnx"
+    input_size = (640, 640)
+    supports_batch = True
+    class_map = {2: 3, 3: 4, 5: 6, 7: 8}
+    expected_latency_ms = 80.0
+    accuracy = 0.373
+    nms_threshold = 0.45  # The exported graph has no NMS
+
+    def predict(self, image):
+        height, width = image.shape[:2]
+        # The model was trained on letterboxed inputs; stretching the frame skews every box
+        padded, ratio, (pad_x, pad_y) = letterbox(image, self.input_size)
+        blob = cv2.dnn.blobFromImage(padded, 1 / 255.0, swapRB=True)
+
+        # (1, 4 + classes, candidates) -> (candidates, 4 + classes)
+        output = self.session.run(None, {self.input_name: blob})[0][0].T
+        class_scores = output[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(output)), class_ids]
+
+        # Center/size to corners, then undo the padding and scaling
+        centers = output[:, :4]
+        boxes = np.column_stack([centers[:, :2] - centers[:, 2:] / 2, centers[:, :2] + centers[:, 2:] / 2])
+        boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y])) / ratio
+        boxes = np.clip(boxes, 0, [width, height, width, height])
+        return boxes, scores, class_ids
+
+
+@register_backend
+class OnnxFasterRCNNBackend(OnnxRuntimeBackend):
+    name = "onnx_fasterrcnn"
+    label = "Faster R-CNN ResNet50-FPN (ONNX Runtime)"
+    model_path = "models/weights/fasterrcnn_resnet50_fpn.onnx"
+    input_size = (800, 1333)
+    class_map = {3: 3, 4: 4, 6: 6, 8: 8}
+    expected_latency_ms = 1800.0
+    accuracy = 0.370
+
+    def predict(self, image):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        tensor = rgb.transpose((2, 0, 1)).astype(np.float32) / 255.0
+        boxes, labels, scores = self.session.run(None, {self.input_name: tensor})
+        return boxes, scores, labels
+
+
+ONNX_BACKENDS = ("onnx_yolov8", "onnx_fasterrcnn")
+
+
+def probe_backends(refresh=False):
+    """{name: (available, reason)} for every registered backend, probed once"""
+    with _probe_lock:
+        for name, cls in BACKENDS.items():
+            if refresh or name not in _probe_results:
+                try:
+                    _probe_results[name] = cls.probe()
+                except Exception as e:
+                    _probe_results[name] = (False, str(e))
+        return dict(_probe_results)
+
+
+def available_backends():
+    return [name for name, (ok, _) in probe_backends().items() if ok]
+
+
+def select_backends(accuracy_target=DEFAULT_ACCURACY_TARGET, prefer=None, candidates=None):
+    """
+    Order the available backends by the selection policy
+
+    Args:
+        accuracy_target: Minimum accuracy for a backend to be chosen for speed
+        prefer: Backend name to try first if it is available
+        candidates: Optional subset of backend names to consider
+
+    Returns:
+        Backend names, best first
+    """
+    names = [name for name in available_backends() if candidates is None or name in candidates]
+    ordered = []
+    if prefer in names:
+        ordered.append(prefer)
+
+    rest = [BACKENDS[name] for name in names if name != prefer]
+    meeting = sorted((cls for cls in rest if cls.accuracy >= accuracy_target),
+                     key=lambda cls: cls.expected_latency_ms)
+    below = sorted((cls for cls in rest if cls.accuracy < accuracy_target),
+                   key=lambda cls: cls.accuracy, reverse=True)
+    ordered.extend(cls.name for cls in meeting + below)
+    return ordered
+
+
+def load_backend(accuracy_target=DEFAULT_ACCURACY_TARGET, prefer=None, candidates=None, device="cpu",
+                 **options):
+    """
+    Load the first backend in policy order that loads successfully
+
+    Args:
+        options: Passed to the preferred backend's constructor (e.g. weights)
+
+    Returns:
+        A loaded DetectorBackend, or None if nothing could be loaded
+    """
+    for name in select_backends(accuracy_target, prefer, candidates):
+        try:
+            backend = BACKENDS[name](device=device, **(options if name == prefer else {}))
+            if backend.uses_torch:
+                apply_torch_settings()
+            print(f"Loading {backend.label}...")
+            backend.load()
+            print(f"{backend.label} loaded")
+            return backend
+        except Exception as e:
+            print(f"Could not load {name}: {e}")
+    print("WARNING: No detection backend could be loaded")
+    return None
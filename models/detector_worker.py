@@ -0,0 +1,349 @@
+"""
+Vehicle detection in a separate process
+
+DetectorWorker runs a VehicleDetector in a spawned worker process so
+PyTorch's thread pools do not compete with Tk and OpenCV in the GUI
+process, and a crashing backend only takes down the worker.
+
+Frames are resized straight into a shared memory FrameRing; the worker
+reads them in place and sends back the (small) structured detection
+arrays over a queue. Up to max_in_flight frames can be queued, so the
+next frame is captured and sent while the current one is inferred:
+
+    worker = DetectorWorker(backend="yolov8", torch_threads=4)
+    detections = worker.detect_vehicles(frame)      # synchronous, like VehicleDetector
+    detections = worker.detect_pipelined(frame)     # never waits; newest finished result
+
+If the worker dies or stops answering it is restarted with exponential
+backoff, up to max_restarts times in a row. A backend that fails to
+load is not retried.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+
+import cv2
+
+from models.detector_backends import COCO_CLASSES, DEFAULT_ACCURACY_TARGET, TORCH_SETTINGS, configure_torch
+from utils.detection_postprocess import empty_detections, rescale
+from utils.instrumentation import pipeline
+from utils.shared_frames import FrameRing
+
+DEFAULT_INPUT_SIZE = (640, 360)  # (width, height) frames are resized to, as for in-process detection
+DEFAULT_SLOTS = 3
+DEFAULT_MAX_IN_FLIGHT = 2
+DEFAULT_START_TIMEOUT = 300.0  # The first load may download weights
+DEFAULT_HANG_TIMEOUT = 60.0
+MAX_RESTARTS = 5
+RESTART_BACKOFF = 1.0  # Seconds before the first restart; doubles with each further one
+STABLE_SECONDS = 120.0  # A worker that ran this long resets the restart count
+
+_READ_TIMEOUT = 0.5
+
+
+def _worker_main(ring_spec, results, stop_event, confidence, options):
+    """Entry point of the worker process"""
+    cv2.setNumThreads(1)  # Resizing is done by the GUI process; leave the cores to torch
+    configure_torch(options["torch_threads"], options["interop_threads"])
+
+    from models.vehicle_detector import VehicleDetector
+
+    detector = VehicleDetector(confidence_threshold=confidence.value, backend=options["backend"],
+                               accuracy_target=options["accuracy_target"], candidates=options["candidates"])
+    if detector.model is None:
+        results.put(("failed", "No detection model could be loaded"))
+        return
+
+    ring = FrameRing.attach(ring_spec)
+    reader = ring.reader(0)
+    parent = multiprocessing.parent_process()
+    results.put(("ready", detector.model_type))
+
+    frame = None
+    try:
+        while not stop_event.is_set():
+            frame = reader.read(timeout=_READ_TIMEOUT)
+            if frame is None:
+                if ring.closed or (parent is not None and not parent.is_alive()):
+                    break
+                continue
+            with frame:
+                detector.set_confidence_threshold(confidence.value)
+                started = time.perf_counter()
+                detections = detector.detect_vehicles(frame.array)
+                seconds = time.perf_counter() - started
+            results.put(("result", frame.seq, detections, seconds))
+    finally:
+        frame = None  # Views into the ring must be gone before it is closed
+        ring.close()
+
+
+class DetectorWorker:
+    """VehicleDetector interface backed by a detector process"""
+
+    def __init__(self, confidence_threshold=0.5, backend="fasterrcnn", accuracy_target=DEFAULT_ACCURACY_TARGET,
+                 candidates=None, input_size=DEFAULT_INPUT_SIZE, torch_threads=None, interop_threads=None,
+                 slots=DEFAULT_SLOTS, max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_restarts=MAX_RESTARTS,
+                 start_timeout=DEFAULT_START_TIMEOUT, hang_timeout=DEFAULT_HANG_TIMEOUT):
+        """
+        Args:
+            confidence_threshold: Minimum detection confidence
+            backend, accuracy_target, candidates: Backend selection, as for VehicleDetector
+            input_size: (width, height) frames are resized to before they are sent
+            torch_threads, interop_threads: PyTorch thread pools of the worker (default: TORCH_SETTINGS)
+            slots: Frames the shared ring holds
+            max_in_flight: Frames sent but not answered yet, at most slots
+            start_timeout: Seconds to wait for the first model load
+            hang_timeout: Seconds without an answer before the worker is restarted
+        """
+        self.classes = COCO_CLASSES
+        self.input_size = input_size
+        self.max_in_flight = min(max_in_flight, slots)
+        self.max_restarts = max_restarts
+        self.hang_timeout = hang_timeout
+
+        self.context = multiprocessing.get_context("spawn")
+        self.confidence = self.context.Value('d', confidence_threshold, lock=False)
+        self.options = {
+            "backend": backend,
+            "accuracy_target": accuracy_target,
+            "candidates": candidates,
+            "torch_threads": TORCH_SETTINGS["threads"] if torch_threads is None else torch_threads,
+            "interop_threads": TORCH_SETTINGS["interop_threads"] if interop_threads is None else interop_threads,
+        }
+
+        width, height = input_size
+        self.ring = FrameRing.create((height, width, 3), slots=slots, readers=1, overwrite=False)
+        self.lock = threading.RLock()
+
+        self.process = None
+        self.results = None
+        self.stop_event = None
+        self.model_type = "none"
+        self.ready = False
+        self.failed = False
+        self.error = None
+        self.restarts = 0
+        self.started_at = 0.0
+        self._restart_at = None
+        self._closed = False
+
+        self._in_flight = {}  # seq -> (submitted at, x scale, y scale)
+        self._done = {}  # seq -> detections, for result()
+        self._latest = empty_detections()
+
+        self._start()
+        if not self.wait_ready(start_timeout):
+            print(f"Detector worker not ready: {self.error or 'timed out'}")
+
+    @property
+    def model(self):
+        """Name of the backend loaded in the worker, or None while it is unavailable"""
+        return self.model_type if self.ready else None
+
+    @property
+    def pending(self):
+        """Frames sent but not answered yet"""
+        return len(self._in_flight)
+
+    def _start(self):
+        # Frames still in the ring belong to the previous worker; the new one starts after them
+        self.ring.reader(0)
+        self._in_flight.clear()
+        self.results = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.process = self.context.Process(target=_worker_main, name="detector-worker", daemon=True,
+                                            args=(self.ring.spec(), self.results, self.stop_event,
+                                                  self.confidence, self.options))
+        self.process.start()
+        self.started_at = time.monotonic()
+        self._restart_at = None
+        self.ready = False
+
+    def _schedule_restart(self, reason):
+        print(f"Detector worker {reason}")
+        self.ready = False
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        for seq in list(self._in_flight):
+            self._done[seq] = empty_detections()  # Lost with the worker
+        self._in_flight.clear()
+
+        if time.monotonic() - self.started_at > STABLE_SECONDS:
+            self.restarts = 0
+        self.restarts += 1
+        if self.restarts > self.max_restarts:
+            self.failed = True
+            self.error = f"Detector worker {reason}; gave up after {self.max_restarts} restarts"
+            print(self.error)
+            return
+        self._restart_at = time.monotonic() + RESTART_BACKOFF * 2 ** (self.restarts - 1)
+
+    def _check_health(self):
+        """Restart a dead or hung worker (after its backoff)"""
+        if self._closed or self.failed:
+            return
+        if self.process is None:
+            if self._restart_at is not None and time.monotonic() >= self._restart_at:
+                print(f"Restarting detector worker (attempt {self.restarts})")
+                self._start()
+            return
+        if not self.process.is_alive():
+            self._schedule_restart(f"exited with code {self.process.exitcode}")
+        elif self._in_flight:
+            oldest = min(submitted for submitted, _, _ in self._in_flight.values())
+            if time.monotonic() - oldest > self.hang_timeout:
+                self._schedule_restart(f"did not answer for {self.hang_timeout:.0f}s")
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == "ready":
+            self.ready = True
+            self.model_type = message[1]
+        elif kind == "failed":
+            # Loading fails the same way every time, so this is not retried
+            self.failed = True
+            self.error = message[1]
+            self.ready = False
+        elif kind == "result":
+            _, seq, detections, seconds = message
+            request = self._in_flight.pop(seq, None)
+            if request is None:
+                return
+            submitted, x_scale, y_scale = request
+            pipeline.record("detection", seconds)
+            pipeline.record("detection_roundtrip", time.monotonic() - submitted)
+            detections = rescale(detections, x_scale, y_scale)
+            self._done[seq] = detections
+            self._latest = detections
+
+    def _drain(self, timeout=0.0):
+        """Handle every message that arrives within timeout; True if any did"""
+        if self._closed:
+            return False  # The results queue is closed
+        handled = False
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                remaining = deadline - time.monotonic()
+                message = self.results.get(timeout=remaining) if remaining > 0 else self.results.get_nowait()
+            except queue.Empty:
+                return handled
+            except (EOFError, OSError):
+                return handled  # Worker died mid-message; _check_health restarts it
+            self._handle(message)
+            handled = True
+            timeout = 0.0
+
+    def wait_ready(self, timeout=DEFAULT_START_TIMEOUT):
+        """Block until the worker has loaded its model; False if it failed or timed out"""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while not self.ready and not self.failed and time.monotonic() < deadline:
+                self._drain(timeout=0.1)
+                self._check_health()
+            return self.ready
+
+    def submit(self, frame, wait=False, timeout=None):
+        """
+        Send a frame for detection
+
+        Args:
+            wait: Wait for a free slot instead of returning None when max_in_flight frames are queued
+            timeout: Longest wait in seconds (None = as long as it takes)
+
+        Returns:
+            Sequence number of the request, or None if it was not sent
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while True:
+                self._drain()
+                self._check_health()
+                if self.failed or self._closed:
+                    return None
+                if self.ready and len(self._in_flight) < self.max_in_flight:
+                    break
+                if not wait or (deadline is not None and time.monotonic() >= deadline):
+                    return None
+                self._drain(timeout=0.05)
+
+            acquired = self.ring.acquire(timeout=0)
+            if acquired is None:
+                return None
+            seq, slot = acquired
+            height, width = frame.shape[:2]
+            if frame.shape == slot.shape:
+                slot[...] = frame
+            else:
+                cv2.resize(frame, self.input_size, dst=slot)
+            self.ring.commit()
+            self._in_flight[seq] = (time.monotonic(), width / self.input_size[0], height / self.input_size[1])
+            return seq
+
+    def poll(self, timeout=0.0):
+        """
+        Finished requests
+
+        Returns:
+            List of (sequence number, detections in the submitted frame's pixels), oldest first
+        """
+        with self.lock:
+            self._drain(timeout)
+            self._check_health()
+            done = sorted(self._done.items())
+            self._done.clear()
+            return done
+
+    def result(self, seq, timeout=None):
+        """Detections for one request, waiting for them; empty if they were lost or timed out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while seq not in self._done:
+                if seq not in self._in_flight or (deadline is not None and time.monotonic() >= deadline):
+                    return empty_detections()
+                self._drain(timeout=0.05)
+                self._check_health()
+            return self._done.pop(seq)
+
+    def detect_vehicles(self, image):
+        """Detect vehicles in one frame, waiting for the answer"""
+        seq = self.submit(image, wait=True, timeout=self.hang_timeout)
+        if seq is None:
+            return empty_detections()
+        return self.result(seq, timeout=self.hang_timeout)
+
+    def detect_pipelined(self, image):
+        """
+        Send the frame if the worker has room and return the newest finished detections
+
+        Never waits for inference, so the caller keeps capturing while the
+        worker is busy; the result may belong to an earlier frame.
+        """
+        self.submit(image)
+        self.poll()
+        return self._latest
+
+    def set_confidence_threshold(self, threshold):
+        """Update the confidence threshold (picked up by the worker on its next frame)"""
+        self.confidence.value = threshold
+
+    def close(self):
+        """Stop the worker process and free the frame ring"""
+        with self.lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.ring.close_stream()
+            if self.process is not None:
+                self.stop_event.set()
+                self.process.join(timeout=2 * _READ_TIMEOUT + 1)
+                if self.process.is_alive():
+                    self.process.terminate()
+                    self.process.join(timeout=1)
+            if self.results is not None:
+                self.results.close()
+            self.ring.unlink()
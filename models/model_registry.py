@@ -0,0 +1,219 @@
+"""
+Shared registry of allocation models
+
+Each named model is loaded once, on first use, and the same instance is
+handed to every consumer. Saved models are versioned native XGBoost UBJSON
+files listed in a JSON manifest; a legacy pickle is imported once and
+then left alone.
+"""
+
+import json
+import os
+import pickle
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+xgb = lazy_import("xgboost")
+
+ALLOCATION_MODEL = "parking_allocation_model"
+MANIFEST_FILE = "manifest.json"
+MODEL_FORMAT = "ubj"
+
+# Versions kept on disk per model
+DEFAULT_KEEP_VERSIONS = 5
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def create_allocation_model():
+    """Create and train a new XGBoost allocation model with initial data"""
+    model = xgb.XGBClassifier(
+        n_estimators=100,
+        learning_rate=0.1,
+        max_depth=5,
+        gamma=0.1,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        objective='binary:logistic',
+        scale_pos_weight=1,
+        random_state=42
+    )
+
+    X = pd.DataFrame({
+        'distance_to_entrance': [10, 20, 50, 30, 40, 60, 70, 25, 35, 45],
+        'time_since_last_occupied': [60, 30, 15, 120, 45, 90, 10, 50, 75, 110],
+        'vehicle_size': [1, 2, 3, 1, 2, 3, 1, 2, 2, 1]
+    })
+
+    # Initial target labels (1 = good allocation)
+    y = np.array([1, 1, 0, 1, 0, 1, 0, 1, 0, 1])
+
+    model.fit(X, y)
+    return model
+
+
+class ModelRegistry:
+    """Loads models lazily, shares them and saves versioned artifacts"""
+
+    def __init__(self, models_dir, keep_versions=DEFAULT_KEEP_VERSIONS):
+        self.models_dir = models_dir
+        self.keep_versions = keep_versions
+        os.makedirs(models_dir, exist_ok=True)
+
+        self.manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+        self.lock = threading.RLock()
+        self._models = {}
+        self._factories = {ALLOCATION_MODEL: create_allocation_model}
+        self._listeners = {}
+
+    def register(self, name, factory):
+        """Set the function that creates a model when none has been saved"""
+        with self.lock:
+            self._factories[name] = factory
+
+    def subscribe(self, name, callback):
+        """Call callback(model) whenever a new version of the model is published"""
+        with self.lock:
+            self._listeners.setdefault(name, []).append(callback)
+
+    def get(self, name=ALLOCATION_MODEL):
+        """The shared instance of a model, loading or creating it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self.lock:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def is_loaded(self, name=ALLOCATION_MODEL):
+        return name in self._models
+
+    def publish(self, name, model, source="retrained"):
+        """
+        Replace the shared model and save it as a new version
+
+        Returns:
+            The new version number
+        """
+        with self.lock:
+            self._models[name] = model
+            version = self._save(name, model, source)
+            listeners = list(self._listeners.get(name, []))
+
+        for callback in listeners:
+            try:
+                callback(model)
+            except Exception as e:
+                print(f"Error notifying model listener: {str(e)}")
+        return version
+
+    def current_version(self, name=ALLOCATION_MODEL):
+        entry = self._read_manifest().get("models", {}).get(name)
+        return entry["current"] if entry else None
+
+    def _load(self, name):
+        model = self._load_current(name)
+        if model is not None:
+            return model
+
+        # One-time import of the pickle written by older versions
+        legacy_path = os.path.join(self.models_dir, f"{name}.pkl")
+        if os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'rb') as f:
+                    legacy_model = pickle.load(f)
+                self._save(name, legacy_model, "imported")
+                print(f"Imported legacy model {legacy_path}")
+
+                # Reload from the native file so the object matches the installed XGBoost
+                return self._load_current(name) or legacy_model
+            except Exception as e:
+                print(f"Error importing legacy model: {str(e)}. Creating a new one.")
+
+        model = self._factories[name]()
+        self._save(name, model, "initial")
+        return model
+
+    def _load_current(self, name):
+        """Current saved version of a model, or None"""
+        entry = self._read_manifest().get("models", {}).get(name)
+        if not entry:
+            return None
+        version = next((v for v in entry["versions"] if v["version"] == entry["current"]), None)
+        if version is None:
+            return None
+        try:
+            model = xgb.XGBClassifier()
+            model.load_model(os.path.join(self.models_dir, version["file"]))
+            print(f"Loaded {name} version {version['version']}")
+            return model
+        except Exception as e:
+            print(f"Error loading {name} version {version['version']}: {str(e)}")
+            return None
+
+    def _save(self, name, model, source):
+        manifest = self._read_manifest()
+        entry = manifest.setdefault("models", {}).setdefault(name, {"current": 0, "versions": []})
+        version = max([v["version"] for v in entry["versions"]], default=0) + 1
+        filename = f"{name}-v{version:04d}.{MODEL_FORMAT}"
+
+        try:
+            tmp_path = os.path.join(self.models_dir, f"{filename}.tmp.{MODEL_FORMAT}")
+            model.save_model(tmp_path)
+            os.replace(tmp_path, os.path.join(self.models_dir, filename))
+        except Exception as e:
+            print(f"Error saving {name}: {str(e)}")
+            return entry["current"] or None
+
+        entry["versions"].append({
+            "version": version,
+            "file": filename,
+            "format": MODEL_FORMAT,
+            "source": source,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        })
+        entry["current"] = version
+
+        # Drop the oldest artifacts
+        while len(entry["versions"]) > self.keep_versions:
+            old = entry["versions"].pop(0)
+            try:
+                os.remove(os.path.join(self.models_dir, old["file"]))
+            except OSError:
+                pass
+
+        self._write_manifest(manifest)
+        return version
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading model manifest: {str(e)}")
+            return {}
+
+    def _write_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def get_registry(config_dir="config"):
+    """The registry shared by everything using config_dir"""
+    models_dir = os.path.abspath(os.path.join(config_dir, "models"))
+    with _registries_lock:
+        if models_dir not in _registries:
+            _registries[models_dir] = ModelRegistry(models_dir)
+        return _registries[models_dir]
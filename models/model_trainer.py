@@ -0,0 +1,194 @@
+"""
+Background retraining for the allocation model
+
+Feedback is appended to a JSON-lines store that accumulates across runs.
+Retraining runs in a worker process on a snapshot of the serialized
+booster and the feedback. Each round starts again from the trees of the
+base model and boosts a fixed number of rounds on all feedback, so the
+model does not grow with every round and old feedback is not counted
+again and again. The caller swaps the returned model in when it is ready,
+so allocation never waits for training.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.allocation_core import FEATURE_NAMES
+from utils.lazy_import import lazy_import
+
+xgb = lazy_import("xgboost")
+
+FEEDBACK_FILE = "allocation_feedback.jsonl"
+
+# Trees added on top of the base model by retraining
+DEFAULT_BOOST_ROUNDS = 10
+
+# Booster attribute recording how many trees belong to the base model
+BASE_ROUNDS_ATTR = "base_rounds"
+
+
+class FeedbackStore:
+    """Append-only store of allocation feedback"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.count = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.count = sum(1 for line in f if line.strip())
+
+    def __len__(self):
+        return self.count
+
+    def add(self, features, successful, **extra):
+        """
+        Store one feedback entry
+
+        Args:
+            features: Model features of the allocation, in FEATURE_NAMES order
+            successful: Whether the allocation was good
+            extra: Additional JSON-serializable fields kept for reference
+        """
+        entry = dict(extra)
+        entry['features'] = [float(value) for value in features[:len(FEATURE_NAMES)]]
+        entry['successful'] = 1 if successful else 0
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self.count += 1
+
+    def training_data(self):
+        """
+        All stored feedback as training arrays
+
+        Returns:
+            (X, y) with X of shape (n, len(FEATURE_NAMES))
+        """
+        features, labels = [], []
+        with self.lock:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # Torn last line after a crash
+                        features.append(entry['features'])
+                        labels.append(entry['successful'])
+        return (np.array(features, dtype=np.float32).reshape(-1, len(FEATURE_NAMES)),
+                np.array(labels, dtype=np.float32))
+
+
+def train_incremental(model_bytes, params, X, y, num_boost_round=DEFAULT_BOOST_ROUNDS):
+    """
+    Refit the feedback trees of a serialized booster
+
+    Trees added by earlier rounds are dropped and num_boost_round new trees
+    are boosted on top of the base model, so the result always has the base
+    trees plus num_boost_round. A booster without the base-rounds attribute
+    is treated as a base model.
+
+    Runs in the worker process, so everything in and out is plain bytes/arrays.
+
+    Returns:
+        The updated booster serialized as UBJSON
+    """
+    booster = xgb.Booster()
+    booster.load_model(bytearray(model_bytes))
+
+    base_rounds = booster.attr(BASE_ROUNDS_ATTR)
+    base_rounds = int(base_rounds) if base_rounds is not None else booster.num_boosted_rounds()
+    if booster.num_boosted_rounds() > base_rounds:
+        booster = booster[:base_rounds]
+
+    dtrain = xgb.DMatrix(X, label=y, feature_names=FEATURE_NAMES)
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, xgb_model=booster)
+    booster.set_attr(**{BASE_ROUNDS_ATTR: str(base_rounds)})
+    return bytes(booster.save_raw('ubj'))
+
+
+class BackgroundTrainer:
+    """Runs at most one retraining job at a time in a worker process"""
+
+    def __init__(self, num_boost_round=DEFAULT_BOOST_ROUNDS):
+        self.num_boost_round = num_boost_round
+        self.lock = threading.Lock()
+        self._executor = None
+        self._running = False
+        self._pending = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawn rather than fork: the parent has Tk and several threads running
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, snapshot, on_done):
+        """
+        Queue a retraining job
+
+        If a job is already running, one follow-up job is queued; its snapshot
+        is taken when it starts, so it sees all feedback stored until then.
+
+        Args:
+            snapshot: Callable returning (model_bytes, params, X, y), or None to skip
+            on_done: Called with the new model bytes (UBJSON), or None if training failed
+        """
+        with self.lock:
+            if self._running:
+                self._pending = (snapshot, on_done)
+                return
+            self._running = True
+        self._start(snapshot, on_done)
+
+    def _start(self, snapshot, on_done):
+        try:
+            job = snapshot()
+            if job is None:
+                self._finish()
+                return
+            model_bytes, params, X, y = job
+            future = self._get_executor().submit(train_incremental, model_bytes, params, X, y,
+                                                 self.num_boost_round)
+        except Exception as e:
+            print(f"Error starting model retraining: {str(e)}")
+            self._finish()
+            return
+        future.add_done_callback(lambda f: self._on_future_done(f, on_done))
+
+    def _on_future_done(self, future, on_done):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error retraining model: {str(e)}")
+            result = None
+        try:
+            on_done(result)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        with self.lock:
+            pending, self._pending = self._pending, None
+            self._running = pending is not None
+        if pending is not None:
+            self._start(*pending)
+
+    @property
+    def busy(self):
+        return self._running
+
+    def shutdown(self):
+        with self.lock:
+            self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,97 @@
+"""
+Export detection weights to ONNX for the ONNX Runtime backends
+
+    python -m models.onnx_export yolov8 --quantize
+    python -m models.onnx_export fasterrcnn
+
+Exported files go where the onnx_* backends in models.detector_backends
+look for them. With --quantize an int8 copy (dynamic quantization of the
+weights) is written next to the float model.
+"""
+
+import argparse
+import os
+import shutil
+
+from models.detector_backends import (OnnxFasterRCNNBackend, OnnxYOLOv8Backend, probe_backends,
+                                      quantized_path)
+
+
+def export_yolov8(weights="yolov8n.pt", output_path=OnnxYOLOv8Backend.model_path, imgsz=640, opset=12):
+    """
+    Export ultralytics YOLOv8 weights with a fixed input size
+
+    Returns:
+        Path of the exported model
+    """
+    from ultralytics import YOLO
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, opset=opset, dynamic=False, simplify=False)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        shutil.move(exported, output_path)
+    print(f"Exported {weights} to {output_path}")
+    return output_path
+
+
+def export_fasterrcnn(output_path=OnnxFasterRCNNBackend.model_path, input_size=(800, 1333), opset=11):
+    """
+    Export torchvision Faster R-CNN ResNet50-FPN; height and width stay dynamic
+
+    Returns:
+        Path of the exported model
+    """
+    import torch
+    from torchvision.models import detection
+    from torchvision.models.detection import FasterRCNN_ResNet50_FPN_Weights
+
+    model = detection.fasterrcnn_resnet50_fpn(weights=FasterRCNN_ResNet50_FPN_Weights.DEFAULT)
+    model.eval()
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    dummy = torch.rand(3, *input_size)
+    torch.onnx.export(model, ([dummy],), output_path, opset_version=opset,
+                      input_names=["images"], output_names=["boxes", "labels", "scores"],
+                      dynamic_axes={"images": {1: "height", 2: "width"},
+                                    "boxes": {0: "detections"}, "labels": {0: "detections"},
+                                    "scores": {0: "detections"}})
+    print(f"Exported Faster R-CNN to {output_path}")
+    return output_path
+
+
+def quantize_int8(model_path, output_path=None):
+    """
+    Dynamic int8 quantization of a model's weights
+
+    Returns:
+        Path of the quantized model
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = output_path or quantized_path(model_path)
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {model_path} to {output_path}")
+    return output_path
+
+
+EXPORTERS = {
+    "yolov8": export_yolov8,
+    "fasterrcnn": export_fasterrcnn,
+}
+
+
+def export_model(name, quantize=False):
+    """Export one model (and optionally its int8 copy), then re-probe the backends"""
+    path = EXPORTERS[name]()
+    if quantize:
+        quantize_int8(path)
+    probe_backends(refresh=True)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export detection models to ONNX")
+    parser.add_argument("model", choices=sorted(EXPORTERS))
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 dynamically quantized copy")
+    args = parser.parse_args()
+    export_model(args.model, args.quantize)
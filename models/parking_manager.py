@@ -3,15 +3,16 @@ import numpy as np
 import threading
 import time
 import os
-import pickle
 from datetime import datetime
+from utils.occupancy import DEFAULT_FILL_RATIO, score_parking_spaces
+from utils.resource_manager import load_parking_layout, save_parking_positions
 
 
 class ParkingManager:
     """Core parking management functionality separate from UI"""
 
     DEFAULT_CONFIDENCE = 0.6
-    DEFAULT_THRESHOLD = 500
+    DEFAULT_THRESHOLD = DEFAULT_FILL_RATIO
     MIN_CONTOUR_SIZE = 40
     DEFAULT_OFFSET = 10
     DEFAULT_LINE_HEIGHT = 400
@@ -31,7 +32,8 @@ class ParkingManager:
         self.matches = []
 
         # Detection parameters
-        self.parking_threshold = self.DEFAULT_THRESHOLD
+        self.parking_threshold = self.DEFAULT_THRESHOLD  # Fill ratio, 0-1
+        self.space_thresholds = None
         self.detection_mode = "parking"
         self.line_height = self.DEFAULT_LINE_HEIGHT
         self.min_contour_width = self.MIN_CONTOUR_SIZE
@@ -67,17 +69,21 @@ class ParkingManager:
     def load_parking_positions(self, reference_image):
         """Load parking positions from file"""
         try:
-            pos_file = os.path.join(self.config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}')
-
-            if os.path.exists(pos_file):
-                with open(pos_file, 'rb') as f:
-                    self.posList = pickle.load(f)
-                    self.total_spaces = len(self.posList)
-                    self.free_spaces = 0
-                    self.occupied_spaces = self.total_spaces
-                    return True
+            layout = load_parking_layout(self.config_dir, reference_image,
+                                         self.reference_dimensions.get(reference_image))
+
+            if layout is not None:
+                self.posList = layout.to_pos_list()
+                self.space_thresholds = layout.thresholds if layout.has_thresholds() else None
+                if layout.reference_dimensions:
+                    self.reference_dimensions[reference_image] = layout.reference_dimensions
+                self.total_spaces = len(self.posList)
+                self.free_spaces = 0
+                self.occupied_spaces = self.total_spaces
+                return True
             else:
                 self.posList = []
+                self.space_thresholds = None
                 self.total_spaces = 0
                 self.free_spaces = 0
                 self.occupied_spaces = 0
@@ -88,28 +94,24 @@ class ParkingManager:
 
     def save_parking_positions(self, reference_image):
         """Save parking positions to file"""
-        try:
-            pos_file = os.path.join(self.config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}')
-            with open(pos_file, 'wb') as f:
-                pickle.dump(self.posList, f)
-            return True
-        except Exception as e:
-            print(f"Error saving parking positions: {str(e)}")
-            return False
-
-    def check_parking_space(self, img_pro, img):
+        # Keep calibrated thresholds only while they still match the spaces
+        if self.space_thresholds is not None and len(self.space_thresholds) != len(self.posList):
+            print("Parking spaces changed, discarding calibrated thresholds")
+            self.space_thresholds = None
+        return save_parking_positions(self.posList, self.config_dir, reference_image,
+                                      self.reference_dimensions.get(reference_image), self.space_thresholds)
+
+    def check_parking_space(self, img_pro, img, scores=None):
         """Process frame to check parking spaces"""
+        if scores is None:
+            scores = score_parking_spaces(img_pro, self.posList, self.parking_threshold, self.space_thresholds)
+        occupied, ratios, valid = scores
+
         space_counter = 0
         for i, (x, y, w, h) in enumerate(self.posList):
             # Ensure coordinates are within image bounds
-            if (y >= 0 and y + h < img_pro.shape[0] and
-                    x >= 0 and x + w < img_pro.shape[1]):
-
-                # Get crop of parking space
-                img_crop = img_pro[y:y + h, x:x + w]
-                count = cv2.countNonZero(img_crop)
-
-                if count < self.parking_threshold:
+            if valid[i]:
+                if not occupied[i]:
                     color = (0, 255, 0)  # Green for free
                     space_counter += 1
                 else:
@@ -117,15 +119,16 @@ class ParkingManager:
 
                 cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
 
-                # Add count text
+                # Add fill ratio text
+                text = f"{ratios[i]:.2f}"
                 text_scale = 0.6
                 text_thickness = 2
                 (text_width, text_height), _ = cv2.getTextSize(
-                    str(count), cv2.FONT_HERSHEY_SIMPLEX, text_scale, text_thickness
+                    text, cv2.FONT_HERSHEY_SIMPLEX, text_scale, text_thickness
                 )
                 text_x = x + (w - text_width) // 2
                 text_y = y + h - 5
-                cv2.putText(img, str(count), (text_x, text_y),
+                cv2.putText(img, text, (text_x, text_y),
                             cv2.FONT_HERSHEY_SIMPLEX, text_scale, (255, 255, 255), text_thickness)
 
         # Update counters
@@ -138,7 +141,9 @@ class ParkingManager:
     def update_allocation_status(self, img_pro, img):
         """Update both the original parking status and the allocation system"""
         # First, process with the existing method to determine which spaces are free/occupied
-        img = self.check_parking_space(img_pro, img)
+        scores = score_parking_spaces(img_pro, self.posList, self.parking_threshold, self.space_thresholds)
+        img = self.check_parking_space(img_pro, img, scores)
+        occupied = scores[0]
 
         # Then update the allocation system
         space_ids = []
@@ -155,9 +160,7 @@ class ParkingManager:
             full_space_id = f"{space_id}-{section}"
 
             # Get status from existing system
-            img_crop = img_pro[y:y + h, x:x + w]
-            count = cv2.countNonZero(img_crop)
-            is_occupied = count >= self.parking_threshold
+            is_occupied = bool(occupied[i])
 
             space_ids.append(space_id)
             statuses.append(is_occupied)
@@ -1,25 +1,36 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-import xgboost as xgb
-import pandas as pd
 from datetime import datetime
-import pickle
 import os
+from collections import deque
+
+from models.model_registry import ALLOCATION_MODEL, get_registry
+from utils.lazy_import import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+patches = lazy_import("matplotlib.patches")
+mcollections = lazy_import("matplotlib.collections")
+mcolors = lazy_import("matplotlib.colors")
+xgb = lazy_import("xgboost")
+pd = lazy_import("pandas")
 
 
 class ParkingVisualizer:
-    def __init__(self, config_dir="config", logs_dir="logs"):
+    # In-memory history per space; the occupancy journal keeps the full record
+    HISTORY_LENGTH = 100
+
+    def __init__(self, config_dir="config", logs_dir="logs", allocation_engine=None):
         self.config_dir = config_dir
         self.logs_dir = logs_dir
 
+        # Batched allocation is delegated to the engine, so there is one feature pipeline
+        self.allocation_engine = allocation_engine
+
         # Ensure directories exist
         self._ensure_directories()
 
-        # AI model for parking allocation
-        self.model = None
-        self.load_model()
+        # AI model for parking allocation, shared with the allocation engine and loaded on first use
+        self.registry = get_registry(config_dir)
 
         # Parking data
         self.parking_data = {}
@@ -42,62 +53,19 @@ class ParkingVisualizer:
         if not os.path.exists(model_dir):
             os.makedirs(model_dir)
 
-    def load_model(self):
-        """Load XGBoost model for parking allocation from file or create a new one"""
-        model_path = os.path.join(self.config_dir, "models", "parking_allocation_model.pkl")
-
-        if os.path.exists(model_path):
-            try:
-                with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                print("Loaded existing XGBoost model")
-            except Exception as e:
-                print(f"Error loading model: {str(e)}. Creating a new one.")
-                self._create_new_model()
-        else:
-            self._create_new_model()
-
-    def _create_new_model(self):
-        """Create and initialize a new XGBoost model"""
-        # Initialize XGBoost model with parking-specific parameters
-        self.model = xgb.XGBClassifier(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            min_child_weight=1,
-            gamma=0,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            objective='binary:logistic',
-            nthread=4,
-            seed=42
-        )
-
-        # Create initial training data with basic features
-        # This will be refined as the system collects more data
-        initial_data = {
-            'distance_to_entrance': [10, 20, 30, 40, 50, 60, 70, 80, 90, 100],
-            'time_since_last_occupied': [5, 10, 15, 20, 25, 30, 35, 40, 45, 50],
-            'vehicle_size': [1, 2, 3, 1, 2, 3, 1, 2, 3, 2],
-            'optimal_allocation': [1, 1, 0, 1, 0, 1, 0, 1, 0, 1]  # Initial labels
-        }
+    @property
+    def model(self):
+        """The shared XGBoost allocation model"""
+        return self.registry.get(ALLOCATION_MODEL)
 
-        df = pd.DataFrame(initial_data)
-        X = df.drop('optimal_allocation', axis=1)
-        y = df['optimal_allocation']
-
-        # Train the model with initial data
-        self.model.fit(X, y)
-
-        # Save the model
-        self.save_model()
+    def load_model(self):
+        """Load the shared XGBoost model now instead of on first allocation"""
+        return self.model
 
     def save_model(self):
-        """Save the XGBoost model to file"""
+        """Save the current model as a new version"""
         try:
-            model_path = os.path.join(self.config_dir, "models", "parking_allocation_model.pkl")
-            with open(model_path, 'wb') as f:
-                pickle.dump(self.model, f)
+            self.registry.publish(ALLOCATION_MODEL, self.model, source="saved")
             print("Model saved successfully")
         except Exception as e:
             print(f"Error saving model: {str(e)}")
@@ -112,11 +80,11 @@ class ParkingVisualizer:
         X = df.drop('optimal_allocation', axis=1)
         y = df['optimal_allocation']
 
-        # Update model with new data
-        self.model.fit(X, y)
+        # Fit a copy so other users of the shared model never see a half-trained one
+        model = xgb.XGBClassifier(**self.model.get_params())
+        model.fit(X, y)
 
-        # Save updated model
-        self.save_model()
+        self.registry.publish(ALLOCATION_MODEL, model, source="updated")
 
         print("Model updated successfully with new data")
 
@@ -138,7 +106,7 @@ class ParkingVisualizer:
                 'last_state_change': datetime.now(),
                 'distance_to_entrance': distance,
                 'allocation_score': 0,
-                'occupation_history': []
+                'occupation_history': deque(maxlen=self.HISTORY_LENGTH)
             }
 
     def update_parking_status(self, space_ids, statuses):
@@ -149,15 +117,14 @@ class ParkingVisualizer:
             if space_id in self.parking_data:
                 # If status changed, update history
                 if self.parking_data[space_id]['occupied'] != is_occupied:
-                    self.parking_data[space_id]['last_state_change'] = current_time
-
-                    # Add to history
+                    # Add to history (duration of the state that just ended)
                     history_entry = {
                         'timestamp': current_time,
                         'state': 'occupied' if is_occupied else 'free',
                         'duration': (current_time - self.parking_data[space_id]['last_state_change']).total_seconds()
                     }
                     self.parking_data[space_id]['occupation_history'].append(history_entry)
+                    self.parking_data[space_id]['last_state_change'] = current_time
 
                 # Update status
                 self.parking_data[space_id]['occupied'] = is_occupied
@@ -231,6 +198,52 @@ class ParkingVisualizer:
 
         return best_space_id
 
+    def _engine(self):
+        if self.allocation_engine is None:
+            from models.allocation_engine import ParkingAllocationEngine
+            self.allocation_engine = ParkingAllocationEngine(config_dir=self.config_dir)
+        return self.allocation_engine
+
+    def allocate_many(self, vehicles):
+        """
+        Allocate a queue of vehicles with one batched model call
+
+        Scoring and the joint assignment are done by
+        ParkingAllocationEngine.allocate_many; this only records the result.
+
+        Parameters:
+        - vehicles: List of (vehicle_id, vehicle_size) tuples in arrival order
+
+        Returns:
+        - Dictionary of vehicle_id -> allocated space ID (None if the lot is full)
+        """
+        allocations = {vehicle_id: None for vehicle_id, _ in vehicles}
+        if not vehicles or all(data['occupied'] for data in self.parking_data.values()):
+            return allocations
+
+        current_time = datetime.now()
+        sizes = dict(vehicles)
+        for vehicle_id, space_id, score in self._engine().allocate_many(self.parking_data, vehicles):
+            if space_id is None:
+                continue
+            vehicle_size = sizes[vehicle_id]
+
+            self.parking_data[space_id]['occupied'] = True
+            self.parking_data[space_id]['vehicle_id'] = vehicle_id
+            self.parking_data[space_id]['allocation_score'] = score
+            self.parking_data[space_id]['last_state_change'] = current_time
+
+            self.allocation_history.append({
+                'timestamp': current_time,
+                'vehicle_id': vehicle_id,
+                'space_id': space_id,
+                'score': score,
+                'vehicle_size': vehicle_size
+            })
+            allocations[vehicle_id] = space_id
+
+        return allocations
+
     def generate_visualization(self, save_path=None):
         """Generate a visual representation of the parking lot"""
         # Create figure and axis
@@ -245,27 +258,16 @@ class ParkingVisualizer:
         ax.set_xlim(0, cols * self.space_width + self.margin * 2)
         ax.set_ylim(0, rows * self.space_height + self.margin * 2)
 
-        # Draw parking spaces
-        for i, (space_id, data) in enumerate(self.parking_data.items()):
-            row = i // cols
-            col = i % cols
-
-            x = col * self.space_width + self.margin
-            y = row * self.space_height + self.margin
-
-            # Determine color based on occupancy
-            if data['occupied']:
-                color = 'red'
-                alpha = 0.7
-            else:
-                color = 'green'
-                alpha = 0.5
-
-            # Draw the parking space rectangle
-            rect = Rectangle((x, y), self.space_width - 5, self.space_height - 5,
-                             linewidth=2, edgecolor='black', facecolor=color, alpha=alpha)
-            ax.add_patch(rect)
+        # All spaces are one collection rather than an artist each
+        index = np.arange(num_spaces)
+        corners = np.column_stack([(index % cols) * self.space_width + self.margin,
+                                   (index // cols) * self.space_height + self.margin])
+        occupied = np.array([data['occupied'] for data in self.parking_data.values()], dtype=bool)
+        colors = np.where(occupied[:, None], mcolors.to_rgba('red', 0.7), mcolors.to_rgba('green', 0.5))
+        rects = [patches.Rectangle((x, y), self.space_width - 5, self.space_height - 5) for x, y in corners]
+        ax.add_collection(mcollections.PatchCollection(rects, facecolors=colors, edgecolors='black', linewidths=2))
 
+        for (x, y), (space_id, data) in zip(corners, self.parking_data.items()):
             # Add space ID
             ax.text(x + 5, y + 5, space_id, fontsize=10, weight='bold')
 
@@ -280,8 +282,8 @@ class ParkingVisualizer:
                 ax.text(x + self.space_width - 30, y + 5, score_text, fontsize=8)
 
         # Add legend and title
-        green_patch = Rectangle((0, 0), 1, 1, facecolor='green', alpha=0.5)
-        red_patch = Rectangle((0, 0), 1, 1, facecolor='red', alpha=0.7)
+        green_patch = patches.Rectangle((0, 0), 1, 1, facecolor='green', alpha=0.5)
+        red_patch = patches.Rectangle((0, 0), 1, 1, facecolor='red', alpha=0.7)
         ax.legend([green_patch, red_patch], ['Free', 'Occupied'], loc='upper right')
 
         # Add statistics
@@ -0,0 +1,52 @@
+import sys
+
+import numpy as np
+import pytest
+
+from models.allocation_core import solve_assignment
+
+
+@pytest.fixture(params=["hungarian", "greedy"])
+def method(request, monkeypatch):
+    if request.param == "greedy":
+        # A None entry makes the scipy import fail, as if it was not installed
+        monkeypatch.setitem(sys.modules, "scipy.optimize", None)
+    return request.param
+
+
+def test_every_space_is_used_once(method):
+    scores = np.random.default_rng(0).random((6, 10))
+
+    assignment = solve_assignment(scores)
+
+    assert (assignment >= 0).all()
+    assert len(set(assignment.tolist())) == 6
+
+
+def test_more_vehicles_than_spaces(method):
+    scores = np.array([[0.9, 0.1], [0.8, 0.2], [0.7, 0.3], [0.6, 0.4]])
+
+    assignment = solve_assignment(scores)
+
+    # The earliest vehicles are served
+    assert sorted(assignment[:2].tolist()) == [0, 1]
+    assert assignment[2:].tolist() == [-1, -1]
+
+
+def test_no_spaces_or_vehicles(method):
+    assert solve_assignment(np.zeros((3, 0))).tolist() == [-1, -1, -1]
+    assert len(solve_assignment(np.zeros((0, 4)))) == 0
+
+
+def test_hungarian_maximizes_total_score():
+    scores = np.array([[0.9, 0.8], [0.85, 0.1]])
+
+    # Greedy would give the first vehicle space 0 for a total of 1.0
+    assert solve_assignment(scores).tolist() == [1, 0]
+
+
+def test_greedy_takes_best_remaining_space_in_arrival_order(monkeypatch):
+    monkeypatch.setitem(sys.modules, "scipy.optimize", None)
+    scores = np.array([[0.9, 0.8, 0.1], [0.9, 0.8, 0.1], [0.85, 0.1, 0.5]])
+
+    assert solve_assignment(scores).tolist() == [0, 1, 2]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from models.allocation_core import AllocationCore
+from models.allocation_index import AllocationIndex
+
+NOW = 1_000_000.0
+
+
+def _predict(X):
+    # Prefers spaces near the entrance that have been free for a while; larger vehicles shift the optimum
+    return 1.0 / (1.0 + np.abs(X[:, 0] - 50 * X[:, 2]) / 100) + np.minimum(X[:, 1], 60) / 600
+
+
+def _spaces(count, rng):
+    return {
+        f"S{i + 1}-{'AB'[i % 2]}{1 + (i // 2) % 2}": {
+            'occupied': bool(rng.random() < 0.5),
+            'distance_to_entrance': float(rng.integers(0, 500)),
+            'last_state_change': NOW - float(rng.integers(0, 7200)),
+        }
+        for i in range(count)
+    }
+
+
+def _brute_force(core, vehicle_size, preferred_section, weight=0.3):
+    """Balanced score of every free row, keyed by row"""
+    rows, scores, _ = core.score_free_spaces(_predict, vehicle_size, preferred_section, weight, NOW)
+    return dict(zip(rows.tolist(), scores.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_heap_matches_brute_force_argmax(seed):
+    rng = np.random.default_rng(seed)
+    core = AllocationCore()
+    core.rebuild(_spaces(40, rng))
+    index = AllocationIndex(core, _predict, rebuild_interval=float('inf'))
+
+    for step in range(60):
+        for size in (1, 2, 3):
+            for preferred in (None, "A1", "B2"):
+                expected = _brute_force(core, size, preferred)
+                best = index.best(size, preferred, now=NOW)
+                if not expected:
+                    assert best is None
+                    continue
+                row, score, _ = best
+                # Ties may resolve to a different row, but never to a worse score
+                assert score == pytest.approx(max(expected.values()))
+                assert expected[row] == pytest.approx(score)
+
+        # Flip a few spaces and let the index catch up lazily
+        changed = []
+        for space_id in rng.choice(core.space_ids, size=3, replace=False):
+            row = core.set_occupied(space_id, not core.occupied[core.index[space_id]], NOW - step)
+            if row is not None:
+                changed.append(row)
+        index.update(changed, now=NOW)
+
+
+def test_full_lot_has_no_best_space():
+    core = AllocationCore()
+    core.rebuild({"S1-A1": {'occupied': True, 'distance_to_entrance': 10.0, 'last_state_change': NOW}})
+    index = AllocationIndex(core, _predict)
+
+    assert index.best(1, now=NOW) is None
+
+    index.update([core.set_occupied("S1-A1", False, NOW)], now=NOW)
+    assert index.best(1, now=NOW)[0] == 0
+
+
+def test_resized_lot_triggers_rebuild():
+    rng = np.random.default_rng(0)
+    core = AllocationCore()
+    core.rebuild(_spaces(10, rng))
+    index = AllocationIndex(core, _predict, rebuild_interval=float('inf'))
+    index.best(1, now=NOW)
+
+    spaces = _spaces(20, rng)
+    core.sync(spaces)
+
+    assert index.is_stale(NOW)
+    expected = _brute_force(core, 2, None)
+    assert index.best(2, now=NOW)[1] == pytest.approx(max(expected.values()))
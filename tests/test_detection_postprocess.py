@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from utils.detection_postprocess import (DETECTION_DTYPE, as_detections, centroids, class_lookup, map_classes, nms,
+                                         postprocess, rescale, to_list)
+
+
+def test_nms_drops_overlapping_boxes():
+    boxes = [[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 9]]
+    scores = [0.8, 0.9, 0.7, 0.6]
+
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+    assert nms(boxes, scores, 0.95).tolist() == [1, 0, 2, 3]
+    assert len(nms(np.zeros((0, 4)), [])) == 0
+
+
+def test_nms_per_class():
+    boxes = [[0, 0, 10, 10], [0, 0, 10, 10], [0, 0, 10, 10]]
+    scores = [0.9, 0.8, 0.7]
+
+    assert nms(boxes, scores, 0.5, class_ids=[3, 8, 3]).tolist() == [0, 1]
+
+
+def test_nms_per_class_with_negative_coordinates():
+    # Boxes partly outside the frame must not overlap boxes of another class after shifting
+    boxes = [[-5, -5, 5, 5], [0, 0, 5, 5]]
+
+    assert nms(boxes, [0.9, 0.8], 0.1, class_ids=[1, 0]).tolist() == [0, 1]
+
+
+def test_class_mapping():
+    class_map = {2: 3, 3: 4, 7: 8}
+
+    np.testing.assert_array_equal(class_lookup(class_map), [-1, -1, 3, 4, -1, -1, -1, 8])
+    assert class_lookup({}) is None
+    assert map_classes([2, 7, 5, 99, -1], class_map).tolist() == [3, 8, -1, -1, -1]
+    assert map_classes([2, 7], class_lookup(class_map)).tolist() == [3, 8]
+    assert map_classes([2, 7], None).tolist() == [2, 7]
+
+
+def test_postprocess_filters_maps_and_scales():
+    boxes = [[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60], [70, 70, 80, 80], [90, 90, 95, 95]]
+    scores = [0.9, 0.8, 0.3, 0.95, 0.7]
+    class_ids = [2, 2, 2, 0, 7]
+
+    detections = postprocess(boxes, scores, class_ids, confidence_threshold=0.5, class_map={2: 3, 7: 8},
+                             nms_threshold=0.5, scale=(2.0, 0.5))
+
+    assert detections.dtype == DETECTION_DTYPE
+    assert detections['class_id'].tolist() == [3, 8]
+    assert detections['box'].tolist() == [[0, 0, 20, 5], [180, 45, 190, 47]]
+    np.testing.assert_allclose(detections['score'], [0.9, 0.7])
+
+
+def test_postprocess_keep_classes_and_limit():
+    boxes = [[0, 0, 10, 10], [20, 0, 30, 10], [40, 0, 50, 10]]
+
+    detections = postprocess(boxes, [0.6, 0.9, 0.8], [3, 3, 1], keep_classes=[3], max_detections=1)
+
+    assert to_list(detections) == [[[20, 0, 30, 10], pytest.approx(0.9), 3]]
+    assert len(postprocess(np.zeros((0, 4)), [], [])) == 0
+
+
+def test_rescale_and_centroids():
+    detections = as_detections([[[10, 20, 30, 40], 0.9, 3]])
+
+    scaled = rescale(detections, 2.0, 0.5)
+
+    assert scaled['box'].tolist() == [[20, 10, 60, 20]]
+    assert detections['box'].tolist() == [[10, 20, 30, 40]]
+    assert centroids(scaled).tolist() == [[40, 15]]
+
+
+def test_as_detections_rejects_other_types():
+    assert len(as_detections(None)) == 0
+    with pytest.raises(TypeError):
+        as_detections("boxes")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from models.detector_backends import LETTERBOX_COLOR, OnnxYOLOv8Backend, letterbox
+
+
+class _FakeSession:
+    """Returns one YOLOv8 candidate centered at a fixed point of the model input"""
+
+    def __init__(self, box, class_id=2, classes=80):
+        self.box = box
+        self.class_id = class_id
+        self.classes = classes
+        self.inputs = []
+
+    def run(self, outputs, feeds):
+        self.inputs.append(feeds["images"])
+        output = np.zeros((1, 4 + self.classes, 1), dtype=np.float32)
+        output[0, :4, 0] = self.box
+        output[0, 4 + self.class_id, 0] = 0.9
+        return [output]
+
+
+def test_letterbox_keeps_aspect_ratio():
+    image = np.full((360, 640, 3), 200, dtype=np.uint8)
+
+    padded, ratio, (pad_x, pad_y) = letterbox(image, (640, 640))
+
+    assert padded.shape == (640, 640, 3)
+    assert ratio == pytest.approx(1.0)
+    assert (pad_x, pad_y) == (0, 140)
+    assert (padded[:pad_y] == LETTERBOX_COLOR).all() and (padded[-pad_y:] == LETTERBOX_COLOR).all()
+    assert (padded[pad_y:pad_y + 360] == 200).all()
+
+
+def test_letterbox_scales_down_by_smaller_ratio():
+    padded, ratio, (pad_x, pad_y) = letterbox(np.zeros((1000, 500, 3), dtype=np.uint8), (640, 640))
+
+    assert padded.shape == (640, 640, 3)
+    assert ratio == pytest.approx(0.64)
+    assert (pad_x, pad_y) == (160, 0)
+
+
+def test_yolov8_boxes_map_back_to_the_frame():
+    backend = OnnxYOLOv8Backend()
+    backend.input_name = "images"
+    # 1280x720 frame: ratio 0.5, 140 rows of padding at the top
+    backend.session = _FakeSession([320, 340, 100, 40])
+
+    boxes, scores, class_ids = backend.predict(np.zeros((720, 1280, 3), dtype=np.uint8))
+
+    assert backend.session.inputs[0].shape == (1, 3, 640, 640)
+    np.testing.assert_allclose(boxes, [[540, 360, 740, 440]])
+    assert class_ids.tolist() == [2]
+    assert scores.tolist() == pytest.approx([0.9])
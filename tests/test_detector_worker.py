@@ -0,0 +1,90 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import models.detector_worker as detector_worker
+from models.detector_worker import DetectorWorker
+from utils.detection_postprocess import DETECTION_DTYPE
+
+INPUT_SIZE = (64, 36)
+SLOW = 255  # Top-left pixel value that makes the stub detector hang
+
+
+class StubDetector:
+    """Stands in for VehicleDetector in the worker process"""
+
+    def __init__(self, confidence_threshold=0.5, **kwargs):
+        self.model = object()
+        self.model_type = "stub"
+
+    def set_confidence_threshold(self, threshold):
+        pass
+
+    def detect_vehicles(self, image):
+        if image[0, 0, 0] == SLOW:
+            time.sleep(60)
+        detections = np.zeros(1, dtype=DETECTION_DTYPE)
+        detections['box'] = [8, 4, 16, 12]
+        detections['score'] = 0.9
+        detections['class_id'] = 3
+        return detections
+
+
+def _stub_main(*args):
+    import models.vehicle_detector
+
+    models.vehicle_detector.VehicleDetector = StubDetector
+    detector_worker._worker_main(*args)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    # Spawned children pickle the target by reference, so they run the stub too
+    monkeypatch.setattr(detector_worker, "_worker_main", _stub_main)
+    monkeypatch.setattr(detector_worker, "RESTART_BACKOFF", 0.05)
+    worker = DetectorWorker(input_size=INPUT_SIZE, start_timeout=60, hang_timeout=30)
+    yield worker
+    worker.close()
+
+
+def _frame(value=0):
+    return np.full((INPUT_SIZE[1] * 2, INPUT_SIZE[0] * 2, 3), value, dtype=np.uint8)
+
+
+def test_detections_are_scaled_to_the_submitted_frame(worker):
+    assert worker.model == "stub"
+
+    detections = worker.detect_vehicles(_frame())
+
+    assert detections['box'].tolist() == [[16, 8, 32, 24]]
+    assert detections['class_id'].tolist() == [3]
+
+
+def test_killed_worker_is_restarted_and_lost_requests_are_empty(worker):
+    lost = [worker.submit(_frame(SLOW)), worker.submit(_frame(SLOW))]
+    assert None not in lost and worker.pending == 2
+
+    worker.process.kill()
+    worker.process.join(timeout=5)
+
+    done = dict(worker.poll())
+    assert sorted(done) == lost
+    assert all(len(detections) == 0 for detections in done.values())
+    assert worker.pending == 0 and worker.restarts == 1
+
+    assert worker.wait_ready(60)
+    assert len(worker.detect_vehicles(_frame())) == 1
+
+
+def test_close_stops_the_worker_and_unlinks_the_ring(worker):
+    process, name = worker.process, worker.ring.name
+    worker.detect_vehicles(_frame())
+
+    worker.close()
+
+    assert not process.is_alive()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+    assert worker.submit(_frame()) is None
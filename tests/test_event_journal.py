@@ -0,0 +1,91 @@
+import numpy as np
+
+from utils.event_journal import (RECORD_DTYPE, STATE_FREE, STATE_OCCUPIED, OccupancyJournal, list_segments,
+                                 read_journal, read_segment)
+
+HEADER_BYTES = 12
+
+
+def _journal(path, **kwargs):
+    # Flushes are driven by the tests, not the background thread
+    kwargs.setdefault("flush_interval", 3600)
+    return OccupancyJournal(str(path), **kwargs)
+
+
+def test_records_round_trip(tmp_path):
+    journal = _journal(tmp_path)
+    lot = journal.lot_id("north")
+    journal.append_many(lot, [0, 5, 9], [STATE_OCCUPIED, STATE_FREE, True], [0.9, 0.5, 1.0], timestamp=100.0)
+    journal.append(lot, 5, STATE_OCCUPIED, 0.7, timestamp=101.0)
+    journal.close()
+
+    records = read_journal(str(tmp_path))
+
+    assert records['space'].tolist() == [0, 5, 9, 5]
+    assert records['state'].tolist() == [1, 0, 1, 1]
+    np.testing.assert_allclose(records['confidence'], [0.9, 0.5, 1.0, 0.7], rtol=1e-6)
+    assert read_journal(str(tmp_path), start=100.5)['space'].tolist() == [5]
+    assert len(read_journal(str(tmp_path), lot=lot + 1)) == 0
+
+
+def test_lot_ids_persist(tmp_path):
+    journal = _journal(tmp_path)
+    assert (journal.lot_id("north"), journal.lot_id("south"), journal.lot_id("north")) == (0, 1, 0)
+    journal.close()
+
+    reopened = _journal(tmp_path)
+    assert reopened.lot_id("south") == 1
+    reopened.close()
+
+
+def test_segments_rotate_at_size_limit(tmp_path):
+    records_per_segment = 10
+    journal = _journal(tmp_path, segment_bytes=HEADER_BYTES + records_per_segment * RECORD_DTYPE.itemsize)
+    for i in range(35):
+        journal.append(0, i, STATE_OCCUPIED, timestamp=float(i))
+        journal.flush()
+    journal.close()
+
+    segments = list_segments(str(tmp_path))
+    assert [len(read_segment(path)) for path in segments] == [10, 10, 10, 5]
+    assert read_journal(str(tmp_path))['space'].tolist() == list(range(35))
+
+
+def test_retention_counts_segment_being_written(tmp_path):
+    journal = _journal(tmp_path, segment_bytes=HEADER_BYTES + 10 * RECORD_DTYPE.itemsize, max_segments=3)
+    for i in range(100):
+        journal.append(0, i, STATE_OCCUPIED, timestamp=float(i))
+        journal.flush()
+        assert len(list_segments(str(tmp_path))) <= 3
+    journal.close()
+
+    # Newest records survive
+    assert read_journal(str(tmp_path))['space'].tolist()[-1] == 99
+
+
+def test_torn_tail_is_ignored_and_not_appended_to(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append_many(0, [1, 2], [1, 0], [1.0, 1.0], timestamp=5.0)
+    journal.close()
+    torn = list_segments(str(tmp_path))[-1]
+    with open(torn, 'ab') as f:
+        f.write(b"\x01" * (RECORD_DTYPE.itemsize // 2))  # Crash mid-record
+
+    assert len(read_segment(torn)) == 2
+
+    reopened = _journal(tmp_path)
+    reopened.append(0, 3, 1, timestamp=6.0)
+    reopened.close()
+
+    assert len(list_segments(str(tmp_path))) == 2
+    assert read_journal(str(tmp_path))['space'].tolist() == [1, 2, 3]
+
+
+def test_overflowing_buffer_writes_through(tmp_path):
+    journal = _journal(tmp_path, buffer_records=4)
+    journal.append_many(0, list(range(10)), [1] * 10, [1.0] * 10, timestamp=1.0)
+    for i in range(10, 13):
+        journal.append(0, i, 1, timestamp=2.0)
+    journal.close()
+
+    assert read_journal(str(tmp_path))['space'].tolist() == list(range(13))
@@ -0,0 +1,88 @@
+from utils.event_log import EventLog
+
+
+def test_consecutive_repeats_are_coalesced():
+    log = EventLog()
+    for _ in range(3):
+        log.log("Camera reconnected", "WARNING")
+
+    assert log.count() == 1
+    assert log.formatted()[0].endswith("WARNING: Camera reconnected (x3)")
+
+
+def test_info_with_same_shape_is_rate_limited():
+    log = EventLog(rate_limit_interval=60)
+    assert log.log("Updated 12 spaces") is not None
+    log.log("Other message")
+    assert log.log("Updated 13 spaces") is None
+    assert log.dropped == 1
+
+    log.rate_limit_interval = 0
+    assert log.log("Updated 14 spaces").message == "Updated 14 spaces (1 similar suppressed)"
+
+
+def test_warnings_and_errors_are_never_rate_limited():
+    log = EventLog(rate_limit_interval=60)
+    log.log("Error processing frame 12: camera north offline", "ERROR")
+    log.log("Error processing frame 12: camera south offline", "ERROR")
+    log.log("Dropped 3 frames", "WARNING")
+    log.log("Dropped 4 frames", "WARNING")
+
+    assert log.count("WARNING") == 4
+    assert log.dropped == 0
+
+
+def test_levels_below_minimum_are_dropped_and_capacity_bounded():
+    log = EventLog(capacity=3, min_level="INFO", rate_limit_interval=0)
+    assert log.log("noise", "DEBUG") is None
+    for i in range(5):
+        log.log(f"event {i}")
+
+    assert log.formatted()[-1].endswith("event 4")
+    assert log.count() == 3
+
+
+def test_window_filters_by_level():
+    log = EventLog(rate_limit_interval=0)
+    for i in range(6):
+        log.log(f"message {i}", "ERROR" if i % 2 else "INFO")
+
+    assert log.count("ERROR") == 3
+    window = log.window(1, 2, "ERROR")
+    assert [line.split(": ", 1)[1] for line in window] == ["message 3", "message 5"]
+
+
+def test_file_writer_gets_every_kept_entry(tmp_path):
+    log = EventLog(rate_limit_interval=0)
+    log.open_file(str(tmp_path))
+    log.log("first")
+    log.log("second failure", "ERROR")
+    log.close()
+
+    with open(log.log_file) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2 and lines[1].endswith("ERROR: second failure")
+
+
+def test_file_writer_counts_repeated_and_suppressed_messages(tmp_path):
+    log = EventLog(rate_limit_interval=60)
+    log.open_file(str(tmp_path))
+    for _ in range(51):
+        log.log("Camera 3 lost", "ERROR")
+    log.log("Camera 3 back", "WARNING")
+    for _ in range(3):
+        log.log("Camera 3 back", "WARNING")
+    for i in range(5):
+        log.log(f"Updated {i} spaces")
+    log.close()
+
+    with open(log.log_file) as f:
+        lines = f.read().splitlines()
+    assert [line.split("] ", 1)[1] for line in lines] == [
+        "ERROR: Camera 3 lost",
+        "ERROR: Camera 3 lost (repeated 50 times)",
+        "WARNING: Camera 3 back",
+        "WARNING: Camera 3 back (repeated 3 times)",
+        "Updated 0 spaces",
+        "Updated 4 spaces (4 similar suppressed)",
+    ]
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import utils.ingestion as ingestion
+from utils.ingestion import FAILED, STOPPED, CameraStream, FairScheduler, IngestionService, parse_source
+
+FRAME = np.zeros((36, 64, 3), dtype=np.uint8)
+
+
+def _streams(*names):
+    return [CameraStream(name, "test:64x36") for name in names]
+
+
+def _take(scheduler):
+    stream, (_, index, _) = asyncio.run(scheduler.next())
+    return stream.name, index
+
+
+def test_scheduler_serves_streams_in_turn():
+    scheduler = FairScheduler()
+    fast, slow = _streams("fast", "slow")
+    scheduler.offer(fast, FRAME, 1, 0.0)
+    scheduler.offer(slow, FRAME, 1, 0.0)
+
+    assert _take(scheduler) == ("fast", 1)
+
+    # The busy stream's next frame waits behind the other stream
+    scheduler.offer(fast, FRAME, 2, 0.0)
+    assert list(scheduler.ready) == [slow]
+    scheduler.done(fast)
+    assert [_take(scheduler) for _ in range(2)] == [("slow", 1), ("fast", 2)]
+    assert not scheduler.ready
+
+
+def test_live_stream_keeps_only_its_newest_frame():
+    scheduler = FairScheduler()
+    stream, = _streams("north")
+    for index in (3, 4, 5):
+        scheduler.offer(stream, FRAME, index, 0.0)
+
+    assert list(scheduler.ready) == [stream]
+    assert _take(scheduler) == ("north", 5)
+    assert stream.frames_replaced == 2 and stream.busy and stream.pending is None
+
+
+def _slow_job(frame, positions, threshold, space_thresholds, params):
+    time.sleep(0.01)
+    return {"free": 0, "occupied": 0, "total": 0, "seconds": 0.01}
+
+
+def test_one_worker_is_shared_fairly():
+    fast = CameraStream("fast", "test:64x36@500", max_fps=0)
+    slow = CameraStream("slow", "test:64x36@50", max_fps=0)
+    service = IngestionService([fast, slow], workers=1, job=_slow_job)
+
+    asyncio.run(service.run(duration=1.0))
+
+    # Neither stream queues more than one frame, so the fast one cannot take the worker over
+    assert fast.frames_processed > 10 and slow.frames_processed > 10
+    assert fast.frames_processed <= 2 * slow.frames_processed
+    assert fast.frames_replaced > 0
+
+
+@pytest.fixture
+def backoff_delays(monkeypatch):
+    delays = []
+    sleep = asyncio.sleep
+
+    async def recording_sleep(delay, *args):
+        if delay < 0.1:  # The service's own polling sleeps 0.1s
+            delays.append(round(delay, 6))
+        await sleep(delay, *args)
+
+    monkeypatch.setattr(ingestion.random, "uniform", lambda low, high: 1.0)
+    monkeypatch.setattr(ingestion.asyncio, "sleep", recording_sleep)
+    return delays
+
+
+def test_reconnect_backoff_doubles_until_retries_run_out(tmp_path, backoff_delays):
+    stream = CameraStream("gone", str(tmp_path / "missing.mp4"), backoff=0.01, max_backoff=0.03, max_retries=4)
+
+    asyncio.run(IngestionService([stream], workers=1).run(duration=10))
+
+    assert stream.state == FAILED
+    assert stream.reconnects == 4
+    assert backoff_delays == [0.01, 0.02, 0.03, 0.03]
+
+
+def test_dropped_live_stream_reconnects():
+    stream = CameraStream("flaky", "test:64x36@200,fail=3", max_fps=0, backoff=0.01, max_retries=1)
+
+    asyncio.run(IngestionService([stream], workers=1, job=_slow_job).run(duration=0.5))
+
+    # Frames between drops reset the retry count, so the stream never gives up
+    assert stream.state == STOPPED
+    assert stream.reconnects >= 2
+    assert stream.frames_read >= 3 * stream.reconnects
+
+
+def test_parse_source():
+    assert parse_source("north=rtsp://cam/1", 0) == ("north", "rtsp://cam/1")
+    assert parse_source("rtsp://cam/1?a=b", 1) == ("cam1", "rtsp://cam/1?a=b")
+    assert parse_source("test:64x36,fail=3", 2) == ("cam2", "test:64x36,fail=3")
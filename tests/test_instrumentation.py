@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pytest
+
+from utils.instrumentation import BUCKET_BOUNDS, Instrumentation, LatencyHistogram
+
+BUCKET_RATIO = 2 ** 0.25  # Width of one bucket
+
+
+@pytest.mark.parametrize("q", [50, 95, 99])
+def test_percentiles_within_one_bucket(q):
+    samples = np.random.default_rng(q).lognormal(np.log(0.02), 1.0, 5000)
+    histogram = LatencyHistogram()
+    for seconds in samples:
+        histogram.record(float(seconds))
+
+    expected = np.percentile(samples, q)
+
+    assert expected / BUCKET_RATIO <= histogram.percentile(q) <= expected * BUCKET_RATIO
+
+
+def test_histogram_summary_values():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+
+    for seconds in (0.01, 0.02, 0.03, 1000.0):
+        histogram.record(seconds)
+
+    assert histogram.count == 4
+    assert histogram.mean == pytest.approx(1000.06 / 4)
+    assert histogram.max == histogram.last == 1000.0
+    # Samples beyond the last bucket report the max
+    assert histogram.percentile(100) == 1000.0
+    assert histogram.cumulative_counts(BUCKET_BOUNDS[::4])[-1] == 3
+
+
+def test_frame_counters_and_fps():
+    instrumentation = Instrumentation()
+    assert instrumentation.fps() == 0.0
+
+    for _ in range(5):
+        instrumentation.frame_done(0.01)
+        time.sleep(0.01)
+    instrumentation.frame_dropped()
+    instrumentation.frame_dropped(3)
+
+    assert instrumentation.dropped_frames == 4
+    assert instrumentation.counters["frames"] == 5
+    assert instrumentation.histograms["frame"].count == 5
+    assert 0 < instrumentation.fps() <= 100
+    assert "5 frames, 4 dropped" in instrumentation.summary()
+
+    instrumentation.reset()
+    assert instrumentation.dropped_frames == 0 and instrumentation.fps() == 0.0
+
+
+def test_stage_and_timed_record_samples():
+    instrumentation = Instrumentation()
+
+    with instrumentation.stage("detection"):
+        time.sleep(0.005)
+
+    @instrumentation.timed()
+    def allocate():
+        raise RuntimeError("no space")
+
+    with pytest.raises(RuntimeError):
+        allocate()
+
+    assert instrumentation.histograms["detection"].last >= 0.005
+    assert instrumentation.histograms["allocate"].count == 1
@@ -0,0 +1,90 @@
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils.instrumentation import Instrumentation
+from utils.metrics_server import MetricsServer, collect_pipeline_metrics
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _parse(text):
+    """[(name, {label: raw value}, value)] of every sample line"""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples.append((name, dict(LABEL.findall(labels or "")), value))
+    return samples
+
+
+@pytest.fixture
+def scrape():
+    instrumentation = Instrumentation()
+    for seconds in (0.002, 0.004, 0.004, 0.03, 0.5, 400.0):
+        instrumentation.record("detection", seconds)
+    instrumentation.record("capture", 0.001)
+    for _ in range(3):
+        instrumentation.frame_done()
+    instrumentation.frame_dropped(2)
+
+    def custom(writer):
+        writer.gauge("parking_camera_up", True, "Camera reachable", camera='lot "A"\\north\nentrance')
+
+    server = MetricsServer(port=0, collectors=(lambda writer: collect_pipeline_metrics(writer, instrumentation),
+                                               custom)).start()
+    try:
+        with urllib.request.urlopen(server.url, timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            yield server, response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+
+def test_types_and_counters(scrape):
+    _, text = scrape
+
+    assert "# TYPE parking_stage_latency_seconds histogram" in text
+    assert "# TYPE parking_frames_total counter" in text
+    assert "# TYPE parking_pipeline_fps gauge" in text
+    samples = {name: value for name, labels, value in _parse(text) if not labels}
+    assert samples["parking_frames_total"] == "3"
+    assert samples["parking_frames_dropped_total"] == "2"
+
+
+def test_histogram_buckets_are_cumulative(scrape):
+    _, text = scrape
+    samples = [(labels, value) for name, labels, value in _parse(text)
+               if name.startswith("parking_stage_latency_seconds") and labels.get("stage") == "detection"]
+
+    buckets = [(labels["le"], float(value)) for labels, value in samples if "le" in labels]
+    counts = [count for _, count in buckets]
+    assert counts == sorted(counts)
+    assert buckets[-1] == ("+Inf", 6)
+    assert counts[-2] == 5  # 400 s is beyond the largest exported bound
+
+    bounds = [float(le) for le, _ in buckets[:-1]]
+    assert bounds == sorted(bounds)
+    assert next(count for le, count in buckets[:-1] if float(le) >= 0.004) == 3
+
+    total, count = [float(value) for labels, value in samples if "le" not in labels]  # _sum, _count
+    assert count == buckets[-1][1]
+    assert total == pytest.approx(0.002 + 0.004 + 0.004 + 0.03 + 0.5 + 400.0)
+
+
+def test_label_values_are_escaped(scrape):
+    _, text = scrape
+
+    assert 'parking_camera_up{camera="lot \\"A\\"\\\\north\\nentrance"} 1' in text.splitlines()
+
+
+def test_other_paths_are_not_found(scrape):
+    server, _ = scrape
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(server.url.replace("/metrics", "/other"), timeout=10)
+    assert error.value.code == 404
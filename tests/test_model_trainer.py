@@ -0,0 +1,65 @@
+import numpy as np
+import xgboost as xgb
+
+from models.allocation_core import FEATURE_NAMES
+from models.model_trainer import BASE_ROUNDS_ATTR, FeedbackStore, train_incremental
+
+BASE_ROUNDS = 20
+
+
+def _data(count, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.random((count, len(FEATURE_NAMES)), dtype=np.float32) * [500, 120, 3]
+    y = (X[:, 0] < 250).astype(np.float32)
+    return X, y
+
+
+def _base_model():
+    X, y = _data(200, 0)
+    model = xgb.XGBClassifier(n_estimators=BASE_ROUNDS, max_depth=3)
+    model.fit(X, y)
+    params = {key: value for key, value in model.get_xgb_params().items() if value is not None}
+    return bytes(model.get_booster().save_raw('ubj')), params
+
+
+def _load(model_bytes):
+    booster = xgb.Booster()
+    booster.load_model(bytearray(model_bytes))
+    return booster
+
+
+def test_tree_count_stays_bounded_across_rounds():
+    model_bytes, params = _base_model()
+
+    for round_number in range(1, 6):
+        X, y = _data(50 * round_number, round_number)
+        model_bytes = train_incremental(model_bytes, params, X, y, num_boost_round=5)
+
+        booster = _load(model_bytes)
+        assert booster.num_boosted_rounds() == BASE_ROUNDS + 5
+        assert booster.attr(BASE_ROUNDS_ATTR) == str(BASE_ROUNDS)
+
+
+def test_base_trees_are_kept():
+    model_bytes, params = _base_model()
+    X, y = _data(100, 1)
+
+    retrained = _load(train_incremental(model_bytes, params, X, y, num_boost_round=5))
+
+    base = _load(model_bytes)
+    dtest = xgb.DMatrix(X, feature_names=FEATURE_NAMES)
+    np.testing.assert_allclose(retrained[:BASE_ROUNDS].predict(dtest), base.predict(dtest), rtol=1e-6)
+
+
+def test_feedback_store_round_trip(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.jsonl"))
+    store.add([10, 2.5, 1, 99], True, space_id="S1-A1")
+    store.add([40, 0.5, 2], False)
+    with open(store.path, 'a') as f:
+        f.write('{"features": [1, 2')  # Torn last line after a crash
+
+    X, y = FeedbackStore(store.path).training_data()
+
+    assert len(store) == 2
+    np.testing.assert_allclose(X, [[10, 2.5, 1], [40, 0.5, 2]])
+    assert y.tolist() == [1, 0]
@@ -0,0 +1,91 @@
+import numpy as np
+
+from utils.occupancy import (ThresholdCalibrator, calibrate_thresholds, count_foreground_pixels,
+                             resolve_thresholds, score_parking_spaces)
+
+
+def _image_with_fills(shape, positions, fills):
+    """Binary image where the top rows of each space are filled to the given fraction"""
+    img = np.zeros(shape, dtype=np.uint8)
+    for (x, y, w, h), fill in zip(positions, fills):
+        rows = int(round(h * fill))
+        img[y:y + rows, x:x + w] = 255
+    return img
+
+
+def test_counts_match_per_space_loop():
+    rng = np.random.default_rng(1)
+    img = (rng.random((120, 200)) > 0.7).astype(np.uint8) * 255
+    positions = [(0, 0, 10, 10), (50, 20, 30, 40), (150, 70, 40, 40), (190, 100, 20, 30), (-5, 0, 10, 10)]
+
+    counts, valid = count_foreground_pixels(img, positions)
+
+    assert valid.tolist() == [True, True, True, False, False]
+    for i, (x, y, w, h) in enumerate(positions):
+        expected = np.count_nonzero(img[y:y + h, x:x + w]) if valid[i] else 0
+        assert counts[i] == expected
+
+
+def test_scoring_uses_fill_ratio_not_pixel_count():
+    # A small and a large space, both 20% full: same decision for both
+    positions = [(10, 10, 10, 20), (40, 10, 60, 80)]
+    img = _image_with_fills((120, 120), positions, [0.2, 0.2])
+
+    occupied, ratios, valid = score_parking_spaces(img, positions, threshold=0.1)
+
+    assert valid.all()
+    np.testing.assert_allclose(ratios, [0.2, 0.2])
+    assert occupied.tolist() == [True, True]
+    assert not score_parking_spaces(img, positions, threshold=0.3)[0].any()
+
+
+def test_space_thresholds_override_global_where_learned():
+    positions = [(10, 10, 20, 20), (40, 10, 20, 20)]
+    img = _image_with_fills((60, 80), positions, [0.25, 0.25])
+
+    occupied, _, _ = score_parking_spaces(img, positions, threshold=0.1, space_thresholds=[0.5, np.nan])
+
+    assert occupied.tolist() == [False, True]
+
+
+def test_out_of_bounds_spaces_are_occupied():
+    occupied, _, valid = score_parking_spaces(np.zeros((50, 50), np.uint8), [(45, 45, 10, 10)])
+    assert not valid[0] and occupied[0]
+
+
+def test_resolve_thresholds_ignores_mismatched_vector():
+    np.testing.assert_allclose(resolve_thresholds(3, [0.2, 0.3], default=0.1), [0.1, 0.1, 0.1])
+    np.testing.assert_allclose(resolve_thresholds(2, [np.nan, 0.3], default=0.1), [0.1, 0.3])
+
+
+def test_calibration_learns_split_of_bimodal_space():
+    rng = np.random.default_rng(0)
+    window = np.r_[rng.normal(0.03, 0.01, 90), rng.normal(0.30, 0.03, 60)][:, None]
+
+    threshold = calibrate_thresholds(window)[0]
+
+    assert 0.06 < threshold < 0.25
+
+
+def test_calibration_leaves_unimodal_spaces_unset():
+    rng = np.random.default_rng(0)
+    frames = 150
+    window = np.c_[
+        rng.normal(0.05, 0.03, frames).clip(0),  # Free all along, but noisy
+        rng.uniform(0.0, 0.3, frames),  # No clear states
+        np.r_[rng.normal(0.03, 0.005, frames - 1), [0.4]],  # One glitch frame
+        np.full(frames, 0.5),  # Occupied, no noise at all
+    ]
+
+    assert np.isnan(calibrate_thresholds(window)).all()
+
+
+def test_calibrator_collects_window():
+    calibrator = ThresholdCalibrator(2, num_frames=40)
+    for i in range(40):
+        done = calibrator.add([0.02 if i % 2 else 0.4, 0.02])
+    assert done and calibrator.progress == 1.0
+
+    thresholds = calibrator.thresholds()
+    assert 0.02 < thresholds[0] < 0.4
+    assert np.isnan(thresholds[1])
@@ -0,0 +1,73 @@
+import pytest
+
+from utils.occupancy_store import LOT_TOTAL, OccupancyStore
+
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Writes are flushed by the tests, not the background thread
+    store = OccupancyStore(str(tmp_path / "occupancy.db"), sample_interval=0, commit_interval=3600)
+    yield store
+    store.close()
+
+
+def test_rollups_aggregate_samples_per_bucket(store):
+    base = 10 * DAY
+    for offset, occupied_a, occupied_b in [(0, 2, 1), (30, 4, 3), (59, 6, 2), (60, 1, 0)]:
+        store.record("north", {"A1": (10, occupied_a), "B1": (5, occupied_b)}, vehicles=offset, timestamp=base + offset)
+    store.flush()
+
+    minutes = store.query('1m', lot="north")
+    assert [row['bucket'] for row in minutes] == [base + 60, base]
+    first = minutes[1]
+    assert first['samples'] == 3
+    assert first['total'] == 15
+    assert first['occupied_avg'] == pytest.approx((3 + 7 + 8) / 3)
+    assert (first['occupied_min'], first['occupied_max']) == (3, 8)
+    assert first['free_avg'] == pytest.approx(15 - first['occupied_avg'])
+    assert first['vehicles'] == 59
+
+    hour = store.query('1h', lot="north")
+    assert len(hour) == 1 and hour[0]['samples'] == 4 and hour[0]['occupied_min'] == 1
+
+    sections = {row['section']: row for row in store.query('1d', lot="north", section=None)}
+    assert set(sections) == {"A1", "B1", LOT_TOTAL}
+    assert sections["A1"]['occupied_max'] == 6
+    assert sections["B1"]['occupied_avg'] == pytest.approx(6 / 4)
+
+
+def test_query_filters_time_range_and_lot(store):
+    for hour in range(5):
+        store.record("north", {"A1": (10, hour)}, timestamp=DAY + hour * 3600)
+        store.record("south", {"A1": (8, 1)}, timestamp=DAY + hour * 3600)
+    store.flush()
+
+    rows = store.query('1h', start=DAY + 3600 + 10, end=DAY + 4 * 3600, lot="north")
+
+    # start is rounded down to its bucket
+    assert [row['occupied_avg'] for row in rows] == [3, 2, 1]
+    assert {row['lot'] for row in store.query('1h')} == {"north", "south"}
+
+
+def test_samples_faster_than_interval_are_dropped(tmp_path):
+    store = OccupancyStore(str(tmp_path / "occupancy.db"), sample_interval=1.0, commit_interval=3600)
+    try:
+        assert store.record("north", {"A1": (10, 1)}, timestamp=100.0)
+        assert not store.record("north", {"A1": (10, 2)}, timestamp=100.5)
+        assert store.record("south", {"A1": (10, 2)}, timestamp=100.5)
+        assert store.record("north", {"A1": (10, 3)}, timestamp=101.0)
+        store.flush()
+        assert store.query('1m', lot="north")[0]['samples'] == 2
+    finally:
+        store.close()
+
+
+def test_unknown_resolution_and_clear(store):
+    with pytest.raises(ValueError):
+        store.query('5m')
+
+    store.record("north", {"A1": (10, 1)}, timestamp=DAY)
+    store.clear()
+    assert store.query('1d') == []
@@ -0,0 +1,110 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from models.parking_manager import ParkingManager
+from utils.parking_layout import ParkingLayout, import_pickle_positions, read_layout, write_layout
+from utils.resource_manager import layout_file_path, load_parking_layout
+
+POSITIONS = [(10, 20, 100, 40), (700, 20, 100, 40), (10, 500, 100, 40), (700, 500, 100, 40)]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, mmap):
+    layout = ParkingLayout.from_positions(POSITIONS, (1000, 800), [0.1, np.nan, 0.25, np.nan])
+    path = str(tmp_path / "lot.layout")
+    write_layout(path, layout)
+
+    loaded = read_layout(path, mmap=mmap)
+
+    assert loaded.to_pos_list() == POSITIONS
+    assert loaded.reference_dimensions == (1000, 800)
+    assert loaded.space_sections() == ["A1", "B1", "A2", "B2"]
+    np.testing.assert_allclose(loaded.thresholds, [0.1, np.nan, 0.25, np.nan])
+    assert isinstance(loaded.body, np.memmap) == mmap
+
+
+def test_empty_layout_round_trip(tmp_path):
+    path = str(tmp_path / "empty.layout")
+    write_layout(path, ParkingLayout.from_positions([]))
+    assert len(read_layout(path)) == 0
+
+
+def test_mapped_layout_can_take_thresholds(tmp_path):
+    path = str(tmp_path / "lot.layout")
+    write_layout(path, ParkingLayout.from_positions(POSITIONS, (1000, 800)))
+    layout = read_layout(path)
+    assert not layout.has_thresholds()
+
+    layout.set_thresholds([0.2] * len(POSITIONS))
+
+    assert layout.has_thresholds()
+    np.testing.assert_allclose(layout.thresholds, 0.2)
+
+
+def test_threshold_count_must_match():
+    with pytest.raises(ValueError):
+        ParkingLayout.from_positions(POSITIONS, thresholds=[0.1])
+
+
+def test_rejects_other_files_and_newer_versions(tmp_path):
+    path = tmp_path / "bad.layout"
+    path.write_bytes(b"NOTALAYOUT" + b"\0" * 32)
+    with pytest.raises(ValueError):
+        read_layout(str(path))
+
+    write_layout(str(path), ParkingLayout(ParkingLayout.from_positions(POSITIONS).body, schema_version=99))
+    with pytest.raises(ValueError):
+        read_layout(str(path))
+
+
+def test_import_legacy_pickle(tmp_path):
+    path = tmp_path / "CarParkPos_lot"
+    with open(path, "wb") as f:
+        pickle.dump([list(p) for p in POSITIONS], f)
+
+    layout = import_pickle_positions(str(path), (1000, 800))
+
+    assert layout.to_pos_list() == POSITIONS
+    assert not layout.has_thresholds()
+
+
+def test_import_refuses_pickled_objects(tmp_path):
+    path = tmp_path / "CarParkPos_evil"
+    with open(path, "wb") as f:
+        pickle.dump([os.path.join], f)
+
+    with pytest.raises(pickle.UnpicklingError):
+        import_pickle_positions(str(path))
+
+
+def test_load_imports_legacy_file_once(tmp_path):
+    with open(tmp_path / "CarParkPos_lot", "wb") as f:
+        pickle.dump(POSITIONS, f)
+
+    layout = load_parking_layout(str(tmp_path), "lot.png", (1000, 800))
+
+    assert layout.to_pos_list() == POSITIONS
+    assert os.path.exists(layout_file_path(str(tmp_path), "lot.png"))
+
+
+def test_read_only_load_does_not_write(tmp_path):
+    with open(tmp_path / "CarParkPos_lot", "wb") as f:
+        pickle.dump(POSITIONS, f)
+
+    layout = load_parking_layout(str(tmp_path), "lot.png", persist=False)
+
+    assert layout.to_pos_list() == POSITIONS
+    assert os.listdir(tmp_path) == ["CarParkPos_lot"]
+
+
+def test_manager_drops_stale_thresholds_on_save(tmp_path):
+    manager = ParkingManager(config_dir=str(tmp_path / "config"), log_dir=str(tmp_path / "logs"))
+    manager.posList = list(POSITIONS)
+    manager.space_thresholds = [0.1, 0.2]  # Calibrated before two spaces were added
+
+    assert manager.save_parking_positions("lot.png")
+    assert manager.space_thresholds is None
+    assert read_layout(layout_file_path(manager.config_dir, "lot.png")).to_pos_list() == POSITIONS
@@ -0,0 +1,179 @@
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from utils.shared_frames import FrameRing, SharedArray
+
+SHAPE = (4, 6, 3)
+
+
+def _frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def _sum_frames(spec):
+    frames = SharedArray.attach(spec)
+    try:
+        return int(frames.array.sum())
+    finally:
+        frames.close()
+
+
+@pytest.fixture
+def ring():
+    rings = []
+
+    def create(**kwargs):
+        rings.append(FrameRing.create(SHAPE, **kwargs))
+        return rings[-1]
+
+    yield create
+    for created in rings:
+        created.unlink()
+
+
+def test_shared_array_is_visible_in_another_process():
+    with SharedArray.create((3,) + SHAPE) as frames:
+        frames.array[1] = 7
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            assert pool.submit(_sum_frames, frames.spec()).result(timeout=60) == 7 * int(np.prod(SHAPE))
+
+
+def test_readers_see_frames_in_order(ring):
+    writer = ring(slots=4, readers=2)
+    first, second = writer.reader(0), FrameRing.attach(writer.spec()).reader(1)
+    for value in range(3):
+        writer.publish(_frame(value), timestamp=float(value))
+
+    for reader in (first, second):
+        values = []
+        for _ in range(3):
+            with reader.read(timeout=1) as frame:
+                values.append((frame.seq, int(frame.array[0, 0, 0]), frame.timestamp))
+        assert values == [(0, 0, 0.0), (1, 1, 1.0), (2, 2, 2.0)]
+        assert reader.read(timeout=0.01) is None
+
+
+def test_overwriting_writer_never_waits_and_slow_readers_drop(ring):
+    writer = ring(slots=4, readers=1)
+    reader = writer.reader(0)
+    for value in range(10):
+        assert writer.publish(_frame(value), timeout=0) == value
+
+    frame = reader.read(timeout=1)
+
+    # Only the last ring's worth of frames is still held
+    assert frame.seq == 6 and reader.dropped == 6
+    frame.release()
+    frame = reader.read(timeout=1, latest=True)
+    assert frame.seq == 9 and reader.dropped == 8
+
+
+def test_overwritten_frame_is_no_longer_valid(ring):
+    writer = ring(slots=2, readers=1)
+    reader = writer.reader(0)
+    writer.publish(_frame(1))
+    frame = reader.read(timeout=1)
+
+    writer.publish(_frame(2))
+    assert frame.valid()
+    writer.publish(_frame(3))
+    assert not frame.valid()
+
+
+def test_non_overwriting_writer_waits_for_release(ring):
+    writer = ring(slots=2, readers=1, overwrite=False)
+    reader = writer.reader(0)
+    writer.publish(_frame(0))
+    writer.publish(_frame(1))
+
+    assert writer.publish(_frame(2), timeout=0.05) is None
+
+    frame = reader.read(timeout=1)
+    released = threading.Timer(0.05, frame.release)
+    released.start()
+    start = time.monotonic()
+    assert writer.publish(_frame(2), timeout=5) == 2
+    assert time.monotonic() - start >= 0.04
+    released.join()
+
+    # Every frame is seen, none dropped
+    seen = []
+    for _ in range(2):
+        with reader.read(timeout=1) as frame:
+            seen.append(frame.seq)
+    assert seen == [1, 2] and reader.dropped == 0
+
+
+def test_detached_reader_does_not_block_the_writer(ring):
+    writer = ring(slots=2, readers=2, overwrite=False)
+    reader = writer.reader(0)
+    writer.reader(1).detach()
+    for value in range(2):
+        writer.publish(_frame(value))
+    reader.detach()
+
+    assert writer.publish(_frame(2), timeout=0.05) == 2
+
+
+def test_closed_stream_drains_then_ends(ring):
+    writer = ring(slots=4, readers=1)
+    reader = writer.reader(0)
+    writer.publish(_frame(5))
+    writer.close_stream()
+
+    with reader.read(timeout=1) as frame:
+        assert frame.seq == 0
+
+    # Does not wait for more frames once the ring is closed and drained
+    assert reader.read(timeout=None) is None
+
+
+def test_invalid_ring_arguments():
+    with pytest.raises(ValueError):
+        FrameRing.create(SHAPE, slots=1)
+    with FrameRing.create(SHAPE, slots=2, readers=1) as ring:
+        with pytest.raises(ValueError):
+            ring.reader(1)
+
+
+@pytest.mark.skipif(sys.version_info >= (3, 13), reason="Attaching does not patch the resource tracker")
+def test_blocks_created_while_attaching_are_tracked(monkeypatch):
+    registered = set()
+    register = resource_tracker.register
+
+    def recording_register(name, rtype):
+        registered.add(name.lstrip("/"))
+        register(name, rtype)
+
+    monkeypatch.setattr(resource_tracker, "register", recording_register)
+    source = SharedArray.create(SHAPE)
+    created = []
+    stop = threading.Event()
+
+    def attach_repeatedly():
+        while not stop.is_set():
+            SharedArray.attach(source.spec()).close()
+
+    attacher = threading.Thread(target=attach_repeatedly)
+    attacher.start()
+    try:
+        for _ in range(200):
+            created.append(SharedArray.create(SHAPE))
+    finally:
+        stop.set()
+        attacher.join()
+        for shared in created:
+            shared.unlink()
+        source.unlink()
+
+    assert resource_tracker.register is recording_register
+    assert {shared.name for shared in created} <= registered
+    assert source.name in registered
@@ -1,6 +1,7 @@
 import os
 import threading
 import time
+import numpy as np
 from tkinter import Frame, Tk, messagebox, ttk
 from tkinter import BOTH, TOP, BOTTOM, LEFT, RIGHT, X, Y, NSEW, W, E, N, S
 from datetime import datetime
@@ -12,15 +13,20 @@ from ui.log_tab import LogTab
 from ui.stats_tab import StatsTab
 from ui.reference_tab import ReferenceTab
 from models.parking_visualizer import ParkingVisualizer
-from models.allocation_engine import ParkingAllocationEngine
 from ui.parking_allocation_tab import ParkingAllocationTab
-from models.vehicle_detector import VehicleDetector
-from utils.resource_manager import ensure_directories_exist, load_parking_positions
+from utils.resource_manager import ensure_directories_exist, load_parking_layout, load_preprocess_params, \
+    save_parking_layout
+from utils.occupancy import DEFAULT_FILL_RATIO, resolve_thresholds, occupancy_confidence
+from utils.event_journal import DEFAULT_MAX_SEGMENTS, OccupancyJournal
+from utils.occupancy_store import OccupancyStore
+from utils.event_log import EventLog
 from utils.media_paths import list_available_videos
+from utils.metrics_server import MetricsServer
+from models.allocation_core import section_from_space_id
 
 class ParkingManagementSystem:
     DEFAULT_CONFIDENCE = 0.6
-    DEFAULT_THRESHOLD = 500
+    DEFAULT_THRESHOLD = DEFAULT_FILL_RATIO
     MIN_CONTOUR_SIZE = 40
     DEFAULT_OFFSET = 10
     DEFAULT_LINE_HEIGHT = 400
@@ -46,12 +52,17 @@ class ParkingManagementSystem:
         self.min_contour_width = self.MIN_CONTOUR_SIZE
         self.min_contour_height = self.MIN_CONTOUR_SIZE
         self.offset = self.DEFAULT_OFFSET
-        self.parking_threshold = self.DEFAULT_THRESHOLD
+        self.parking_threshold = self.DEFAULT_THRESHOLD  # Fill ratio, 0-1
+        self.space_thresholds = None  # Per-space fill ratios learned by calibration
+        self.layout = None
         self.detection_mode = "parking"  # Default detection mode
-        self.log_data = []  # For logging events
+        self.event_log = EventLog()  # Bounded, rate-limited event log
         self.use_ml_detection = False
         self.ml_detector = None
+        self.ml_method = None  # Method of the detector currently in use
         self.ml_confidence = self.DEFAULT_CONFIDENCE
+        self.detector_process = False  # Run ML detectors in a worker process (see DetectorWorker)
+        self.metrics_server = None
         self._cleanup_lock = threading.Lock()
         self.data_lock = threading.Lock()
         self.video_lock = threading.Lock()
@@ -76,11 +87,25 @@ class ParkingManagementSystem:
         self.config_dir = "config"
         self.log_dir = "logs"
         ensure_directories_exist([self.config_dir, self.log_dir])
+        self.event_log.open_file(self.log_dir)
+
+        # Preprocessing chosen by a parameter sweep (benchmarks.sweep --save), else the defaults
+        self.preprocess_params = load_preprocess_params(self.config_dir)
+
+        # Durable record of every occupancy transition
+        self.occupancy_journal = OccupancyJournal(os.path.join(self.log_dir, "journal"),
+                                                  max_segments=DEFAULT_MAX_SEGMENTS)
+        self.last_occupancy = None
+
+        # Per-second occupancy time series with 1m/1h/1d rollups
+        self.occupancy_store = OccupancyStore(os.path.join(self.log_dir, "occupancy.sqlite3"))
+
         self.load_parking_positions()
 
         # Initialize parking allocation components
-        self.parking_visualizer = ParkingVisualizer(config_dir=self.config_dir, logs_dir=self.log_dir)
         self.allocation_engine = ParkingAllocationEngine(config_dir=self.config_dir)
+        self.parking_visualizer = ParkingVisualizer(config_dir=self.config_dir, logs_dir=self.log_dir,
+                                                    allocation_engine=self.allocation_engine)
 
         # Setup UI components
         self.setup_ui()
@@ -113,7 +138,7 @@ class ParkingManagementSystem:
             "newVideo2.mp4": "newRefImage2.png"
         }
 
-        # Reference dimensions
+        # Default reference dimensions, overridden by the ones stored in each layout file
         self.reference_dimensions = {
             "carParkImg.png": (1280, 720),
             "videoImg.png": (1280, 720),
@@ -128,8 +153,14 @@ class ParkingManagementSystem:
             if reference_image is None:
                 reference_image = self.current_reference_image
 
-            # Load parking positions from file
-            positions = load_parking_positions(self.config_dir, reference_image)
+            # Load parking layout from file (memory-mapped)
+            self.layout = load_parking_layout(self.config_dir, reference_image,
+                                              self.reference_dimensions.get(reference_image))
+            positions = self.layout.to_pos_list() if self.layout is not None else []
+
+            # The layout remembers the dimensions its positions were drawn at
+            if self.layout is not None and self.layout.reference_dimensions:
+                self.reference_dimensions[reference_image] = self.layout.reference_dimensions
 
             # Store as original positions (at reference dimensions)
             self.original_posList = positions.copy()
@@ -139,6 +170,15 @@ class ParkingManagementSystem:
             self.free_spaces = 0
             self.occupied_spaces = self.total_spaces
 
+            # A new layout starts a new occupancy baseline in the journal
+            self.last_occupancy = None
+
+            # Per-space thresholds are fill ratios, so they need no scaling
+            if self.layout is not None and self.layout.has_thresholds():
+                self.space_thresholds = self.layout.thresholds
+            else:
+                self.space_thresholds = None
+
             # Only scale positions if dimensions are available
             if (reference_image in self.reference_dimensions and
                     hasattr(self, 'image_width') and
@@ -209,17 +249,125 @@ class ParkingManagementSystem:
         self.status_bar = ttk.Label(self.master, text="Ready", relief="sunken")
         self.status_bar.grid(row=1, column=0, sticky=W + E)
 
-    def log_event(self, message):
-        """Log an event with timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
+    def log_event(self, message, level="INFO"):
+        """Log an event with timestamp; the log tab picks it up on its next refresh"""
+        self.event_log.log(message, level)
+
+    @property
+    def log_data(self):
+        """Formatted entries currently kept in the event log"""
+        return self.event_log.formatted()
+
+    def record_occupancy(self, scores):
+        """
+        Journal the spaces whose state changed since the previous frame
+
+        Args:
+            scores: (occupied, ratios, valid) from score_parking_spaces
+        """
+        occupied, ratios, valid = scores
+        if self.last_occupancy is not None and len(self.last_occupancy) == len(occupied):
+            changed = np.flatnonzero(occupied != self.last_occupancy)
+        else:
+            # New layout: journal the full state once so the journal can be replayed
+            changed = np.arange(len(occupied))
+        self.last_occupancy = occupied.copy()
+
+        if len(changed) == 0:
+            return changed
+
+        thresholds = resolve_thresholds(len(occupied), self.space_thresholds, self.parking_threshold)
+        confidence = occupancy_confidence(ratios[changed], thresholds[changed])
+        confidence[~valid[changed]] = 0.0
+
+        lot = self.occupancy_journal.lot_id(os.path.splitext(self.current_reference_image)[0])
+        self.occupancy_journal.append_many(lot, changed, occupied[changed], confidence)
+        return changed
+
+    def record_stats_sample(self):
+        """Feed the current lot and per-section occupancy to the time-series store"""
+        lot = os.path.splitext(self.current_reference_image)[0]
+
+        occupied = self.last_occupancy
+        if (self.detection_mode == "parking" and occupied is not None and self.layout is not None
+                and len(self.layout) == len(occupied)):
+            # Section totals straight from the layout's section column
+            section_index = self.layout.section_index
+            totals = np.bincount(section_index, minlength=len(self.layout.sections))
+            occupied_counts = np.bincount(section_index, weights=occupied, minlength=len(self.layout.sections))
+            sections = {name: (totals[i], occupied_counts[i])
+                        for i, name in enumerate(self.layout.sections) if totals[i]}
+        else:
+            sections = {"All": (self.total_spaces, self.occupied_spaces)}
 
-        # Add to log data
-        self.log_data.append(log_entry)
+        self.occupancy_store.record(lot, sections, self.vehicle_counter)
 
-        # Update log display if it exists
-        if hasattr(self, 'log_tab'):
-            self.log_tab.add_log_entry(log_entry)
+    def start_metrics_server(self, port, host="127.0.0.1"):
+        """Serve pipeline and lot metrics at http://host:port/metrics"""
+        try:
+            self.metrics_server = MetricsServer(port, host)
+            self.metrics_server.add_collector(self.collect_metrics)
+            self.metrics_server.start()
+            self.log_event(f"Serving metrics on {self.metrics_server.url}")
+        except OSError as e:
+            self.metrics_server = None
+            self.log_event(f"Could not start metrics server: {str(e)}", "ERROR")
+
+    def collect_metrics(self, writer):
+        """Lot, detector, queue and model metrics; runs on the metrics server thread"""
+        lot = os.path.splitext(self.current_reference_image)[0]
+
+        # Copy first: the frame loop may be updating parking_data
+        parking_data = getattr(getattr(self, 'parking_manager', None), 'parking_data', None) or {}
+        spaces = list(parking_data.items())
+        counts = {}
+        for space_id, data in spaces:
+            section = data.get('section') or section_from_space_id(space_id)
+            state = "occupied" if data.get('occupied', True) else "free"
+            counts[(section, state)] = counts.get((section, state), 0) + 1
+        for section in sorted({section for section, _ in counts}):
+            for state in ("free", "occupied"):
+                writer.gauge("parking_spaces", counts.get((section, state), 0),
+                             "Parking spaces by lot, section and state", lot=lot, section=section, state=state)
+
+        writer.gauge("parking_vehicles_counted", self.vehicle_counter, "Vehicles counted on the counting line",
+                     lot=lot)
+
+        detector = self.ml_detector if self.use_ml_detection else None
+        backend = getattr(getattr(detector, 'backend', None), 'name', None) or getattr(detector, 'model_type', "none")
+        writer.gauge("parking_detector_info", 1, "Active detection method and backend",
+                     method=self.ml_method or self.detection_mode, backend=backend if detector else "none")
+
+        writer.gauge("parking_queue_depth", self.event_log.queue_depth, "Items waiting in internal queues",
+                     queue="event_log")
+        writer.gauge("parking_queue_depth", self.occupancy_store.queue_depth, queue="occupancy_store")
+        if hasattr(self, 'allocation_tab'):
+            writer.gauge("parking_queue_depth", self.allocation_tab.update_queue.qsize(), queue="allocation_ui")
+
+        engine = self.allocation_engine
+        version = engine.registry.current_version(engine.model_name)
+        writer.gauge("parking_model_version", version or 0, "Current allocation model version",
+                     model=engine.model_name)
+        writer.gauge("parking_model_training", engine.trainer.busy, "Whether a retraining job is running",
+                     model=engine.model_name)
+
+    def update_space_thresholds(self, thresholds):
+        """Store and persist per-space fill ratio thresholds for the current layout"""
+        self.space_thresholds = thresholds
+        if hasattr(self, 'parking_manager'):
+            self.parking_manager.space_thresholds = self.space_thresholds
+
+        if self.layout is None or len(self.layout) != len(thresholds):
+            self.log_event("Save the parking spaces before storing calibrated thresholds")
+            return
+
+        self.layout.set_thresholds(thresholds)
+        if save_parking_layout(self.layout, self.config_dir, self.current_reference_image):
+            learned = int(np.count_nonzero(~np.isnan(np.asarray(thresholds, dtype=np.float64))))
+            self.log_event(f"Saved {learned} learned space thresholds for {self.current_reference_image}; "
+                           f"{len(thresholds) - learned} spaces follow the global threshold")
+        else:
+            self.log_event("Failed to save space thresholds")
 
     def update_status_info(self):
         """Update status information across tabs"""
@@ -236,17 +384,12 @@ class ParkingManagementSystem:
     def monitoring_thread(self):
         """Background thread for monitoring and periodic logging"""
         while True:
-            # Record stats every hour if detection is running
-            if self.running and hasattr(self, 'stats_tab'):
-                self.stats_tab.record_current_stats(
-                    self.total_spaces,
-                    self.free_spaces,
-                    self.occupied_spaces,
-                    self.vehicle_counter
-                )
+            # Samples are stored every second by the detection loop; just refresh the view
+            if hasattr(self, 'stats_tab'):
+                self.master.after(0, self.stats_tab.refresh_statistics)
 
-            # Sleep for an hour (3600 seconds)
-            time.sleep(3600)
+            # Refresh once a minute, the finest rollup resolution
+            time.sleep(60)
 
     # Modify the scale_positions_to_current_dimensions function in app.py
     # to consistently scale between reference and display dimensions
@@ -286,9 +429,9 @@ class ParkingManagementSystem:
 
             # Replace current positions with scaled positions
             self.posList = scaled_positions
-            self.log_event(f"Scaled {len(self.posList)} positions")
+            self.log_event(f"Scaled {len(self.posList)} positions", "DEBUG")
         except Exception as e:
-            self.log_event(f"Error scaling positions: {str(e)}")
+            self.log_event(f"Error scaling positions: {str(e)}", "ERROR")
 
     def connect_parking_data(self):
         """Connect existing parking data with the new allocation system"""
@@ -338,8 +481,27 @@ class ParkingManagementSystem:
             self.running = False
             if hasattr(self, 'video_capture') and self.video_capture:
                 self.video_capture.release()
+            self.occupancy_journal.close()
+            self.occupancy_store.close()
+            self.allocation_engine.close()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            self.close_ml_detectors()
+            self.event_log.close()
             self.master.destroy()
 
+    def close_ml_detectors(self):
+        """Stop the worker processes of loaded ML detectors"""
+        detection_tab = getattr(self, 'detection_tab', None)
+        if detection_tab is None:
+            return
+        for detector in list(detection_tab.model_loader.cache.values()):
+            if hasattr(detector, 'close'):
+                try:
+                    detector.close()
+                except Exception as e:
+                    print(f"Error stopping detector: {str(e)}")
+
     def adjust_for_screen_size(self):
         """Adjust UI elements based on screen size"""
         width = self.master.winfo_width()
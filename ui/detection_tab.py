@@ -2,12 +2,17 @@ from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 import cv2
-import numpy as np
 import time
 from datetime import datetime
 from utils.video_utils import list_available_videos
-from utils.image_processor import process_parking_spaces, detect_vehicles_traditional, process_ml_detections
+from utils.image_processor import preprocess_frame_for_parking_detection, process_parking_spaces, \
+    detect_vehicles_traditional, process_ml_detections
 from utils.tracker_integration import initialize_tracker, process_ml_detections_with_tracking
+from models.detector_backends import ONNX_BACKENDS
+from utils.detection_postprocess import as_detections, empty_detections, rescale
+from utils.occupancy import score_parking_spaces, ThresholdCalibrator
+from utils.model_loader import ModelLoader, LOADING, WARMING_UP, READY, FAILED
+from utils.instrumentation import pipeline
 
 
 class DetectionTab:
@@ -114,22 +119,31 @@ class DetectionTab:
         threshold_frame = ttk.Frame(self.parking_settings_frame)
         threshold_frame.pack(fill=X, padx=5, pady=5)
 
-        ttk.Label(threshold_frame, text="Threshold:").pack(side=LEFT)
+        ttk.Label(threshold_frame, text="Fill Ratio:").pack(side=LEFT)
 
-        self.threshold_var = IntVar(value=self.app.parking_threshold)
-        threshold_slider = ttk.Scale(threshold_frame, from_=100, to=1000,
+        self.threshold_var = DoubleVar(value=self.app.parking_threshold)
+        threshold_slider = ttk.Scale(threshold_frame, from_=0.01, to=0.5,
                                      orient=HORIZONTAL, variable=self.threshold_var)
         threshold_slider.pack(side=LEFT, fill=X, expand=True, padx=5)
         threshold_slider.bind("<ButtonRelease-1>", self.update_threshold)
 
         # Create StringVar for formatted display
-        self.threshold_str_var = StringVar(value=str(self.app.parking_threshold))
+        self.threshold_str_var = StringVar(value=f"{self.app.parking_threshold:.2f}")
         threshold_label = ttk.Label(threshold_frame, textvariable=self.threshold_str_var)
         threshold_label.pack(side=LEFT, padx=5)
 
         # Set up trace for live updates while dragging
         self.threshold_var.trace_add("write", self.update_threshold_display)
 
+        # Per-space threshold calibration
+        calibration_frame = ttk.Frame(self.parking_settings_frame)
+        calibration_frame.pack(fill=X, padx=5, pady=5)
+
+        ttk.Button(calibration_frame, text="Calibrate Thresholds",
+                   command=self.start_calibration).pack(side=LEFT)
+        self.calibration_label = ttk.Label(calibration_frame, text="")
+        self.calibration_label.pack(side=LEFT, padx=5)
+
         # Debug mode
         debug_frame = ttk.Frame(self.parking_settings_frame)
         debug_frame.pack(fill=X, padx=5, pady=5)
@@ -217,7 +231,7 @@ class DetectionTab:
 
         ttk.Label(ml_method_frame, text="Method:").pack(side=LEFT)
         self.ml_method_var = StringVar(value="Faster R-CNN")
-        ml_method_options = ["Faster R-CNN", "YOLO + DeepSORT"]
+        ml_method_options = ["Faster R-CNN", "YOLO + DeepSORT", "ONNX Runtime"]
         ml_method_dropdown = ttk.Combobox(ml_method_frame, textvariable=self.ml_method_var,
                                           values=ml_method_options, state="readonly", width=15)
         ml_method_dropdown.pack(side=LEFT, padx=5)
@@ -297,16 +311,21 @@ class DetectionTab:
         self.frame_count = 0
         self.frame_skip = 2
         self.last_processing_time = 0
+        self.calibrator = None
+
+        # ML models are built and warmed up off the Tk thread
+        self.model_loader = ModelLoader()
+        self.loader_poll_pending = False
 
         # Show appropriate settings based on mode
         self.on_mode_change()
 
     # Methods for formatted slider displays
     def update_threshold_display(self, *args):
-        """Format the threshold value as an integer"""
+        """Format the fill ratio threshold to 2 decimal places"""
         try:
             value = self.threshold_var.get()
-            self.threshold_str_var.set(f"{int(value)}")
+            self.threshold_str_var.set(f"{value:.2f}")
         except:
             pass
 
@@ -354,8 +373,8 @@ class DetectionTab:
             self.tracking_frame.pack_forget()
             self.app.use_yolo_tracking = False
 
-        # If ML detection is currently enabled, reinitialize
-        if self.app.use_ml_detection:
+        # If ML detection is currently enabled, load the new method; the old one runs until it is ready
+        if self.ml_var.get():
             self.on_ml_toggle()
             self.on_ml_toggle()
 
@@ -437,7 +456,8 @@ class DetectionTab:
             self.running = True
             self.detection_button_var.set("Stop Detection")
 
-            # Start frame processing
+            # Start frame processing with fresh timings
+            pipeline.reset()
             self.process_frame()
 
             # Update app current video
@@ -471,6 +491,11 @@ class DetectionTab:
             self.video_capture.release()
             self.video_capture = None
 
+            # Log the stage timings of the run
+            if pipeline.counters.get("frames"):
+                for line in pipeline.summary("Detection run timings (ms)").splitlines():
+                    self.app.log_event(line, "DEBUG")
+
         # Clear previous frame
         self.prev_frame = None
 
@@ -481,6 +506,36 @@ class DetectionTab:
         """Update parking threshold value"""
         self.app.parking_threshold = self.threshold_var.get()
 
+    def start_calibration(self):
+        """Learn per-space thresholds from the next window of frames"""
+        if not self.app.posList:
+            messagebox.showinfo("Calibration", "Define parking spaces before calibrating.")
+            return
+
+        self.calibrator = ThresholdCalibrator(len(self.app.posList))
+        self.calibration_label.config(text="0%")
+        self.app.log_event(f"Calibrating thresholds over {self.calibrator.num_frames} frames")
+
+        if not self.running:
+            self.toggle_detection()
+
+    def update_calibration(self, ratios):
+        """Feed one frame of fill ratios to the running calibration"""
+        if len(ratios) != self.calibrator.num_spaces:
+            # Layout changed while calibrating
+            self.calibrator = None
+            self.calibration_label.config(text="Cancelled")
+            self.app.log_event("Threshold calibration cancelled: parking spaces changed")
+            return
+
+        if self.calibrator.add(ratios):
+            thresholds = self.calibrator.thresholds()
+            self.calibrator = None
+            self.app.update_space_thresholds(thresholds)
+            self.calibration_label.config(text="Done")
+        else:
+            self.calibration_label.config(text=f"{self.calibrator.progress:.0%}")
+
     def update_line_height(self, event=None):
         """Update line height value"""
         self.app.line_height = self.line_var.get()
@@ -509,53 +564,99 @@ class DetectionTab:
         )
 
     def on_ml_toggle(self):
-        """Toggle ML detection on/off"""
+        """Toggle ML detection on/off; models are loaded in the background"""
         ml_enabled = self.ml_var.get()
-        self.app.use_ml_detection = ml_enabled
 
         # Update confidence setting in app
         self.app.ml_confidence = self.confidence_var.get()
 
         if ml_enabled:
-            try:
-                # Check which ML method to use
-                ml_method = self.ml_method_var.get()
-
-                if ml_method == "YOLO + DeepSORT":
-                    # Initialize the YOLO + DeepSORT tracker
-                    self.app.ml_detector = initialize_tracker(
-                        confidence_threshold=self.app.ml_confidence,
-                        use_cuda=True  # You can make this configurable
-                    )
-
-                    # Store in a separate variable for tracking
-                    self.app.vehicle_tracker = self.app.ml_detector
-                    self.app.log_event("YOLO + DeepSORT tracker initialized")
-
-                else:
-                    # Initialize the original ML detector
-                    self.app.log_event("Initializing ML detector...")
-                    from models.vehicle_detector import VehicleDetector
-                    self.app.ml_detector = VehicleDetector(confidence_threshold=self.app.ml_confidence)
-                    self.app.vehicle_tracker = None
-                    self.app.log_event("ML detector initialized")
-
-                # Show success message
-                self.ml_status_label.config(text="ML Detection: Active", foreground="green")
-
-            except Exception as e:
-                self.ml_var.set(False)
-                self.app.use_ml_detection = False
-                error_msg = f"Failed to initialize ML detection: {str(e)}"
-                self.app.log_event(error_msg)
-                self.ml_status_label.config(text="ML Detection: Error", foreground="red")
-                messagebox.showerror("ML Initialization Error", error_msg)
+            ml_method = self.ml_method_var.get()
+            self.app.log_event(f"Loading {ml_method} detector in the background...")
+            self.ml_status_label.config(text="ML Detection: Loading...", foreground="orange")
+
+            # The current pipeline keeps running until the new model is warmed up
+            if ml_method == "YOLO + DeepSORT":
+                self.model_loader.load(ml_method, self._create_tracker, warmup=self._warm_up_tracker,
+                                       frame_size=(720, 1280))
+            else:
+                self.model_loader.load(ml_method, lambda: self._create_detector(ml_method))
+            if not self.loader_poll_pending:
+                self.poll_model_loader()
         else:
             # Disable ML detection
+            self.model_loader.cancel()
+            self.app.use_ml_detection = False
             self.app.ml_detector = None
             self.app.vehicle_tracker = None
+            self.app.ml_method = None
             self.ml_status_label.config(text="ML Detection: Disabled", foreground="grey")
 
+    def _create_tracker(self):
+        """Initialize the YOLO + DeepSORT tracker (runs on the loader thread)"""
+        return initialize_tracker(
+            confidence_threshold=self.app.ml_confidence,
+            use_cuda=True  # You can make this configurable
+        )
+
+    @staticmethod
+    def _warm_up_tracker(tracker, frame):
+        # Only the detector needs priming; feeding the tracker would create phantom tracks
+        tracker.detect_vehicles(frame)
+
+    def _create_detector(self, ml_method="Faster R-CNN"):
+        """Initialize a frame-by-frame ML detector (runs on the loader thread)"""
+        if self.app.detector_process:
+            from models.detector_worker import DetectorWorker as VehicleDetector
+        else:
+            from models.vehicle_detector import VehicleDetector
+        if ml_method == "ONNX Runtime":
+            # Only exported models; falling back to PyTorch would hide a missing export
+            detector = VehicleDetector(confidence_threshold=self.app.ml_confidence, backend="onnx_yolov8",
+                                       candidates=ONNX_BACKENDS)
+        else:
+            detector = VehicleDetector(confidence_threshold=self.app.ml_confidence)
+        if detector.model is None:
+            error = getattr(detector, 'error', None)
+            if hasattr(detector, 'close'):
+                detector.close()
+            raise RuntimeError(error or "No detection model could be loaded")
+        return detector
+
+    def poll_model_loader(self):
+        """Follow the background model load and switch the pipeline over when it is ready"""
+        state, progress, message = self.model_loader.status()
+        self.loader_poll_pending = state in (LOADING, WARMING_UP)
+
+        if self.loader_poll_pending:
+            self.ml_status_label.config(text=f"ML Detection: {message} {progress:.0%}", foreground="orange")
+            self.parent.after(100, self.poll_model_loader)
+
+        elif state == READY:
+            ml_method = self.model_loader.name
+            detector = self.model_loader.model
+            detector.set_confidence_threshold(self.app.ml_confidence)
+
+            self.app.ml_detector = detector
+            self.app.vehicle_tracker = detector if ml_method == "YOLO + DeepSORT" else None
+            self.app.ml_method = ml_method
+            self.app.use_ml_detection = True
+            self.last_detections = None
+
+            self.app.log_event(f"{message}; ML detection active")
+            self.ml_status_label.config(text="ML Detection: Active", foreground="green")
+
+        elif state == FAILED:
+            self.ml_var.set(False)
+            self.app.use_ml_detection = False
+            self.app.ml_detector = None
+            self.app.vehicle_tracker = None
+            self.app.ml_method = None
+            error_msg = f"Failed to initialize ML detection: {self.model_loader.error}"
+            self.app.log_event(error_msg, "ERROR")
+            self.ml_status_label.config(text="ML Detection: Error", foreground="red")
+            messagebox.showerror("ML Initialization Error", error_msg)
+
     def on_confidence_change(self, event=None):
         """Update ML confidence threshold"""
         self.app.ml_confidence = self.confidence_var.get()
@@ -578,7 +679,8 @@ class DetectionTab:
             start_time = time.time()
 
             # Read frame from video
-            ret, img = self.video_capture.read()
+            with pipeline.stage("capture"):
+                ret, img = self.video_capture.read()
 
             # Check if frame was read successfully
             if not ret:
@@ -588,6 +690,7 @@ class DetectionTab:
                     self.stop_detection()
                 else:
                     # For webcam, this could be a temporary error
+                    pipeline.frame_dropped()
                     self.parent.after(100, self.process_frame)
                 return
 
@@ -610,41 +713,35 @@ class DetectionTab:
                 ref_width, ref_height = self.app.reference_dimensions[self.app.current_reference_image]
                 if ref_width != original_width or ref_height != original_height:
                     self.app.log_event(
-                        f"Updating dimensions from {ref_width}x{ref_height} to {original_width}x{original_height}")
+                        f"Updating dimensions from {ref_width}x{ref_height} to {original_width}x{original_height}",
+                        "DEBUG")
 
             if self.app.detection_mode == "parking":
                 # Convert to grayscale and blur for processing
-                imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
-                imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                                     cv2.THRESH_BINARY_INV, 25, 16)
-                imgProcessed = cv2.medianBlur(imgThreshold, 5)
-
-                # Apply dilation and erosion to clean up
-                kernel = np.ones((3, 3), np.uint8)
-                imgProcessed = cv2.dilate(imgProcessed, kernel, iterations=1)
-                imgProcessed = cv2.erode(imgProcessed, kernel, iterations=1)
-
-                # Get scaled positions for current frame size
-                scaled_positions = self.app.posList.copy()
-
-                # Get image dimensions to compute scale factors
-                img_height, img_width = img.shape[:2]
+                with pipeline.stage("preprocess"):
+                    imgProcessed = preprocess_frame_for_parking_detection(img, self.app.preprocess_params)
 
-                # Calculate scale factors if using small processing image
+                # Positions are already scaled to the current frame size
+                scaled_positions = self.app.posList.copy()
                 processing_img = img.copy()
-                width_scale = 1.0
-                height_scale = 1.0
 
-                # Process with scaled positions and threshold
+                # Score all spaces once; fill ratios do not depend on resolution
+                with pipeline.stage("occupancy"):
+                    scores = score_parking_spaces(imgProcessed, scaled_positions,
+                                                  self.app.parking_threshold, self.app.space_thresholds)
+                if self.calibrator is not None:
+                    self.update_calibration(scores[1])
+                self.app.record_occupancy(scores)
+
                 debug_mode = hasattr(self, 'debug_var') and self.debug_var.get() == "On"
-                processed_small_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
-                    imgProcessed, processing_img.copy(), scaled_positions,
-                    int(self.app.parking_threshold * width_scale), debug=debug_mode
-                )
+                with pipeline.stage("annotate"):
+                    processed_small_img, free_spaces, occupied_spaces, total_spaces = process_parking_spaces(
+                        imgProcessed, processing_img, scaled_positions,
+                        self.app.parking_threshold, debug=debug_mode, scores=scores
+                    )
 
-                # Scale back up for display if needed
-                processed_img = cv2.resize(processed_small_img, (self.app.image_width, self.app.image_height))
+                    # Scale back up for display if needed
+                    processed_img = cv2.resize(processed_small_img, (self.app.image_width, self.app.image_height))
 
                 # Update app state
                 self.app.free_spaces = free_spaces
@@ -652,7 +749,8 @@ class DetectionTab:
                 self.app.total_spaces = total_spaces
 
                 # Update allocation data
-                self.update_parking_data_for_allocation(imgProcessed)
+                with pipeline.stage("allocation"):
+                    self.update_parking_data_for_allocation(imgProcessed, scores)
 
             elif self.app.detection_mode == "vehicle":
                 # Initialize the frame if needed
@@ -676,17 +774,17 @@ class DetectionTab:
                         print(f"Using ML detection for frame {self.frame_count}")
 
                         # Check if we're using YOLO + DeepSORT
-                        ml_method = getattr(self, 'ml_method_var', None)
-                        if ml_method and ml_method.get() == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
+                        if self.app.ml_method == "YOLO + DeepSORT" and self.app.vehicle_tracker:
                             # Process with tracking
-                            processed_img, new_matches, new_vehicle_counter = process_ml_detections_with_tracking(
-                                img.copy(),
-                                self.app.vehicle_tracker,
-                                self.app.line_height,
-                                self.app.offset,
-                                self.app.vehicle_counter,
-                                self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
-                            )
+                            with pipeline.stage("tracking"):
+                                processed_img, new_matches, new_vehicle_counter = process_ml_detections_with_tracking(
+                                    img.copy(),
+                                    self.app.vehicle_tracker,
+                                    self.app.line_height,
+                                    self.app.offset,
+                                    self.app.vehicle_counter,
+                                    self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
+                                )
 
                             # Update app state
                             self.app.matches = new_matches
@@ -698,7 +796,8 @@ class DetectionTab:
                             # Only run ML detection on certain frames to improve performance
                             if self.frame_count % self.frame_skip == 0:
                                 # Use our safe detection method
-                                detections = self.safe_ml_detection(img)
+                                with pipeline.stage("detection"):
+                                    detections = self.safe_ml_detection(img)
 
                                 # Store for use in skipped frames
                                 self.last_detections = detections
@@ -706,22 +805,22 @@ class DetectionTab:
                             else:
                                 # Use the last known detections for in-between frames
                                 detections = self.last_detections if hasattr(self,
-                                                                             'last_detections') and self.last_detections is not None else []
+                                                                             'last_detections') and self.last_detections is not None else empty_detections()
 
-                            # Check if we have valid detections to process
-                            if not isinstance(detections, list):
-                                raise TypeError(f"Expected list of detections but got {type(detections)}")
+                            # Check if we have valid detections to process (raises TypeError otherwise)
+                            detections = as_detections(detections)
 
                             # Process the ML detections
-                            processed_img, new_matches, new_vehicle_counter = process_ml_detections(
-                                img.copy(),
-                                detections,
-                                self.app.line_height,
-                                self.app.offset,
-                                self.app.matches,
-                                self.app.vehicle_counter,
-                                self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
-                            )
+                            with pipeline.stage("annotate"):
+                                processed_img, new_matches, new_vehicle_counter = process_ml_detections(
+                                    img.copy(),
+                                    detections,
+                                    self.app.line_height,
+                                    self.app.offset,
+                                    self.app.matches,
+                                    self.app.vehicle_counter,
+                                    self.app.ml_detector.classes if hasattr(self.app.ml_detector, 'classes') else []
+                                )
 
                             # Update app state
                             self.app.matches = new_matches
@@ -732,9 +831,23 @@ class DetectionTab:
 
                     except Exception as e:
                         print(f"ML detection error: {str(e)}")
-                        self.app.log_event(f"ML detection error: {str(e)}")
+                        self.app.log_event(f"ML detection error: {str(e)}", "ERROR")
 
                         # Fallback to traditional method
+                        with pipeline.stage("detection"):
+                            processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
+                                img.copy(),
+                                self.prev_frame,
+                                self.app.line_height,
+                                self.app.min_contour_width,
+                                self.app.min_contour_height,
+                                self.app.offset,
+                                self.app.matches,
+                                self.app.vehicle_counter
+                            )
+                else:
+                    # Use traditional vehicle detection
+                    with pipeline.stage("detection"):
                         processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
                             img.copy(),
                             self.prev_frame,
@@ -745,18 +858,6 @@ class DetectionTab:
                             self.app.matches,
                             self.app.vehicle_counter
                         )
-                else:
-                    # Use traditional vehicle detection
-                    processed_img, new_matches, new_vehicle_counter = detect_vehicles_traditional(
-                        img.copy(),
-                        self.prev_frame,
-                        self.app.line_height,
-                        self.app.min_contour_width,
-                        self.app.min_contour_height,
-                        self.app.offset,
-                        self.app.matches,
-                        self.app.vehicle_counter
-                    )
 
                 # Update app state
                 self.app.matches = new_matches
@@ -769,27 +870,28 @@ class DetectionTab:
             # Update the previous frame for the next iteration
             self.prev_frame = img.copy()
 
-            # Convert to RGB for display
-            img_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
+            with pipeline.stage("display"):
+                # Convert to RGB for display
+                img_rgb = cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB)
 
-            # Convert to PIL format
-            img_pil = Image.fromarray(img_rgb)
+                # Convert to PIL format
+                img_pil = Image.fromarray(img_rgb)
 
-            # Reuse ImageTk object if possible
-            if not hasattr(self, 'img_tk') or self.img_tk is None:
-                self.img_tk = ImageTk.PhotoImage(image=img_pil)
-            else:
-                # Create a new PhotoImage (can't update existing one)
-                self.img_tk = ImageTk.PhotoImage(image=img_pil)
+                # Reuse ImageTk object if possible
+                if not hasattr(self, 'img_tk') or self.img_tk is None:
+                    self.img_tk = ImageTk.PhotoImage(image=img_pil)
+                else:
+                    # Create a new PhotoImage (can't update existing one)
+                    self.img_tk = ImageTk.PhotoImage(image=img_pil)
 
-            # Display the image
-            if hasattr(self, 'image_label'):
-                self.image_label.configure(image=self.img_tk)
-                self.image_label.image = self.img_tk
-            else:
-                self.image_label = Label(self.video_canvas, image=self.img_tk)
-                self.image_label.pack(fill=BOTH, expand=True)
-                self.image_label.image = self.img_tk
+                # Display the image
+                if hasattr(self, 'image_label'):
+                    self.image_label.configure(image=self.img_tk)
+                    self.image_label.image = self.img_tk
+                else:
+                    self.image_label = Label(self.video_canvas, image=self.img_tk)
+                    self.image_label.pack(fill=BOTH, expand=True)
+                    self.image_label.image = self.img_tk
 
             # Update status information
             self.update_status_info(
@@ -799,16 +901,24 @@ class DetectionTab:
                 self.app.vehicle_counter
             )
 
+            # Feed the time-series store (throttled to one sample per second)
+            self.app.record_stats_sample()
+
             # Update allocation tab less frequently
             if hasattr(self.app, 'allocation_tab') and self.frame_count % 15 == 0:
-                self.app.allocation_tab.update_visualization()
+                with pipeline.stage("lot_view"):
+                    self.app.allocation_tab.update_visualization()
                 if self.frame_count % 30 == 0:
                     self.app.allocation_tab.update_statistics()
 
             # Calculate and display processing time
             processing_time = (time.time() - start_time) * 1000  # Convert to ms
             self.last_processing_time = processing_time
-            self.processing_time_label.config(text=f"Processing: {processing_time:.1f} ms")
+            pipeline.frame_done(processing_time / 1000)
+            frame_stats = pipeline.histogram("frame")
+            self.processing_time_label.config(
+                text=f"Processing: {processing_time:.1f} ms (p95 {frame_stats.percentile(95) * 1000:.1f} ms), "
+                     f"{pipeline.fps():.1f} FPS, {pipeline.dropped_frames} dropped")
 
             # Schedule next frame processing with better delay
             if self.app.detection_mode == "parking" or not self.app.use_ml_detection:
@@ -817,11 +927,12 @@ class DetectionTab:
                 self.parent.after(40, self.process_frame)  # 40ms delay for ML processing
 
         except Exception as e:
-            self.app.log_event(f"Error processing frame: {str(e)}")
+            pipeline.frame_dropped()
+            self.app.log_event(f"Error processing frame: {str(e)}", "ERROR")
             messagebox.showerror("Error", f"Error processing video frame: {str(e)}")
             self.stop_detection()
 
-    def update_parking_data_for_allocation(self, img_pro):
+    def update_parking_data_for_allocation(self, img_pro, scores=None):
         """Update parking data for allocation system"""
         try:
             # Make sure app has parking_manager
@@ -833,14 +944,16 @@ class DetectionTab:
             if not hasattr(self.app.parking_manager, 'parking_data'):
                 self.app.parking_manager.parking_data = {}
 
+            if scores is None:
+                scores = score_parking_spaces(img_pro, self.app.posList,
+                                              self.app.parking_threshold, self.app.space_thresholds)
+            occupied, _, valid = scores
+
             # Update parking spaces data
             for i, (x, y, w, h) in enumerate(self.app.posList):
                 # Ensure coordinates are within image bounds
-                if (y >= 0 and y + h < img_pro.shape[0] and x >= 0 and x + w < img_pro.shape[1]):
-                    # Get crop of parking space
-                    img_crop = img_pro[y:y + h, x:x + w]
-                    count = cv2.countNonZero(img_crop)
-                    is_occupied = count >= self.app.parking_threshold
+                if valid[i]:
+                    is_occupied = bool(occupied[i])
 
                     # Generate section based on position
                     section = "A" if x < img_pro.shape[1] / 2 else "B"
@@ -863,53 +976,35 @@ class DetectionTab:
                         # Just update occupancy status
                         self.app.parking_manager.parking_data[space_id]['occupied'] = is_occupied
 
-            self.app.log_event(f"Updated parking data for {len(self.app.posList)} spaces")
+            self.app.log_event(f"Updated parking data for {len(self.app.posList)} spaces", "DEBUG")
         except Exception as e:
-            self.app.log_event(f"Error updating parking allocation data: {str(e)}")
+            self.app.log_event(f"Error updating parking allocation data: {str(e)}", "ERROR")
 
     def safe_ml_detection(self, img):
         """Safely perform ML detection with error handling and fallback"""
         try:
             if not self.app.ml_detector:
-                return []
+                return empty_detections()
 
             # Check if we're using the tracker or regular detector
-            ml_method = getattr(self, 'ml_method_var', None)
-            if ml_method and ml_method.get() == "YOLO + DeepSORT" and hasattr(self.app, 'vehicle_tracker'):
+            if self.app.ml_method == "YOLO + DeepSORT" and self.app.vehicle_tracker:
                 # For YOLO+DeepSORT, we don't need to do anything here
                 # The detections will be handled in process_ml_detections_with_tracking
-                return []
+                return empty_detections()
 
             # Use the regular detector
             # Create a smaller image for detection
             ml_img = cv2.resize(img, (640, 360))
 
-            # Get vehicle detections
-            detections = self.app.ml_detector.detect_vehicles(ml_img)
-
-            # Ensure we have a valid result
-            if detections is None:
-                return []
+            # Get vehicle detections; a detector process works on the frame while this one is shown
+            if hasattr(self.app.ml_detector, 'detect_pipelined'):
+                detections = self.app.ml_detector.detect_pipelined(ml_img)
+            else:
+                detections = self.app.ml_detector.detect_vehicles(ml_img)
 
             # Scale detection coordinates back to original image size
-            if len(detections) > 0:
-                width_scale = self.app.image_width / 640
-                height_scale = self.app.image_height / 360
-
-                for i, detection in enumerate(detections):
-                    if len(detection) >= 3:
-                        box = detection[0]
-                        if len(box) >= 4:
-                            x1, y1, x2, y2 = box
-                            detections[i][0] = [
-                                int(x1 * width_scale),
-                                int(y1 * height_scale),
-                                int(x2 * width_scale),
-                                int(y2 * height_scale)
-                            ]
-
-            return detections
+            return rescale(detections, self.app.image_width / 640, self.app.image_height / 360)
 
         except Exception as e:
             print(f"Error in ML detection: {str(e)}")
-            return []
\ No newline at end of file
+            return empty_detections()
\ No newline at end of file
@@ -1,16 +1,29 @@
-from tkinter import Frame, Label, Button, Text, Scrollbar, messagebox
+from tkinter import Frame, Label, Button, Text, Scrollbar, StringVar, messagebox, ttk
 from tkinter import LEFT, RIGHT, BOTH, X, Y
 from utils.resource_manager import save_log
+from utils.event_log import LEVELS
 
 
 class LogTab:
+    # How often the view polls the event log for changes (ms)
+    REFRESH_INTERVAL = 250
+
     def __init__(self, parent, app):
         self.parent = parent
         self.app = app
 
+        # Virtual view state: index of the first visible entry and whether to follow new entries
+        self.first_visible = 0
+        self.follow_tail = True
+        self.rendered_version = None
+        self.rendered_first = None
+
         # Setup UI components
         self.setup_ui()
 
+        # Poll for new entries on the Tk thread; log_event may be called from any thread
+        self.parent.after(self.REFRESH_INTERVAL, self.poll_log)
+
     def setup_ui(self):
         """Set up the log tab UI"""
         # Log tab frame
@@ -29,47 +42,121 @@ class LogTab:
         self.save_log_button = Button(self.log_header, text="Save Log", command=self.save_log)
         self.save_log_button.pack(side=RIGHT, padx=5)
 
-        # Log text area with scrollbar
+        # Level filter
+        self.level_var = StringVar(value="INFO")
+        level_combo = ttk.Combobox(self.log_header, textvariable=self.level_var,
+                                   values=list(LEVELS), state="readonly", width=8)
+        level_combo.pack(side=RIGHT, padx=5)
+        level_combo.bind("<<ComboboxSelected>>", self.on_level_change)
+        Label(self.log_header, text="Level:").pack(side=RIGHT)
+
+        # Log text area with scrollbar; only the visible entries are ever inserted
         self.log_text_frame = Frame(self.log_frame)
         self.log_text_frame.pack(fill=BOTH, expand=True, pady=10)
 
-        self.log_text = Text(self.log_text_frame, wrap="word", height=20)
+        self.log_text = Text(self.log_text_frame, wrap="none", height=20)
         self.log_text.pack(side=LEFT, fill=BOTH, expand=True)
 
-        self.log_scrollbar = Scrollbar(self.log_text_frame, command=self.log_text.yview)
+        self.log_scrollbar = Scrollbar(self.log_text_frame, command=self.on_scrollbar)
         self.log_scrollbar.pack(side=RIGHT, fill=Y)
 
-        self.log_text.config(yscrollcommand=self.log_scrollbar.set)
         self.log_text.config(state="disabled")
+        self.log_text.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.log_text.bind("<Button-4>", self.on_mouse_wheel)
+        self.log_text.bind("<Button-5>", self.on_mouse_wheel)
+        self.log_text.bind("<Configure>", lambda e: self.render(force=True))
 
-        # Add any existing logs
-        for log_entry in self.app.log_data:
-            self.add_log_entry(log_entry)
+    def visible_lines(self):
+        """Number of text lines that fit in the widget"""
+        line_height = max(1, self.log_text.tk.call("font", "metrics", self.log_text.cget("font"), "-linespace"))
+        return max(1, self.log_text.winfo_height() // line_height)
 
     def add_log_entry(self, entry):
-        """Add an entry to the log text"""
+        """Entries are read from the event log; just schedule a redraw"""
+        self.rendered_version = None
+
+    def poll_log(self):
+        """Redraw if the event log changed since the last render"""
+        try:
+            if self.app.event_log.version != self.rendered_version:
+                self.render()
+        finally:
+            self.parent.after(self.REFRESH_INTERVAL, self.poll_log)
+
+    def render(self, force=False):
+        """Render the visible slice of the log"""
+        min_level = self.level_var.get()
+        total = self.app.event_log.count(min_level)
+        page = self.visible_lines()
+        max_first = max(0, total - page)
+
+        if self.follow_tail:
+            self.first_visible = max_first
+        self.first_visible = min(max(0, self.first_visible), max_first)
+
+        version = self.app.event_log.version
+        if not force and version == self.rendered_version and self.first_visible == self.rendered_first:
+            return
+
+        lines = self.app.event_log.window(self.first_visible, page, min_level)
         self.log_text.config(state="normal")
-        self.log_text.insert("end", entry + "\n")
-        self.log_text.see("end")  # Auto-scroll to the end
+        self.log_text.delete("1.0", "end")
+        self.log_text.insert("end", "\n".join(lines))
         self.log_text.config(state="disabled")
 
+        # Scrollbar reflects the position within the whole log, not the widget contents
+        if total:
+            self.log_scrollbar.set(self.first_visible / total, min(1.0, (self.first_visible + page) / total))
+        else:
+            self.log_scrollbar.set(0.0, 1.0)
+
+        self.rendered_version = version
+        self.rendered_first = self.first_visible
+
+    def scroll_to(self, first):
+        total = self.app.event_log.count(self.level_var.get())
+        page = self.visible_lines()
+        self.first_visible = min(max(0, first), max(0, total - page))
+        self.follow_tail = self.first_visible >= total - page
+        self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """Handle scrollbar drags and clicks"""
+        total = self.app.event_log.count(self.level_var.get())
+        page = self.visible_lines()
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * total))
+        elif action == "scroll":
+            step = page if unit == "pages" else 1
+            self.scroll_to(self.first_visible + int(amount) * step)
+
+    def on_mouse_wheel(self, event):
+        """Scroll three lines per wheel step"""
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first_visible - 3)
+        else:
+            self.scroll_to(self.first_visible + 3)
+        return "break"
+
+    def on_level_change(self, event=None):
+        self.follow_tail = True
+        self.render(force=True)
+
     def clear_log(self):
         """Clear the log display"""
         if messagebox.askyesno("Confirm", "Are you sure you want to clear the log?"):
-            self.log_text.config(state="normal")
-            self.log_text.delete(1.0, "end")
-            self.log_text.config(state="disabled")
-            self.app.log_data = []
+            self.app.event_log.clear()
+            self.follow_tail = True
             self.app.log_event("Log cleared")
 
     def save_log(self):
         """Save the log to a file"""
         try:
-            filename = save_log(self.app.log_data, self.app.log_dir)
+            filename = save_log(self.app.event_log.formatted(), self.app.log_dir)
             if filename:
                 messagebox.showinfo("Success", f"Log saved to {filename}")
                 self.app.log_event(f"Log saved to {filename}")
             else:
                 messagebox.showerror("Error", "Failed to save log file")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save log: {str(e)}")
\ No newline at end of file
+            messagebox.showerror("Error", f"Failed to save log: {str(e)}")
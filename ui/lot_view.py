@@ -0,0 +1,406 @@
+"""
+Lot map views for the parking allocation tab
+
+MatplotlibLotView draws every space as one PatchCollection built once per
+layout. Updates only touch the face colours and labels of spaces whose
+state changed and are redrawn with blitting: the static parts (space ids,
+legend, axes) are cached as a background bitmap and only the animated
+artists (space colours, vehicle labels, title) are drawn over it.
+
+CanvasLotView is a plain Tk Canvas with one rectangle per space placed at
+its real position in the lot. Only spaces that change state are
+reconfigured, and the map can be zoomed (mouse wheel) and panned (drag)
+across thousands of spaces without matplotlib.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+FREE_COLOR = (0.0, 0.5, 0.0, 0.6)  # 'green' at the original alpha
+OCCUPIED_COLOR = (1.0, 0.0, 0.0, 0.6)  # 'red'
+
+
+def space_state(parking_data, allocated_vehicles=None):
+    """
+    Current state of every space, with simulated allocations applied
+
+    Returns:
+        (space_ids, occupied bool array, vehicle id object array)
+    """
+    space_ids = tuple(parking_data.keys())
+    occupied = np.fromiter((data.get('occupied', True) for data in parking_data.values()),
+                           dtype=bool, count=len(space_ids))
+    vehicles = np.array([data.get('vehicle_id') for data in parking_data.values()], dtype=object)
+
+    if allocated_vehicles:
+        index = {space_id: i for i, space_id in enumerate(space_ids)}
+        for vehicle_id, space_id in allocated_vehicles.items():
+            i = index.get(space_id)
+            if i is not None:
+                occupied[i] = True
+                vehicles[i] = vehicle_id
+    return space_ids, occupied, vehicles
+
+
+class MatplotlibLotView:
+    """Grid lot map in a matplotlib figure, updated incrementally"""
+
+    SPACE_WIDTH = 100
+    SPACE_HEIGHT = 60
+    MARGIN = 20
+
+    def __init__(self, master):
+        # Imported here: matplotlib is only needed once the tab is opened
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(10, 6))
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, master)
+        self.widget = self.canvas.get_tk_widget()
+
+        self.space_ids = None
+        self.occupied = None
+        self.vehicles = None
+        self.positions = None
+        self.collection = None
+        self.vehicle_texts = {}  # Space index -> label, created when first needed
+        self.title = None
+        self.timestamp = None
+        self.background = None
+
+        # Any full redraw (first show, resize) refreshes the cached background
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def grid(self, **kwargs):
+        self.widget.grid(**kwargs)
+
+    def grid_remove(self):
+        self.widget.grid_remove()
+
+    def show(self, parking_data, allocated_vehicles=None):
+        """
+        Bring the map up to date with parking_data
+
+        Returns:
+            True if anything was redrawn
+        """
+        space_ids, occupied, vehicles = space_state(parking_data, allocated_vehicles)
+        if not space_ids:
+            self.show_message("No parking data available")
+            return True
+
+        if space_ids != self.space_ids:
+            self._build(space_ids, occupied, vehicles)
+            return True
+
+        changed = np.flatnonzero((occupied != self.occupied) | (vehicles != self.vehicles))
+        if len(changed) == 0:
+            return False
+
+        self._apply(changed, occupied, vehicles)
+        self._blit()
+        return True
+
+    def show_message(self, message, color='black'):
+        """Replace the map with a message"""
+        self._reset()
+        self.ax.clear()
+        self.ax.text(0.5, 0.5, message, ha='center', va='center', fontsize=14 if color == 'black' else 10,
+                     color=color)
+        self.canvas.draw()
+
+    def _reset(self):
+        self.space_ids = None
+        self.collection = None
+        self.vehicle_texts = {}
+        self.title = None
+        self.timestamp = None
+        self.background = None
+
+    def _layout(self, total):
+        """Lower-left corners of the spaces in a near-square grid"""
+        cols = max(4, int(np.ceil(np.sqrt(total))))
+        rows = int(np.ceil(total / cols))
+        index = np.arange(total)
+        x = (index % cols) * self.SPACE_WIDTH + self.MARGIN
+        y = (rows - index // cols - 1) * self.SPACE_HEIGHT + self.MARGIN  # Invert y for better visualization
+        return np.column_stack([x, y]), cols, rows
+
+    def _build(self, space_ids, occupied, vehicles):
+        """Create the artists for a new layout"""
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import Rectangle
+
+        self._reset()
+        self.ax.clear()
+
+        self.positions, cols, rows = self._layout(len(space_ids))
+        self.ax.set_xlim(0, cols * self.SPACE_WIDTH + 2 * self.MARGIN)
+        self.ax.set_ylim(0, rows * self.SPACE_HEIGHT + 2 * self.MARGIN)
+
+        rects = [Rectangle((x, y), self.SPACE_WIDTH - 5, self.SPACE_HEIGHT - 5) for x, y in self.positions]
+        self.collection = PatchCollection(rects, edgecolors='black', linewidths=2, animated=True)
+        self.ax.add_collection(self.collection)
+
+        # Space ids never change, so they live in the background
+        for (x, y), space_id in zip(self.positions, space_ids):
+            self.ax.text(x + 5, y + self.SPACE_HEIGHT - 15, space_id, fontsize=8, weight='bold', color='white')
+
+        self.ax.legend([Rectangle((0, 0), 1, 1, facecolor=FREE_COLOR),
+                        Rectangle((0, 0), 1, 1, facecolor=OCCUPIED_COLOR)], ['Free', 'Occupied'])
+
+        # Remove axis ticks for cleaner look
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+
+        self.title = self.ax.set_title("", animated=True)
+        self.timestamp = self.ax.text(self.MARGIN, self.MARGIN / 2, "", fontsize=8, animated=True)
+
+        self.space_ids = space_ids
+        self.occupied = np.zeros(len(space_ids), dtype=bool)
+        self.vehicles = np.full(len(space_ids), None, dtype=object)
+        self._apply(np.arange(len(space_ids)), occupied, vehicles)
+
+        # Full draw; _on_draw caches the background and draws the animated artists
+        self.canvas.draw()
+
+    def _apply(self, changed, occupied, vehicles):
+        """Update colours and labels of the changed spaces"""
+        self.occupied = occupied
+        self.vehicles = vehicles
+        self.collection.set_facecolor(np.where(occupied[:, None], OCCUPIED_COLOR, FREE_COLOR))
+
+        for i in changed:
+            label = f"V: {vehicles[i]}" if occupied[i] and vehicles[i] else ""
+            text = self.vehicle_texts.get(i)
+            if text is None:
+                if not label:
+                    continue
+                x, y = self.positions[i]
+                text = self.ax.text(x + 5, y + 10, "", fontsize=8, color='white', animated=True)
+                self.vehicle_texts[i] = text
+            text.set_text(label)
+
+        free_count = int(len(occupied) - occupied.sum())
+        self.title.set_text(f"Parking Status: {free_count}/{len(occupied)} Available")
+        self.timestamp.set_text(f"Last Updated: {datetime.now().strftime('%H:%M:%S.%f')}")
+
+    def _draw_animated(self):
+        self.ax.draw_artist(self.collection)
+        for text in self.vehicle_texts.values():
+            if text.get_text():
+                self.ax.draw_artist(text)
+        self.ax.draw_artist(self.title)
+        self.ax.draw_artist(self.timestamp)
+
+    def _on_draw(self, event):
+        if self.collection is None:
+            return
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _blit(self):
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+
+class CanvasLotView:
+    """Lot map in its real geometry on a Tk Canvas, with zoom and pan"""
+
+    FREE_FILL = "#3cb043"
+    OCCUPIED_FILL = "#d9342b"
+    OUTLINE = "black"
+    BACKGROUND = "#3a3a3a"
+    ZOOM_STEP = 1.2
+    MIN_LABEL_HEIGHT = 24  # Labels are hidden while spaces are smaller than this (pixels)
+    FIT_PADDING = 10
+
+    def __init__(self, master):
+        import tkinter as tk
+        from tkinter import ttk
+
+        self.frame = ttk.Frame(master)
+        self.status = ttk.Label(self.frame, text="", anchor="w")
+        self.status.pack(fill="x", padx=5)
+        self.canvas = tk.Canvas(self.frame, background=self.BACKGROUND, highlightthickness=0, confine=False)
+        self.canvas.pack(fill="both", expand=True)
+
+        self.space_ids = None
+        self.occupied = None
+        self.vehicles = None
+        self.items = None  # Rectangle item per space
+        self.vehicle_texts = {}  # Space index -> text item, created when first needed
+        self.space_height = 0.0  # Median space height in lot units
+        self.zoom = 1.0  # Pixels per lot unit
+        self.labels_visible = True
+        self._needs_fit = False
+
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self._zoom_at(event.x, event.y, self.ZOOM_STEP))
+        self.canvas.bind("<Button-5>", lambda event: self._zoom_at(event.x, event.y, 1 / self.ZOOM_STEP))
+        self.canvas.bind("<ButtonPress-1>", lambda event: self.canvas.scan_mark(event.x, event.y))
+        self.canvas.bind("<B1-Motion>", lambda event: self.canvas.scan_dragto(event.x, event.y, gain=1))
+        self.canvas.bind("<Double-Button-1>", lambda event: self.fit())
+        self.canvas.bind("<Configure>", self._on_configure)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def grid_remove(self):
+        self.frame.grid_remove()
+
+    def show(self, parking_data, allocated_vehicles=None):
+        """
+        Bring the map up to date with parking_data
+
+        Returns:
+            True if anything was redrawn
+        """
+        space_ids, occupied, vehicles = space_state(parking_data, allocated_vehicles)
+        if not space_ids:
+            self.show_message("No parking data available")
+            return True
+
+        if space_ids != self.space_ids:
+            self._build(space_ids, self._geometry(parking_data), occupied, vehicles)
+            return True
+
+        changed = np.flatnonzero((occupied != self.occupied) | (vehicles != self.vehicles))
+        if len(changed) == 0:
+            return False
+        self._apply(changed, occupied, vehicles)
+        return True
+
+    def show_message(self, message, color='white'):
+        """Replace the map with a message"""
+        self.space_ids = None
+        self.items = None
+        self.vehicle_texts = {}
+        self.canvas.delete("all")
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.canvas.create_text(max(self.canvas.winfo_width(), 2) / 2, max(self.canvas.winfo_height(), 2) / 2,
+                                text=message, fill=color, font=("TkDefaultFont", 12))
+        self.status.config(text="")
+
+    def fit(self):
+        """Zoom and pan so the whole lot fills the canvas"""
+        if self.items is None:
+            return
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            # Not mapped yet; fit on the first <Configure>
+            self._needs_fit = True
+            return
+        self._needs_fit = False
+
+        x1, y1, x2, y2 = self.canvas.bbox("space")
+        factor = min((width - 2 * self.FIT_PADDING) / max(x2 - x1, 1),
+                     (height - 2 * self.FIT_PADDING) / max(y2 - y1, 1))
+        self.canvas.scale("all", 0, 0, factor, factor)
+        self.zoom *= factor
+
+        x1, y1, _, _ = self.canvas.bbox("space")
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.canvas.move("all", self.canvas.canvasx(self.FIT_PADDING) - x1,
+                         self.canvas.canvasy(self.FIT_PADDING) - y1)
+        self._update_label_visibility()
+
+    @staticmethod
+    def _geometry(parking_data):
+        """(N, 4) x, y, w, h per space from 'position', or a grid if any position is missing"""
+        positions = [data.get('position') for data in parking_data.values()]
+        if all(position is not None and len(position) == 4 for position in positions):
+            return np.array(positions, dtype=float)
+
+        total = len(positions)
+        cols = max(4, int(np.ceil(np.sqrt(total))))
+        index = np.arange(total)
+        return np.column_stack([(index % cols) * 100, (index // cols) * 60,
+                                np.full(total, 95), np.full(total, 55)]).astype(float)
+
+    def _build(self, space_ids, geometry, occupied, vehicles):
+        """Create one rectangle and id label per space for a new layout"""
+        self.canvas.delete("all")
+        self.vehicle_texts = {}
+        self.zoom = 1.0
+        self.labels_visible = True
+        self.space_height = float(np.median(geometry[:, 3]))
+
+        create_rectangle = self.canvas.create_rectangle
+        create_text = self.canvas.create_text
+        items = []
+        for space_id, (x, y, w, h), is_occupied in zip(space_ids, geometry, occupied):
+            items.append(create_rectangle(x, y, x + w, y + h, outline=self.OUTLINE,
+                                          fill=self.OCCUPIED_FILL if is_occupied else self.FREE_FILL,
+                                          tags=("space", f"space:{space_id}")))
+            create_text(x + 3, y + 2, text=space_id, anchor="nw", fill="white",
+                        font=("TkDefaultFont", 8), tags=("label", "space_label"))
+        self.items = np.array(items)
+
+        self.space_ids = space_ids
+        self.occupied = occupied
+        self.vehicles = np.full(len(space_ids), None, dtype=object)
+        self._apply(np.flatnonzero(occupied & vehicles.astype(bool)), occupied, vehicles)
+        self.fit()
+
+    def _apply(self, changed, occupied, vehicles):
+        """Recolour and relabel only the spaces that changed"""
+        itemconfigure = self.canvas.itemconfigure
+        label_state = "normal" if self.labels_visible else "hidden"
+
+        for i in changed:
+            if occupied[i] != self.occupied[i]:
+                itemconfigure(self.items[i], fill=self.OCCUPIED_FILL if occupied[i] else self.FREE_FILL)
+
+            label = f"V: {vehicles[i]}" if occupied[i] and vehicles[i] else ""
+            text = self.vehicle_texts.get(i)
+            if text is None:
+                if not label:
+                    continue
+                # Place from the rectangle's current coordinates, which include zoom and pan
+                x1, _, _, y2 = self.canvas.coords(self.items[i])
+                text = self.canvas.create_text(x1 + 3, y2 - 2, anchor="sw", fill="white",
+                                               font=("TkDefaultFont", 8), tags=("label", "vehicle_label"),
+                                               state=label_state)
+                self.vehicle_texts[i] = text
+            itemconfigure(text, text=label)
+
+        self.occupied = occupied
+        self.vehicles = vehicles
+        self._update_status()
+
+    def _update_status(self):
+        free_count = int(len(self.occupied) - self.occupied.sum())
+        self.status.config(text=f"Parking Status: {free_count}/{len(self.occupied)} Available    "
+                                f"Zoom: {self.zoom:.2f}x  (wheel to zoom, drag to pan, double-click to fit)    "
+                                f"Last Updated: {datetime.now().strftime('%H:%M:%S')}")
+
+    def _update_label_visibility(self):
+        visible = self.space_height * self.zoom >= self.MIN_LABEL_HEIGHT
+        if visible != self.labels_visible:
+            self.labels_visible = visible
+            self.canvas.itemconfigure("label", state="normal" if visible else "hidden")
+        if self.occupied is not None:
+            self._update_status()
+
+    def _zoom_at(self, x, y, factor):
+        if self.items is None:
+            return
+        self.canvas.scale("all", self.canvas.canvasx(x), self.canvas.canvasy(y), factor, factor)
+        self.zoom *= factor
+        self._update_label_visibility()
+
+    def _on_wheel(self, event):
+        self._zoom_at(event.x, event.y, self.ZOOM_STEP if event.delta > 0 else 1 / self.ZOOM_STEP)
+
+    def _on_configure(self, event):
+        if self._needs_fit:
+            self.fit()
@@ -1,15 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import threading
 import queue
 import time
 import random
 from datetime import datetime
+from ui.lot_view import CanvasLotView, MatplotlibLotView
+
+LOT_VIEWS = {
+    "grid": MatplotlibLotView,  # Synthetic grid in a matplotlib figure
+    "map": CanvasLotView,  # Real lot geometry on a Tk canvas; suits large lots
+}
 
 
 class ParkingAllocationTab:
@@ -24,6 +27,7 @@ class ParkingAllocationTab:
         # Set up UI state variables
         self.show_visualization = tk.BooleanVar(value=True)
         self.highlight_free_spaces = tk.BooleanVar(value=True)
+        self.lot_view_kind = tk.StringVar(value="grid")
         self.auto_allocation_enabled = tk.BooleanVar(value=False)
         self.preferred_section = tk.StringVar(value="Any")
         self.load_balancing_weight = tk.DoubleVar(value=0.3)
@@ -63,11 +67,9 @@ class ParkingAllocationTab:
         self.canvas_frame.grid_columnconfigure(0, weight=1)
         self.canvas_frame.grid_rowconfigure(0, weight=1)
 
-        # Initial visualization
-        self.fig = plt.Figure(figsize=(10, 6))
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, self.canvas_frame)
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        # Lot views (and matplotlib) are created the first time they are shown
+        self.lot_views = {}
+        self.lot_view = None
 
         # Right side - Control panel
         self.control_frame = ttk.Frame(self.parent)
@@ -99,6 +101,15 @@ class ParkingAllocationTab:
                                           command=self.update_visualization)
         highlight_check.pack(anchor="w", padx=5, pady=3)
 
+        # Lot view style
+        view_frame = ttk.Frame(viz_frame)
+        view_frame.pack(fill="x", padx=5, pady=3)
+        ttk.Label(view_frame, text="View:").pack(side="left")
+        ttk.Radiobutton(view_frame, text="Grid", value="grid", variable=self.lot_view_kind,
+                        command=self.on_lot_view_change).pack(side="left", padx=5)
+        ttk.Radiobutton(view_frame, text="Lot map", value="map", variable=self.lot_view_kind,
+                        command=self.on_lot_view_change).pack(side="left", padx=5)
+
         # Update button
         update_btn = ttk.Button(viz_frame, text="Refresh Visualization",
                                 command=self.update_visualization)
@@ -179,109 +190,48 @@ class ParkingAllocationTab:
         """Add a separator line to the control panel"""
         ttk.Separator(self.control_frame, orient="horizontal").pack(fill="x", padx=5, pady=10)
 
+    def _ensure_figure(self):
+        """Create the selected lot view on first use; importing matplotlib is slow"""
+        kind = self.lot_view_kind.get()
+        if self.lot_view is not None and self.lot_view is self.lot_views.get(kind):
+            return
+
+        if self.lot_view is not None:
+            self.lot_view.grid_remove()
+        if kind not in self.lot_views:
+            self.lot_views[kind] = LOT_VIEWS[kind](self.canvas_frame)
+        self.lot_view = self.lot_views[kind]
+        self.lot_view.grid(row=0, column=0, sticky="nsew")
+
+    def on_lot_view_change(self):
+        """Switch between the grid and the lot map"""
+        self._ensure_figure()
+        self.update_visualization()
+
     def update_visualization(self):
-        """Update the parking visualization"""
+        """Update the parking visualization; only spaces that changed are redrawn"""
+        # Nothing to draw into until the tab has been opened
+        if self.lot_view is None and not self.parent.winfo_viewable():
+            return
+
         if self.show_visualization.get():
+            self._ensure_figure()
             try:
-                # Clear the figure
-                self.ax.clear()
-
                 # Get FRESH parking data directly from the parking manager
                 parking_data = {}
                 if hasattr(self.app, 'parking_manager'):
                     if hasattr(self.app.parking_manager, 'parking_data'):
-                        parking_data = self.app.parking_manager.parking_data.copy()
-
-                # Important debug output
-                print(f"Visualizing {len(parking_data)} parking spaces")
-
-                # If no data is available, show a message
-                if not parking_data:
-                    self.ax.text(0.5, 0.5, "No parking data available",
-                                 ha='center', va='center', fontsize=14)
-                    self.canvas.draw()
-                    return
-
-                # Ensure allocated vehicles are reflected in the visualization
-                for vehicle_id, space_id in self.allocated_vehicles.items():
-                    if space_id in parking_data:
-                        parking_data[space_id]['occupied'] = True
-                        parking_data[space_id]['vehicle_id'] = vehicle_id
-
-                # Calculate statistics
-                free_count = sum(1 for data in parking_data.values() if not data.get('occupied', True))
-                total = len(parking_data)
-                occupied_count = total - free_count
-
-                # Calculate grid dimensions
-                if total > 0:
-                    cols = max(4, int(np.ceil(np.sqrt(total))))
-                    rows = int(np.ceil(total / cols))
-                else:
-                    cols, rows = 4, 4
-
-                # Set plot limits
-                space_w, space_h = 100, 60
-                margin = 20
-                self.ax.set_xlim(0, cols * space_w + 2 * margin)
-                self.ax.set_ylim(0, rows * space_h + 2 * margin)
-
-                # Draw parking spaces
-                for i, (space_id, data) in enumerate(parking_data.items()):
-                    row = i // cols
-                    col = i % cols
-
-                    x = col * space_w + margin
-                    y = (rows - row - 1) * space_h + margin  # Invert y for better visualization
-
-                    # Choose color based on occupancy
-                    color = 'red' if data.get('occupied', True) else 'green'
-                    edgecolor = 'black'
-
-                    # Create rectangle
-                    rect = plt.Rectangle((x, y), space_w - 5, space_h - 5,
-                                         linewidth=2, edgecolor=edgecolor,
-                                         facecolor=color, alpha=0.6)
-                    self.ax.add_patch(rect)
-
-                    # Add space ID
-                    self.ax.text(x + 5, y + space_h - 15, space_id,
-                                 fontsize=8, weight='bold', color='white')
-
-                    # Add vehicle ID if occupied
-                    if data.get('occupied', True) and data.get('vehicle_id'):
-                        self.ax.text(x + 5, y + 10, f"V: {data['vehicle_id']}",
-                                     fontsize=8, color='white')
-
-                # Add title and legend
-                self.ax.set_title(f"Parking Status: {free_count}/{total} Available")
-                green_patch = plt.Rectangle((0, 0), 1, 1, facecolor='green', alpha=0.6)
-                red_patch = plt.Rectangle((0, 0), 1, 1, facecolor='red', alpha=0.6)
-                self.ax.legend([green_patch, red_patch], ['Free', 'Occupied'])
-
-                # Remove axis ticks for cleaner look
-                self.ax.set_xticks([])
-                self.ax.set_yticks([])
-
-                # Add timestamp with random component to ensure redraw
-                current_time = datetime.now().strftime('%H:%M:%S.%f')
-                self.ax.text(margin, margin / 2,
-                             f"Last Updated: {current_time}",
-                             fontsize=8)
-
-                # Force a complete redraw of the canvas
-                self.fig.canvas.draw()
-                self.fig.canvas.flush_events()
+                        parking_data = self.app.parking_manager.parking_data
+
+                # Allocated vehicles are overlaid on the manager's data
+                self.lot_view.show(parking_data, self.allocated_vehicles)
 
             except Exception as e:
                 print(f"Error updating visualization: {str(e)}")
                 import traceback
                 traceback.print_exc()
                 # Add error message to visualization
-                self.ax.clear()
-                self.ax.text(0.5, 0.5, f"Visualization Error: {str(e)}",
-                             ha='center', va='center', fontsize=10, color='red')
-                self.canvas.draw()
+                self.lot_view.show_message(f"Visualization Error: {str(e)}", color='red')
 
     def update_statistics(self):
         """Update the statistics display"""
@@ -569,6 +519,7 @@ class ParkingAllocationTab:
     def on_tab_selected(self):
         """Called when this tab is selected"""
         print("Parking allocation tab selected")
+        self._ensure_figure()
         self.ensure_parking_data()
         self.update_visualization()
         self.update_statistics()
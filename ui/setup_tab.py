@@ -6,7 +6,8 @@ from tkinter import ttk, NSEW, W, E
 from tkinter import Frame,StringVar, Canvas, messagebox
 from tkinter import LEFT
 from utils.media_paths import get_reference_image_path
-from utils.resource_manager import save_parking_positions
+from utils.resource_manager import save_parking_positions, load_parking_layout, layout_file_path, \
+    legacy_positions_path
 from ui.parking_allocation_tab import ParkingAllocationTab
 
 # Import statements...
@@ -415,10 +416,21 @@ class SetupTab:
                 save_positions = self.app.posList
                 self.app.original_posList = self.app.posList.copy()
 
+            # Keep calibrated thresholds only while they still match the spaces
+            thresholds = self.app.space_thresholds
+            if thresholds is not None and len(thresholds) != len(save_positions):
+                self.app.log_event("Parking spaces changed, discarding calibrated thresholds")
+                thresholds = None
+                self.app.space_thresholds = None
+
             # Save using the utility function
-            success = save_parking_positions(save_positions, self.app.config_dir, self.app.current_reference_image)
+            success = save_parking_positions(save_positions, self.app.config_dir, self.app.current_reference_image,
+                                             self.app.reference_dimensions.get(self.app.current_reference_image),
+                                             thresholds)
 
             if success:
+                self.app.layout = load_parking_layout(self.app.config_dir, self.app.current_reference_image)
+
                 self.app.log_event(
                     f"Saved {len(self.app.posList)} parking spaces for {self.app.current_reference_image}")
                 messagebox.showinfo("Success",
@@ -440,16 +452,17 @@ class SetupTab:
             # Clear positions for current reference
             self.app.posList = []
 
-            # Delete stored file if it exists
-            import os
-            pos_file = os.path.join(self.app.config_dir,
-                                    f'CarParkPos_{os.path.splitext(self.app.current_reference_image)[0]}')
-            if os.path.exists(pos_file):
-                try:
-                    os.remove(pos_file)
-                    self.app.log_event(f"Deleted calibration file for {self.app.current_reference_image}")
-                except Exception as e:
-                    self.app.log_event(f"Error deleting calibration file: {str(e)}")
+            # Delete stored files if they exist (layout and any legacy pickle it was imported from)
+            for pos_file in (layout_file_path(self.app.config_dir, self.app.current_reference_image),
+                             legacy_positions_path(self.app.config_dir, self.app.current_reference_image)):
+                if os.path.exists(pos_file):
+                    try:
+                        os.remove(pos_file)
+                        self.app.log_event(f"Deleted calibration file {pos_file}")
+                    except Exception as e:
+                        self.app.log_event(f"Error deleting calibration file: {str(e)}")
+            self.app.layout = None
+            self.app.space_thresholds = None
 
             # Clear canvas
             self.draw_parking_spaces()
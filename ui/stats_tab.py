@@ -1,7 +1,9 @@
+import os
 from datetime import datetime
-from tkinter import Frame, Label, Button, ttk, messagebox
+from tkinter import Frame, Label, Button, StringVar, ttk, messagebox
 from tkinter import LEFT, RIGHT, BOTH, X, Y
 from utils.resource_manager import export_statistics
+from utils.occupancy_store import RESOLUTIONS
 
 
 class StatsTab:
@@ -21,6 +23,17 @@ class StatsTab:
         # Title
         Label(self.stats_frame, text="Parking Statistics", font=("Arial", 16, "bold")).pack(pady=10)
 
+        # Rollup resolution selector
+        resolution_frame = Frame(self.stats_frame)
+        resolution_frame.pack(fill=X)
+
+        Label(resolution_frame, text="Resolution:").pack(side=LEFT)
+        self.resolution_var = StringVar(value="1h")
+        resolution_combo = ttk.Combobox(resolution_frame, textvariable=self.resolution_var,
+                                        values=list(RESOLUTIONS), state="readonly", width=6)
+        resolution_combo.pack(side=LEFT, padx=5)
+        resolution_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_statistics())
+
         # Statistics data
         self.stats_data_frame = Frame(self.stats_frame)
         self.stats_data_frame.pack(fill=BOTH, expand=True, pady=10)
@@ -33,8 +46,8 @@ class StatsTab:
         self.stats_tree.heading("#0", text="")
         self.stats_tree.heading("timestamp", text="Timestamp")
         self.stats_tree.heading("total", text="Total Spaces")
-        self.stats_tree.heading("free", text="Free Spaces")
-        self.stats_tree.heading("occupied", text="Occupied Spaces")
+        self.stats_tree.heading("free", text="Free Spaces (avg)")
+        self.stats_tree.heading("occupied", text="Occupied Spaces (avg)")
         self.stats_tree.heading("vehicles", text="Vehicles Counted")
 
         # Define column widths
@@ -61,47 +74,66 @@ class StatsTab:
                                                                                                         padx=5)
         Button(self.stats_control_frame, text="Record Current Stats", command=self.record_current_stats).pack(
             side=RIGHT, padx=5)
+        Button(self.stats_control_frame, text="Refresh", command=self.refresh_statistics).pack(side=RIGHT, padx=5)
+
+        self.refresh_statistics()
+
+    def _rollup_rows(self):
+        """Whole-lot rollups at the selected resolution, newest first"""
+        rows = []
+        for rollup in self.app.occupancy_store.query(self.resolution_var.get()):
+            timestamp = datetime.fromtimestamp(rollup['bucket']).strftime("%Y-%m-%d %H:%M:%S")
+            rows.append((
+                f"{timestamp} ({rollup['lot']})",
+                rollup['total'],
+                f"{rollup['free_avg']:.1f}",
+                f"{rollup['occupied_avg']:.1f}",
+                rollup['vehicles']
+            ))
+        return rows
+
+    def refresh_statistics(self):
+        """Reload the view from the precomputed rollups"""
+        try:
+            rows = self._rollup_rows()
+        except Exception as e:
+            self.app.log_event(f"Error reading statistics: {str(e)}")
+            return
+
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for row in rows:
+            self.stats_tree.insert("", "end", values=row)
 
     def record_current_stats(self, total_spaces=None, free_spaces=None, occupied_spaces=None, vehicle_counter=None):
-        """Record current statistics to the stats view"""
+        """Store a sample of the current statistics and show the updated rollups"""
         # Use provided values or get from app
         if total_spaces is None:
             total_spaces = self.app.total_spaces
-        if free_spaces is None:
-            free_spaces = self.app.free_spaces
         if occupied_spaces is None:
             occupied_spaces = self.app.occupied_spaces
         if vehicle_counter is None:
             vehicle_counter = self.app.vehicle_counter
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Insert at the beginning of the treeview
-        self.stats_tree.insert("", 0, values=(
-            timestamp,
-            total_spaces,
-            free_spaces,
-            occupied_spaces,
-            vehicle_counter
-        ))
+        lot = os.path.splitext(self.app.current_reference_image)[0]
+        self.app.occupancy_store.record(lot, {"All": (total_spaces, occupied_spaces)}, vehicle_counter)
+        self.app.occupancy_store.flush()
+        self.refresh_statistics()
 
         self.app.log_event("Recorded current statistics")
 
     def clear_statistics(self):
-        """Clear the statistics view"""
+        """Clear the stored statistics"""
         if messagebox.askokcancel("Confirm", "Are you sure you want to clear all statistics?"):
-            for item in self.stats_tree.get_children():
-                self.stats_tree.delete(item)
+            self.app.occupancy_store.clear()
+            self.refresh_statistics()
             self.app.log_event("Statistics cleared")
 
     def export_statistics(self):
         """Export statistics to a CSV file"""
         try:
-            # Collect data from treeview
-            stats_data = []
-            for item in self.stats_tree.get_children():
-                values = self.stats_tree.item(item)["values"]
-                stats_data.append(values)
+            # Read the rollups straight from the store, not from the widget
+            self.app.occupancy_store.flush()
+            stats_data = self._rollup_rows()
 
             if not stats_data:
                 messagebox.showinfo("Info", "No statistics data to export.")
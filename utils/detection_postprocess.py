@@ -0,0 +1,175 @@
+"""
+Vectorized post-processing of detector outputs
+
+Every detection backend produces whole arrays of boxes, scores and class
+ids. postprocess() filters, maps, suppresses and rescales them in NumPy
+and returns a structured array with one record per detection:
+
+    box       int32[4]  x1, y1, x2, y2 in image pixels
+    score     float32
+    class_id  int16     index into COCO_CLASSES
+
+Records unpack like the old [box, score, class_id] lists, and
+to_list() converts back where a plain list is required.
+"""
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ('box', np.int32, (4,)),
+    ('score', np.float32),
+    ('class_id', np.int16),
+])
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def class_lookup(class_map):
+    """Lookup table mapping model class ids to canonical ones (-1 = not mapped)"""
+    if not class_map:
+        return None
+    table = np.full(max(class_map) + 1, -1, dtype=np.int64)
+    table[list(class_map.keys())] = list(class_map.values())
+    return table
+
+
+def map_classes(class_ids, class_map):
+    """Translate model class ids through class_map; ids without an entry become -1"""
+    class_ids = np.asarray(class_ids).astype(np.int64)
+    table = class_lookup(class_map) if isinstance(class_map, dict) else class_map
+    if table is None:
+        return class_ids
+    mapped = np.full(class_ids.shape, -1, dtype=np.int64)
+    valid = (class_ids >= 0) & (class_ids < len(table))
+    mapped[valid] = table[class_ids[valid]]
+    return mapped
+
+
+def box_iou(box, boxes):
+    """IoU of one x1, y1, x2, y2 box against an (N, 4) array"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def nms(boxes, scores, iou_threshold=0.45, class_ids=None):
+    """
+    Greedy non-maximum suppression
+
+    Args:
+        boxes: (N, 4) x1, y1, x2, y2
+        scores: (N,) confidences
+        iou_threshold: Boxes overlapping a kept box by more than this are dropped
+        class_ids: If given, boxes only suppress boxes of the same class
+
+    Returns:
+        Indices of the kept boxes, highest score first
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if class_ids is not None:
+        # Shift each class into its own region so classes never overlap; boxes may
+        # start left of or above the image, so the shift covers the whole coordinate range
+        offset = boxes.max() - min(boxes.min(), 0) + 1
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float64) * offset)[:, None]
+
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    keep = []
+    while len(order):
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        order = rest[box_iou(boxes[best], boxes[rest]) <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(boxes, scores, class_ids, confidence_threshold=0.5, class_map=None, keep_classes=None,
+                nms_threshold=None, scale=(1.0, 1.0), max_detections=None):
+    """
+    Turn raw model output into a structured detection array
+
+    Args:
+        boxes: (N, 4) x1, y1, x2, y2 in model output pixels
+        scores: (N,) confidences
+        class_ids: (N,) model class ids
+        confidence_threshold: Minimum score to keep
+        class_map: {model class id: canonical class id}, or None if ids are already canonical
+        keep_classes: Canonical class ids to keep, or None for all mapped classes
+        nms_threshold: IoU threshold for per-class NMS, or None to skip it
+        scale: (x, y) factors from model output pixels to image pixels
+        max_detections: Keep at most this many, highest scores first
+
+    Returns:
+        Structured array of DETECTION_DTYPE sorted by descending score
+    """
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(scores) == 0:
+        return empty_detections()
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    classes = map_classes(np.asarray(class_ids).reshape(-1), class_map)
+
+    keep = (scores >= confidence_threshold) & (classes >= 0)
+    if keep_classes is not None:
+        keep &= np.isin(classes, keep_classes)
+    boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+    if nms_threshold is not None:
+        order = nms(boxes, scores, nms_threshold, classes)
+    else:
+        order = np.argsort(-scores, kind="stable")
+    if max_detections is not None:
+        order = order[:max_detections]
+
+    detections = np.empty(len(order), dtype=DETECTION_DTYPE)
+    detections['box'] = boxes[order] * np.array([scale[0], scale[1], scale[0], scale[1]])
+    detections['score'] = scores[order]
+    detections['class_id'] = classes[order]
+    return detections
+
+
+def rescale(detections, x_scale, y_scale):
+    """Copy of detections with boxes scaled to another image size"""
+    detections = as_detections(detections).copy()
+    if len(detections):
+        detections['box'] = detections['box'] * np.array([x_scale, y_scale, x_scale, y_scale])
+    return detections
+
+
+def as_detections(detections):
+    """
+    Structured detection array from either a structured array or legacy lists
+
+    Raises:
+        TypeError: If detections is neither
+    """
+    if detections is None:
+        return empty_detections()
+    if isinstance(detections, np.ndarray) and detections.dtype == DETECTION_DTYPE:
+        return detections
+    if isinstance(detections, (list, tuple)):
+        result = np.empty(len(detections), dtype=DETECTION_DTYPE)
+        for i, (box, score, class_id) in enumerate(detection[:3] for detection in detections):
+            result[i] = (box[:4], score, class_id)
+        return result
+    raise TypeError(f"Expected detections but got {type(detections)}")
+
+
+def centroids(detections):
+    """(N, 2) integer box centers"""
+    boxes = as_detections(detections)['box']
+    return (boxes[:, :2] + boxes[:, 2:]) // 2
+
+
+def to_list(detections):
+    """Detections as [[x1, y1, x2, y2], score, class_id] lists"""
+    return [[box.tolist(), float(score), int(class_id)]
+            for box, score, class_id in zip(detections['box'], detections['score'], detections['class_id'])]
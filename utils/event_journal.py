@@ -0,0 +1,276 @@
+"""
+Append-only binary journal of parking space state transitions
+
+Records are fixed-width (19 bytes) and are written to numbered segment
+files that rotate at a size limit. Appends only copy into a preallocated
+buffer; a background thread writes the buffer out and fsyncs in batches,
+so recording a transition costs a few microseconds on the frame loop.
+"""
+
+import atexit
+import glob
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),   # Unix time, seconds
+    ('lot', '<u2'),         # Lot id, see lots.json in the journal directory
+    ('space', '<u4'),       # Space index within the lot's layout
+    ('state', 'u1'),        # STATE_FREE / STATE_OCCUPIED
+    ('confidence', '<f4'),  # 0-1
+])
+
+STATE_FREE = 0
+STATE_OCCUPIED = 1
+
+SEGMENT_MAGIC = b"PKJRNL"
+SEGMENT_VERSION = 1
+_SEGMENT_HEADER = struct.Struct("<6sHI")  # magic, version, record size
+SEGMENT_PATTERN = "segment_{:08d}.jrn"
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_BUFFER_RECORDS = 65536
+DEFAULT_MAX_SEGMENTS = 16  # About 1 GiB, ~56 million transitions, at the default segment size
+
+
+class OccupancyJournal:
+    """Durable, bounded-memory record of every occupancy transition"""
+
+    def __init__(self, journal_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, buffer_records=DEFAULT_BUFFER_RECORDS,
+                 flush_interval=1.0, fsync_interval=5.0, max_segments=None):
+        """
+        Args:
+            journal_dir: Directory holding the segment files
+            segment_bytes: Size after which a new segment is started
+            buffer_records: Records kept in memory between flushes
+            flush_interval: Seconds between background writes
+            fsync_interval: Seconds between fsyncs of the current segment
+            max_segments: Segments kept on disk, including the one being written (None keeps all)
+        """
+        self.journal_dir = journal_dir
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_segments = max_segments
+        os.makedirs(journal_dir, exist_ok=True)
+
+        # Lot names are mapped to small ids so records stay fixed-width
+        self._lots_file = os.path.join(journal_dir, "lots.json")
+        self.lots = {}
+        if os.path.exists(self._lots_file):
+            with open(self._lots_file, 'r') as f:
+                self.lots = json.load(f)
+
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self._buffered = 0
+        self._buffer_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+        self._segment_file = None
+        self._segment_index = self._last_segment_index()
+        self._last_fsync = time.time()
+        self.records_written = 0
+
+        self._closed = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def lot_id(self, lot_name):
+        """Id of a lot, registering it on first use"""
+        if lot_name not in self.lots:
+            self.lots[lot_name] = len(self.lots)
+            tmp_file = f"{self._lots_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.lots, f)
+            os.replace(tmp_file, self._lots_file)
+        return self.lots[lot_name]
+
+    def append(self, lot, space, state, confidence=1.0, timestamp=None):
+        """Record a single transition"""
+        self.append_many(lot, [space], [state], [confidence], timestamp)
+
+    def append_many(self, lot, spaces, states, confidences, timestamp=None):
+        """
+        Record transitions of several spaces that happened at the same time
+
+        Args:
+            lot: Lot id from lot_id()
+            spaces: Space indices
+            states: STATE_FREE / STATE_OCCUPIED (or bools) per space
+            confidences: Confidence per space
+            timestamp: Unix time, defaults to now
+        """
+        count = len(spaces)
+        if count == 0:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._buffer_lock:
+            if self._buffered + count > len(self._buffer):
+                # Writer fell behind; write synchronously instead of growing the buffer
+                self._write_buffer_locked()
+
+            if count > len(self._buffer):
+                records = np.zeros(count, dtype=RECORD_DTYPE)
+                self._fill(records, timestamp, lot, spaces, states, confidences)
+                self._write_records(records)
+                return
+
+            records = self._buffer[self._buffered:self._buffered + count]
+            self._fill(records, timestamp, lot, spaces, states, confidences)
+            self._buffered += count
+
+    @staticmethod
+    def _fill(records, timestamp, lot, spaces, states, confidences):
+        records['timestamp'] = timestamp
+        records['lot'] = lot
+        records['space'] = spaces
+        records['state'] = states
+        records['confidence'] = confidences
+
+    def flush(self, fsync=False):
+        """Write buffered records to the current segment"""
+        with self._buffer_lock:
+            self._write_buffer_locked()
+        if fsync:
+            self._fsync()
+
+    def _write_buffer_locked(self):
+        if self._buffered == 0:
+            return
+        self._write_records(self._buffer[:self._buffered])
+        self._buffered = 0
+
+    def _write_records(self, records):
+        with self._file_lock:
+            segment = self._current_segment()
+            segment.write(records.tobytes())
+            self.records_written += len(records)
+
+            if segment.tell() >= self.segment_bytes:
+                self._close_segment()
+                self._segment_index += 1
+
+    def _fsync(self):
+        with self._file_lock:
+            if self._segment_file is not None:
+                self._segment_file.flush()
+                os.fsync(self._segment_file.fileno())
+            self._last_fsync = time.time()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush(fsync=time.time() - self._last_fsync >= self.fsync_interval)
+            except Exception as e:
+                print(f"Error flushing occupancy journal: {str(e)}")
+
+    def _current_segment(self):
+        if self._segment_file is None:
+            path = os.path.join(self.journal_dir, SEGMENT_PATTERN.format(self._segment_index))
+            is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._segment_file = open(path, 'ab')
+            if is_new:
+                self._segment_file.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, RECORD_DTYPE.itemsize))
+            # Runs once the new segment exists, so it counts towards max_segments
+            self._enforce_retention()
+        return self._segment_file
+
+    def _close_segment(self):
+        if self._segment_file is not None:
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+            self._segment_file.close()
+            self._segment_file = None
+
+    def _last_segment_index(self):
+        segments = list_segments(self.journal_dir)
+        if not segments:
+            return 0
+        # Continue in a fresh segment so a torn tail from a crash is never appended to
+        return _segment_number(segments[-1]) + 1
+
+    def _enforce_retention(self):
+        if not self.max_segments:
+            return
+        segments = list_segments(self.journal_dir)
+        # The segment being written has the highest number, so it is never removed
+        for path in segments[:max(0, len(segments) - max(1, self.max_segments))]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing journal segment {path}: {str(e)}")
+
+    def close(self):
+        """Flush, fsync and close the journal"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+        with self._file_lock:
+            self._close_segment()
+
+
+def list_segments(journal_dir):
+    """Segment files in write order"""
+    return sorted(glob.glob(os.path.join(journal_dir, SEGMENT_PATTERN.replace("{:08d}", "*"))))
+
+
+def _segment_number(path):
+    return int(os.path.basename(path).split("_")[1].split(".")[0])
+
+
+def read_segment(path):
+    """Memory-map the complete records of one segment"""
+    header_size = _SEGMENT_HEADER.size
+    file_size = os.path.getsize(path)
+    if file_size <= header_size:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    with open(path, 'rb') as f:
+        magic, version, record_size = _SEGMENT_HEADER.unpack(f.read(header_size))
+    if magic != SEGMENT_MAGIC or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {SEGMENT_VERSION} occupancy journal segment")
+
+    # Ignore a partially written last record
+    count = (file_size - header_size) // record_size
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=header_size, shape=(count,))
+
+
+def read_journal(journal_dir, start=None, end=None, lot=None):
+    """
+    Read transitions from all segments
+
+    Args:
+        journal_dir: Journal directory
+        start: Optional Unix time lower bound (inclusive)
+        end: Optional Unix time upper bound (exclusive)
+        lot: Optional lot id
+
+    Returns:
+        Structured array of RECORD_DTYPE in write order
+    """
+    parts = []
+    for path in list_segments(journal_dir):
+        records = read_segment(path)
+        if len(records) == 0:
+            continue
+        mask = np.ones(len(records), dtype=bool)
+        if start is not None:
+            mask &= records['timestamp'] >= start
+        if end is not None:
+            mask &= records['timestamp'] < end
+        if lot is not None:
+            mask &= records['lot'] == lot
+        parts.append(np.array(records[mask]))
+
+    if not parts:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.concatenate(parts)
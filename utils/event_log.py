@@ -0,0 +1,228 @@
+"""
+Bounded application event log
+
+Keeps the most recent entries in a ring buffer, coalesces consecutive
+repeats, rate-limits DEBUG and INFO messages that are logged every frame
+and writes everything that is kept to a file from a background thread.
+Warnings and errors are never rate-limited.
+
+The file gets each entry once, when it is logged; a run of repeats is
+written as a "(repeated N times)" line when a different message arrives,
+and counts of suppressed messages that were never reported are written
+on clear() and close(), so the file does not undercount either.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+}
+
+DEFAULT_CAPACITY = 5000
+DEFAULT_RATE_LIMIT_INTERVAL = 5.0
+# Highest level that is rate-limited; anything more severe is always kept
+DEFAULT_RATE_LIMIT_LEVEL = "INFO"
+
+# Numbers are masked when grouping messages, so "Updated 12 spaces" and
+# "Updated 13 spaces" are rate-limited together
+_NUMBER_PATTERN = re.compile(r"\d+(\.\d+)?")
+
+
+class LogEntry:
+    """A single log line, possibly standing for several repeated messages"""
+
+    __slots__ = ("timestamp", "level", "message", "repeat")
+
+    def __init__(self, timestamp, level, message):
+        self.timestamp = timestamp
+        self.level = level
+        self.message = message
+        self.repeat = 1
+
+    def format(self):
+        timestamp = datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        text = f"[{timestamp}] {self.message}"
+        if self.level != "INFO":
+            text = f"[{timestamp}] {self.level}: {self.message}"
+        if self.repeat > 1:
+            text += f" (x{self.repeat})"
+        return text
+
+
+class EventLog:
+    """Ring-buffered, rate-limited event log with a background file writer"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, min_level="DEBUG",
+                 rate_limit_interval=DEFAULT_RATE_LIMIT_INTERVAL, rate_limit_level=DEFAULT_RATE_LIMIT_LEVEL):
+        """
+        Args:
+            capacity: Entries kept in memory
+            min_level: Entries below this level are dropped
+            rate_limit_interval: Seconds between two entries with the same message pattern
+            rate_limit_level: Highest level that is rate-limited
+        """
+        self.entries = deque(maxlen=capacity)
+        self.min_level = min_level
+        self.rate_limit_interval = rate_limit_interval
+        self.rate_limit_level = rate_limit_level
+        self.lock = threading.Lock()
+
+        # Bumped on every change so viewers can poll cheaply
+        self.version = 0
+        self.dropped = 0
+
+        self._last_emitted = {}
+        self._suppressed = {}  # key -> [count, last suppressed message]
+        self._written_repeat = 0  # Repeats of the last entry already written to the file
+
+        self._file_queue = None
+        self._writer_thread = None
+        self.log_file = None
+
+    def open_file(self, log_dir):
+        """Start writing entries to a file in log_dir from a background thread"""
+        if self._writer_thread is not None:
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_file = os.path.join(log_dir, f"parking_events_{timestamp}.log")
+        self._file_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def log(self, message, level="INFO"):
+        """
+        Add an entry
+
+        Returns:
+            The LogEntry the message was stored in, or None if it was filtered or rate-limited
+        """
+        if LEVELS.get(level, 20) < LEVELS[self.min_level]:
+            return None
+
+        now = time.time()
+        key = (level, _NUMBER_PATTERN.sub("#", message))
+
+        with self.lock:
+            # Consecutive identical messages only bump a counter
+            if self.entries:
+                last = self.entries[-1]
+                if last.level == level and last.message == message:
+                    last.repeat += 1
+                    self.version += 1
+                    return last
+
+            # Frequent messages with the same shape are emitted at most once per interval;
+            # warnings and errors about different cameras or frames must all be kept
+            if LEVELS.get(level, 20) <= LEVELS[self.rate_limit_level]:
+                if now - self._last_emitted.get(key, float('-inf')) < self.rate_limit_interval:
+                    suppressed = self._suppressed.setdefault(key, [0, None])
+                    suppressed[0] += 1
+                    suppressed[1] = message
+                    self.dropped += 1
+                    return None
+                self._last_emitted[key] = now
+
+                suppressed = self._suppressed.pop(key, None)
+                if suppressed:
+                    message = f"{message} ({suppressed[0]} similar suppressed)"
+
+            self._write_repeats()
+            entry = LogEntry(now, level, message)
+            self.entries.append(entry)
+            self._written_repeat = 1
+            self.version += 1
+            self._write(entry)
+        return entry
+
+    def _write(self, entry):
+        # Formatted under the lock, so later repeats cannot change what is written
+        if self._file_queue is not None:
+            self._file_queue.put(entry.format())
+
+    def _write_repeats(self):
+        """Write the repeats of the last entry that the file has not seen; caller holds the lock"""
+        if self.entries and self.entries[-1].repeat > self._written_repeat:
+            last = self.entries[-1]
+            repeated = last.repeat - self._written_repeat
+            self._write(LogEntry(time.time(), last.level, f"{last.message} (repeated {repeated} times)"))
+            self._written_repeat = last.repeat
+
+    def _write_pending(self):
+        """Write unreported repeats and suppressed counts; caller holds the lock"""
+        self._write_repeats()
+        now = time.time()
+        for (level, _), (count, message) in self._suppressed.items():
+            self._write(LogEntry(now, level, f"{message} ({count} similar suppressed)"))
+        self._suppressed.clear()
+
+    def count(self, min_level=None):
+        """Number of entries at or above min_level"""
+        with self.lock:
+            if min_level is None:
+                return len(self.entries)
+            threshold = LEVELS[min_level]
+            return sum(1 for entry in self.entries if LEVELS[entry.level] >= threshold)
+
+    def window(self, start, count, min_level=None):
+        """
+        Formatted entries [start, start + count) of the (optionally filtered) log
+
+        Used by the viewer to render only the visible lines.
+        """
+        with self.lock:
+            if min_level is None:
+                return [entry.format() for entry in islice(self.entries, start, start + count)]
+            threshold = LEVELS[min_level]
+            filtered = (entry for entry in self.entries if LEVELS[entry.level] >= threshold)
+            return [entry.format() for entry in islice(filtered, start, start + count)]
+
+    def formatted(self, min_level=None):
+        """All kept entries as text lines"""
+        return self.window(0, len(self.entries), min_level)
+
+    def clear(self):
+        with self.lock:
+            self._write_pending()
+            self.entries.clear()
+            self._written_repeat = 0
+            self.version += 1
+
+    def _writer_loop(self):
+        with open(self.log_file, 'a') as f:
+            while True:
+                line = self._file_queue.get()
+                if line is None:
+                    break
+                f.write(line + "\n")
+
+                # Write whatever else is waiting before flushing
+                while not self._file_queue.empty():
+                    line = self._file_queue.get_nowait()
+                    if line is None:
+                        return
+                    f.write(line + "\n")
+                f.flush()
+
+    @property
+    def queue_depth(self):
+        """Entries waiting for the file writer"""
+        return self._file_queue.qsize() if self._file_queue is not None else 0
+
+    def close(self):
+        """Stop the file writer after it has written everything queued and pending"""
+        if self._writer_thread is not None:
+            with self.lock:
+                self._write_pending()
+            self._file_queue.put(None)
+            self._writer_thread.join(timeout=2)
+            self._writer_thread = None
@@ -1,35 +1,92 @@
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
+from utils.occupancy import score_parking_spaces
+from utils.detection_postprocess import as_detections, centroids
 
 
-def preprocess_frame_for_parking_detection(img):
+class PreprocessParams:
+    """Settings of the parking preprocessing chain"""
+
+    def __init__(self, blur_size=3, blur_sigma=1, block_size=25, c=16, median_size=5, dilate_iterations=1,
+                 erode_iterations=1, kernel_size=3):
+        self.blur_size = blur_size  # Gaussian blur kernel (odd)
+        self.blur_sigma = blur_sigma
+        self.block_size = block_size  # Adaptive threshold neighbourhood (odd, > 1)
+        self.c = c  # Subtracted from the neighbourhood mean
+        self.median_size = median_size  # Median blur aperture (odd, 0 = off)
+        self.dilate_iterations = dilate_iterations
+        self.erode_iterations = erode_iterations
+        self.kernel_size = kernel_size  # Square dilate/erode kernel
+
+        # Validate up front; OpenCV's own errors do not name the parameter
+        for name in ("blur_size", "median_size"):
+            value = getattr(self, name)
+            if value and value % 2 == 0:
+                raise ValueError(f"{name} must be odd, got {value}")
+        if self.block_size < 3 or self.block_size % 2 == 0:
+            raise ValueError(f"block_size must be odd and at least 3, got {self.block_size}")
+
+        self._kernel = np.ones((kernel_size, kernel_size), np.uint8)
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+    def __eq__(self, other):
+        return isinstance(other, PreprocessParams) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"PreprocessParams({', '.join(f'{k}={v}' for k, v in self.as_dict().items())})"
+
+
+DEFAULT_PREPROCESS = PreprocessParams()
+
+
+def preprocess_frame_for_parking_detection(img, params=DEFAULT_PREPROCESS):
     """Preprocess a frame for parking space detection"""
     # Convert to grayscale
     imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     # Apply Gaussian blur
-    imgBlur = cv2.GaussianBlur(imgGray, (3, 3), 1)
+    if params.blur_size:
+        imgGray = cv2.GaussianBlur(imgGray, (params.blur_size, params.blur_size), params.blur_sigma)
     # Apply threshold
-    imgThreshold = cv2.adaptiveThreshold(imgBlur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                         cv2.THRESH_BINARY_INV, 25, 16)
+    imgThreshold = cv2.adaptiveThreshold(imgGray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                         cv2.THRESH_BINARY_INV, params.block_size, params.c)
     # Apply blur again to smooth edges
-    imgBlur = cv2.medianBlur(imgThreshold, 5)
-    # Dilate to fill in holes
-    kernel = np.ones((3, 3), np.uint8)
-    imgDilate = cv2.dilate(imgBlur, kernel, iterations=1)
-    return imgDilate
+    if params.median_size:
+        imgThreshold = cv2.medianBlur(imgThreshold, params.median_size)
+    # Dilate to fill in holes, then erode to clean up
+    if params.dilate_iterations:
+        imgThreshold = cv2.dilate(imgThreshold, params._kernel, iterations=params.dilate_iterations)
+    if params.erode_iterations:
+        imgThreshold = cv2.erode(imgThreshold, params._kernel, iterations=params.erode_iterations)
+    return imgThreshold
 
 
-def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False):
-    """Process and mark parking spaces in the image - optimized version"""
-    space_counter = 0
-    
+def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False, space_thresholds=None, scores=None):
+    """
+    Process and mark parking spaces in the image - optimized version
+
+    Args:
+        threshold: Global fill ratio (0-1) used for spaces without their own threshold
+        space_thresholds: Optional per-space fill ratio thresholds
+        scores: Optional (occupied, ratios, valid) already computed by score_parking_spaces
+    """
     # Create a copy of img only if needed for drawing
     if len(pos_list) > 0:
         img_display = img  # Use direct reference to avoid copy unless needed
     else:
         return img, 0, 0, 0  # Return early if no positions
-    
+
+    # Score every space at once against its own threshold
+    if scores is None:
+        scores = score_parking_spaces(img_pro, pos_list, threshold, space_thresholds)
+    occupied, ratios, valid = scores
+
     # Precompute font and colors to avoid recreation
     font = cv2.FONT_HERSHEY_SIMPLEX
     green_color = (0, 255, 0)
@@ -43,40 +100,32 @@ def process_parking_spaces(img_pro, img, pos_list, threshold, debug=False):
                     font, 0.5, yellow_color, 1)
 
     for i, (x, y, w, h) in enumerate(pos_list):
-        # Ensure coordinates are within image bounds and are integers
-        if (y >= 0 and y + h < img_pro.shape[0] and x >= 0 and x + w < img_pro.shape[1]):
-            # Convert coordinates to integers to avoid the error
-            x, y, w, h = int(x), int(y), int(w), int(h)
-
-            # Add box number and coordinates in debug mode
-            if debug:
-                coord_text = f"Box {i}: ({x},{y})"
-                cv2.putText(img_display, coord_text, (x, y - 5),
-                            font, 0.4, yellow_color, 1)
-
-            # Only extract the crop we need
-            img_crop = img_pro[y:y + h, x:x + w]
-            
-            # Optimize counting - use sum instead of countNonZero for better performance
-            count = np.sum(img_crop > 0)
-
-            if count < threshold:
-                color = green_color  # Green for free
-                space_counter += 1
-            else:
-                color = red_color  # Red for occupied
-
-            # Draw ID number for each space
-            cv2.putText(img_display, str(i), (x + 5, y + 15),
-                        font, 0.5, yellow_color, 2)
-                        
-            # Draw rectangle and count
-            cv2.rectangle(img_display, (x, y), (x + w, y + h), color, 2)
-            cv2.putText(img_display, str(count), (x, y + h - 3), font,
-                        0.5, color, 2)
-
-    free_spaces = space_counter
+        # Spaces outside the image are not drawn
+        if not valid[i]:
+            continue
+
+        # Convert coordinates to integers to avoid the error
+        x, y, w, h = int(x), int(y), int(w), int(h)
+
+        # Add box number and coordinates in debug mode
+        if debug:
+            coord_text = f"Box {i}: ({x},{y})"
+            cv2.putText(img_display, coord_text, (x, y - 5),
+                        font, 0.4, yellow_color, 1)
+
+        color = red_color if occupied[i] else green_color
+
+        # Draw ID number for each space
+        cv2.putText(img_display, str(i), (x + 5, y + 15),
+                    font, 0.5, yellow_color, 2)
+
+        # Draw rectangle and fill ratio
+        cv2.rectangle(img_display, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(img_display, f"{ratios[i]:.2f}", (x, y + h - 3), font,
+                    0.5, color, 2)
+
     total_spaces = len(pos_list)
+    free_spaces = int(np.count_nonzero(~occupied))
     occupied_spaces = total_spaces - free_spaces
 
     return img_display, free_spaces, occupied_spaces, total_spaces
@@ -171,33 +220,16 @@ def process_ml_detections(frame, detections, line_height, offset, matches, vehic
     # Make a deep copy of matches list
     matches_copy = matches.copy() if matches is not None else []
 
-    # Handle case where detections might be None
-    if detections is None:
-        detections = []
-
-    # Process only a limited number of detections for performance
+    # Process only a limited number of detections for performance (they are sorted by score)
     max_detections = 30
-    for i, detection in enumerate(detections[:max_detections]):
-        # Ensure detection has the expected format
-        if len(detection) < 3:  # We need at least box, score, label
-            continue
-
-        box, score, label = detection[:3]  # Unpack the first 3 elements
-
-        # Ensure box is valid
-        if len(box) < 4:
-            continue
-
-        x1, y1, x2, y2 = box
+    detections = as_detections(detections)[:max_detections]
+    centers = centroids(detections)
 
+    for (x1, y1, x2, y2), score, label, centroid in zip(detections['box'].tolist(), detections['score'],
+                                                         detections['class_id'], map(tuple, centers.tolist())):
         # Draw bounding box
         cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
-        # Calculate centroid
-        cx = (x1 + x2) // 2
-        cy = (y1 + y2) // 2
-        centroid = (cx, cy)
-
         # Only add label if score is high enough (optimization)
         if score > 0.6:
             class_name = class_names[label] if label < len(class_names) else f"Class {label}"
@@ -215,14 +247,15 @@ def process_ml_detections(frame, detections, line_height, offset, matches, vehic
     new_matches = []
 
     for (x, y) in matches_copy:
+        # Check if centroid is near the line
         if line_height - offset < y < line_height + offset:
             new_vehicles_count += 1
         else:
+            # Keep centroids that haven't crossed the line
             new_matches.append((x, y))
 
     # Display vehicle count
     cv2.putText(display_frame, f"Total Vehicle Detected: {new_vehicles_count}",
                 (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 170, 0), 2)
 
-    # Return all required values
-    return display_frame, new_matches, new_vehicles_count
+    return display_frame, new_matches, new_vehicles_count
\ No newline at end of file
@@ -0,0 +1,603 @@
+"""
+Asyncio ingestion of many camera streams
+
+One IngestionService manages any number of sources (video files, webcam
+indices, RTSP/HTTP URLs, or "test:" stand-ins) without a thread per
+camera:
+
+    service = IngestionService(workers=4, on_result=handle)
+    service.add_stream(CameraStream("north", "rtsp://cam1/stream", max_fps=2, positions=layout.positions))
+    service.add_stream(CameraStream("south", "test:1280x720@15"))
+    asyncio.run(service.run())
+
+or from the command line (main.py --ingest takes the same arguments):
+
+    python -m utils.ingestion north=rtsp://cam1/stream south=carPark.mp4 --fps 2 --workers 4
+    python main.py --ingest north=rtsp://cam1/stream south=carPark.mp4 --fps 2
+
+Every stream is a coroutine that opens its source, paces it to max_fps
+and reconnects with exponential backoff (and jitter) when it fails.
+OpenCV has no asynchronous API, so the blocking open/grab/read calls run
+on a shared, bounded thread pool (OpenCV releases the GIL while
+decoding); timing, backoff and scheduling all happen on the event loop.
+
+Frames go to a FairScheduler instead of a queue per camera. A stream
+holds at most one waiting frame and has at most one frame in the worker
+pool, and waiting streams are served in turn, so a fast camera cannot
+starve the others. A live stream's newer frame replaces its waiting one,
+so a slow pool always works on the freshest frames; a file stream waits
+instead, so recordings are processed completely. The pool (threads, or
+spawned processes with processes=True) runs the image_processor
+preprocessing and the occupancy scoring of the stream's parking spaces.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.image_processor import DEFAULT_PREPROCESS, preprocess_frame_for_parking_detection
+from utils.occupancy import DEFAULT_FILL_RATIO, positions_to_array, score_parking_spaces
+
+TEST_SOURCE_PREFIX = "test:"
+DEFAULT_MAX_FPS = 5.0
+RECONNECT_BACKOFF = 1.0  # Seconds before the first reconnect; doubles with each failure
+MAX_BACKOFF = 30.0
+BACKOFF_JITTER = 0.2  # +/- fraction, so cameras behind one switch do not reconnect in lockstep
+MAX_READ_THREADS = 32
+STOP_TIMEOUT = 5.0  # Seconds streams get to finish their current read when stopping
+
+# Stream states
+CONNECTING = "connecting"
+STREAMING = "streaming"
+BACKOFF = "backoff"
+FINISHED = "finished"
+FAILED = "failed"
+STOPPED = "stopped"
+
+
+class TestPatternCapture:
+    """
+    Stand-in for a live camera: cars driving over noisy asphalt
+
+    Source strings look like "test:WIDTHxHEIGHT[@FPS][,fail=N]"; with
+    fail=N the feed drops after N frames, to exercise reconnection.
+    """
+
+    def __init__(self, width=640, height=360, fps=15.0, fail_after=0, vehicles=6, seed=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fail_after = fail_after
+        self.frame_index = 0
+        self.opened = True
+        rng = np.random.default_rng(seed)
+        noise = rng.normal(90, 8, (height, width)).clip(0, 255).astype(np.uint8)
+        self.background = cv2.cvtColor(noise, cv2.COLOR_GRAY2BGR)
+        self.car_size = (max(16, width // 16), max(28, height // 8))
+        self.cars = [(int(rng.integers(0, width - self.car_size[0])), int(rng.integers(0, height)),
+                      int(rng.integers(4, 12)), tuple(int(c) for c in rng.integers(20, 230, 3)))
+                     for _ in range(vehicles)]
+        self.next_frame_time = time.monotonic()
+
+    @classmethod
+    def from_source(cls, source):
+        spec, *options = source[len(TEST_SOURCE_PREFIX):].split(",")
+        size, _, fps = spec.partition("@")
+        width, _, height = size.partition("x")
+        kwargs = dict(option.split("=", 1) for option in options if "=" in option)
+        return cls(int(width or 640), int(height or 360), float(fps or 15.0), int(kwargs.get("fail", 0)))
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        """Wait for the next frame like a camera would"""
+        if not self.opened or (self.fail_after and self.frame_index >= self.fail_after):
+            return False
+        delay = self.next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time = max(self.next_frame_time + 1 / self.fps, time.monotonic())
+        self.frame_index += 1
+        return True
+
+    def retrieve(self):
+        frame = self.background.copy()
+        car_w, car_h = self.car_size
+        for x, y, speed, color in self.cars:
+            y = (y + self.frame_index * speed) % (self.height + car_h) - car_h
+            cv2.rectangle(frame, (x, y), (x + car_w, y + car_h), color, -1)
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self.opened = False
+
+
+def is_live_source(source):
+    """Cameras and network streams keep producing frames; files end"""
+    if isinstance(source, int):
+        return True
+    return source.startswith(TEST_SOURCE_PREFIX) or "://" in source or source.isdigit()
+
+
+def open_capture(source):
+    """
+    Open a file path, webcam index, stream URL or "test:" stand-in
+
+    Returns:
+        A capture object (cv2.VideoCapture or TestPatternCapture); check isOpened()
+    """
+    if isinstance(source, str) and source.startswith(TEST_SOURCE_PREFIX):
+        return TestPatternCapture.from_source(source)
+    if isinstance(source, int) or source.isdigit():
+        cap = cv2.VideoCapture(int(source))
+    elif "://" in source:
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    else:
+        return cv2.VideoCapture(source)
+    # Keep live buffers short so a paced reader gets recent frames
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def occupancy_job(frame, positions, threshold, space_thresholds=None, params=DEFAULT_PREPROCESS):
+    """
+    Worker pool task: preprocess a frame and score its parking spaces
+
+    Returns:
+        Dictionary with free, occupied and total counts, the (N,) bool
+        occupied mask and the processing time in seconds
+    """
+    started = time.perf_counter()
+    img_pro = preprocess_frame_for_parking_detection(frame, params)
+    if positions is None or not len(positions):
+        occupied = np.zeros(0, dtype=bool)
+    else:
+        occupied, _, _ = score_parking_spaces(img_pro, positions, threshold, space_thresholds)
+    total = len(occupied)
+    free = int(np.count_nonzero(~occupied))
+    return {"free": free, "occupied": total - free, "total": total, "occupied_mask": occupied,
+            "seconds": time.perf_counter() - started}
+
+
+def _init_worker():
+    cv2.setNumThreads(1)  # One frame per process; the pool provides the parallelism
+
+
+class CameraStream:
+    """One source plus its pacing, reconnect policy and counters"""
+
+    def __init__(self, name, source, max_fps=DEFAULT_MAX_FPS, loop=False, positions=None, reference_dimensions=None,
+                 threshold=DEFAULT_FILL_RATIO, space_thresholds=None, params=DEFAULT_PREPROCESS,
+                 backoff=RECONNECT_BACKOFF, max_backoff=MAX_BACKOFF, max_retries=None):
+        """
+        Args:
+            name: Label used in results and status
+            source: File path, webcam index, stream URL or "test:WIDTHxHEIGHT[@FPS][,fail=N]"
+            max_fps: Frames per second handed to the scheduler (0 = as fast as the source delivers)
+            loop: Restart files from the beginning when they end
+            positions: (x, y, w, h) parking spaces, in reference_dimensions pixels if given
+            reference_dimensions: (width, height) positions were marked at; scaled to the frame size
+            threshold, space_thresholds: Fill ratio thresholds for occupancy
+            params: PreprocessParams for the preprocessing
+            backoff, max_backoff: Reconnect delays in seconds
+            max_retries: Give up after this many reconnects in a row (None = never)
+        """
+        self.name = name
+        self.source = source
+        self.max_fps = max_fps
+        self.loop = loop
+        self.live = is_live_source(source)
+        self.positions = positions_to_array(positions) if positions is not None else None
+        self.reference_dimensions = reference_dimensions
+        self.threshold = threshold
+        self.space_thresholds = space_thresholds
+        self.params = params
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self.state = CONNECTING
+        self.frames_read = 0
+        self.frames_skipped = 0  # Above max_fps
+        self.frames_replaced = 0  # Superseded by a newer frame before a worker was free
+        self.frames_processed = 0
+        self.reconnects = 0
+        self.failures = 0  # Reconnects since the last frame
+        self.last_error = None
+        self.last_result = None
+        self.last_latency = 0.0  # Capture to result, seconds
+
+        self.pending = None  # (frame, index, timestamp) waiting for a worker
+        self.busy = False  # A frame of this stream is in the worker pool
+        self._io = None  # Blocking call in progress on the read pool
+        self._taken = None  # asyncio.Event set when the scheduler takes the waiting frame
+        self._scaled = {}  # Frame size -> positions scaled to it
+
+    def positions_for(self, frame_shape):
+        """Space positions scaled to a frame of this shape"""
+        if self.positions is None:
+            return None
+        size = (frame_shape[1], frame_shape[0])
+        scaled = self._scaled.get(size)
+        if scaled is None:
+            scaled = self.positions
+            if self.reference_dimensions and tuple(self.reference_dimensions) != size:
+                scale = np.array([size[0] / self.reference_dimensions[0], size[1] / self.reference_dimensions[1]] * 2)
+                scaled = (self.positions * scale).astype(np.int32)
+            self._scaled[size] = scaled
+        return scaled
+
+    def status(self):
+        return {
+            "name": self.name,
+            "source": str(self.source),
+            "state": self.state,
+            "frames_read": self.frames_read,
+            "frames_skipped": self.frames_skipped,
+            "frames_replaced": self.frames_replaced,
+            "frames_processed": self.frames_processed,
+            "reconnects": self.reconnects,
+            "latency_ms": self.last_latency * 1000,
+            "free": None if self.last_result is None else self.last_result["free"],
+            "total": None if self.last_result is None else self.last_result["total"],
+            "last_error": self.last_error,
+        }
+
+    async def _call(self, service, fn, *args):
+        """Run a blocking capture call on the read pool"""
+        self._io = service.readers.submit(fn, *args)
+        return await asyncio.wrap_future(self._io)
+
+    def _release(self, service, cap):
+        # A read cannot be interrupted; release once it returns rather than underneath it
+        if self._io is not None and not self._io.done():
+            self._io.add_done_callback(lambda _: cap.release())
+        else:
+            try:
+                service.readers.submit(cap.release)
+            except RuntimeError:
+                cap.release()  # Read pool already shut down
+
+    async def run(self, service):
+        """Open, stream and reconnect until stopped, finished or out of retries"""
+        delay = self.backoff
+        while not service.stopping:
+            self.state = CONNECTING
+            cap = None
+            ended = "error"
+            try:
+                cap = await self._call(service, open_capture, self.source)
+                if cap.isOpened():
+                    self.state = STREAMING
+                    ended = await self._stream(service, cap)
+                else:
+                    self.last_error = f"Could not open {self.source}"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+            finally:
+                if cap is not None:
+                    self._release(service, cap)
+
+            if service.stopping:
+                break
+            if ended == "eof":
+                if not self.loop:
+                    self.state = FINISHED
+                    return
+                continue
+            if self.failures == 0:
+                delay = self.backoff  # The connection worked for a while; start over
+            self.failures += 1
+            if self.max_retries is not None and self.failures > self.max_retries:
+                self.state = FAILED
+                print(f"Error ingesting {self.name}: {self.last_error}; gave up after {self.max_retries} retries")
+                return
+            self.reconnects += 1
+            self.state = BACKOFF
+            await asyncio.sleep(delay * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER))
+            delay = min(delay * 2, self.max_backoff)
+        self.state = STOPPED
+
+    async def _stream(self, service, cap):
+        """Read frames at up to max_fps; returns "eof", "error" or "stopped\""""
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.max_fps if self.max_fps else 0.0
+        next_due = loop.time()
+        self._taken = asyncio.Event()
+        while not service.stopping:
+            if not self.live and self.pending is not None:
+                # Files are not dropped; wait for the scheduler to take the waiting frame
+                self._taken.clear()
+                await self._taken.wait()
+                continue
+            wait = next_due - loop.time()
+            if wait > 0:
+                if not self.live:
+                    await asyncio.sleep(wait)  # Files wait; nothing is lost
+                    continue
+                # Live sources keep producing; grab (no decode to BGR) and drop to stay current
+                if not await self._call(service, cap.grab):
+                    self.last_error = "Stream stopped delivering frames"
+                    return "error"
+                self.frames_skipped += 1
+                continue
+
+            ok, frame = await self._call(service, cap.read)
+            if not ok or frame is None:
+                if self.live:
+                    self.last_error = "Stream stopped delivering frames"
+                    return "error"
+                return "eof"
+            self.failures = 0
+            self.frames_read += 1
+            next_due = max(next_due + interval, loop.time()) if interval else next_due
+            service.scheduler.offer(self, frame, self.frames_read, time.time())
+        return "stopped"
+
+
+class FairScheduler:
+    """Round-robin hand-off of the newest frame of every stream"""
+
+    def __init__(self):
+        self.ready = deque()  # Streams with a waiting frame and nothing in the pool, in arrival order
+        self.event = asyncio.Event()
+
+    def offer(self, stream, frame, index, timestamp):
+        """Make a frame the stream's waiting frame, replacing an unprocessed one"""
+        if stream.pending is not None:
+            stream.frames_replaced += 1
+        elif not stream.busy:
+            self.ready.append(stream)
+            self.event.set()
+        stream.pending = (frame, index, timestamp)
+
+    def done(self, stream):
+        """The stream's frame left the pool; queue its waiting frame, if any, at the back"""
+        stream.busy = False
+        if stream.pending is not None:
+            self.ready.append(stream)
+            self.event.set()
+
+    async def next(self):
+        """Wait for the next stream in turn and take its frame"""
+        while not self.ready:
+            self.event.clear()
+            await self.event.wait()
+        stream = self.ready.popleft()
+        item = stream.pending
+        stream.pending = None
+        stream.busy = True
+        if stream._taken is not None:
+            stream._taken.set()
+        return stream, item
+
+
+class IngestionService:
+    """Runs many CameraStreams on one event loop feeding a bounded worker pool"""
+
+    def __init__(self, streams=(), workers=None, processes=False, read_threads=None, job=occupancy_job,
+                 on_result=None):
+        """
+        Args:
+            workers: Frames processed at once (default: one per CPU)
+            processes: Use spawned worker processes instead of threads
+            read_threads: Threads for blocking capture calls (default: one per stream, at most 32)
+            job: Picklable function(frame, positions, threshold, space_thresholds, params) run per frame
+            on_result: Optional callback (stream, frame index, capture timestamp, result); may be a coroutine
+        """
+        self.streams = {}
+        self.workers = workers or os.cpu_count() or 1
+        self.processes = processes
+        self.read_threads = read_threads
+        self.job = job
+        self.on_result = on_result
+        self.stopping = False
+        self.scheduler = None
+        self.readers = None
+        self.pool = None
+        self._tasks = {}
+        self._loop = None
+        for stream in streams:
+            self.add_stream(stream)
+
+    def add_stream(self, stream):
+        """Add a stream; it starts right away if the service is running"""
+        if stream.name in self.streams:
+            raise ValueError(f"Duplicate stream name {stream.name}")
+        self.streams[stream.name] = stream
+        if self._loop is not None:
+            self._tasks[stream.name] = self._loop.create_task(stream.run(self))
+
+    def stop(self):
+        """Ask every stream to finish; safe to call from other threads"""
+        self.stopping = True
+        if self._loop is not None:
+            for stream in self.streams.values():
+                if stream._taken is not None:
+                    self._loop.call_soon_threadsafe(stream._taken.set)
+
+    def status(self):
+        return [stream.status() for stream in self.streams.values()]
+
+    async def run(self, duration=None):
+        """
+        Ingest until every stream has finished, stop() is called or duration seconds pass
+
+        Returns:
+            List of stream status dictionaries
+        """
+        self._loop = asyncio.get_running_loop()
+        self.stopping = False
+        self.scheduler = FairScheduler()
+        read_threads = self.read_threads or min(MAX_READ_THREADS, max(4, len(self.streams)))
+        self.readers = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="ingest-read")
+        if self.processes:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker)
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest-work")
+
+        slots = asyncio.Semaphore(self.workers)
+        in_flight = set()
+        self._tasks = {name: self._loop.create_task(stream.run(self)) for name, stream in self.streams.items()}
+        dispatcher = self._loop.create_task(self._dispatch(slots, in_flight))
+        started = self._loop.time()
+        try:
+            while not self.stopping:
+                if all(task.done() for task in self._tasks.values()):
+                    break
+                if duration is not None and self._loop.time() - started >= duration:
+                    break
+                await asyncio.sleep(0.1)
+        finally:
+            self.stop()
+            # Streams notice stopping after their current read; cancel any stuck on a dead connection
+            _, stuck = await asyncio.wait(list(self._tasks.values()), timeout=STOP_TIMEOUT)
+            for task in stuck:
+                task.cancel()
+            if stuck:
+                await asyncio.wait(stuck, timeout=1.0)
+            dispatcher.cancel()
+            if in_flight:
+                await asyncio.wait(in_flight, timeout=5.0)
+            self.readers.shutdown(wait=False, cancel_futures=True)
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self._loop = None
+        return self.status()
+
+    async def _dispatch(self, slots, in_flight):
+        while True:
+            await slots.acquire()
+            try:
+                stream, item = await self.scheduler.next()
+            except asyncio.CancelledError:
+                slots.release()
+                raise
+            task = self._loop.create_task(self._process(stream, item, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    async def _process(self, stream, item, slots):
+        frame, index, timestamp = item
+        try:
+            result = await self._loop.run_in_executor(
+                self.pool, self.job, frame, stream.positions_for(frame.shape), stream.threshold,
+                stream.space_thresholds, stream.params)
+        except Exception as e:
+            stream.last_error = f"Processing failed: {str(e)}"
+            print(f"Error processing {stream.name} frame {index}: {str(e)}")
+            return
+        finally:
+            slots.release()
+            self.scheduler.done(stream)
+
+        stream.frames_processed += 1
+        stream.last_result = result
+        stream.last_latency = time.time() - timestamp
+        if self.on_result is not None:
+            try:
+                outcome = self.on_result(stream, index, timestamp, result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            except Exception as e:
+                print(f"Error handling result of {stream.name}: {str(e)}")
+
+
+def format_status(statuses):
+    lines = [f"{'stream':<12} {'state':<10} {'read':>7} {'skipped':>8} {'replaced':>8} {'done':>7} "
+             f"{'reconn':>6} {'lat ms':>7} {'free':>9}  error"]
+    for s in statuses:
+        free = "-" if s["free"] is None else f"{s['free']}/{s['total']}"
+        lines.append(f"{s['name']:<12} {s['state']:<10} {s['frames_read']:>7} {s['frames_skipped']:>8} "
+                     f"{s['frames_replaced']:>8} {s['frames_processed']:>7} {s['reconnects']:>6} "
+                     f"{s['latency_ms']:>7.1f} {free:>9}  {s['last_error'] or ''}")
+    return "\n".join(lines)
+
+
+def parse_source(text, index):
+    """ "name=source" or just "source" (named camN)"""
+    name, sep, source = text.partition("=")
+    if not sep or "://" in name or name.startswith(TEST_SOURCE_PREFIX):
+        return f"cam{index}", text
+    return name, source
+
+
+async def _report(service, every):
+    while True:
+        await asyncio.sleep(every)
+        print(format_status(service.status()) + "\n")
+
+
+async def _run_cli(service, duration, report_every):
+    reporter = asyncio.get_running_loop().create_task(_report(service, report_every)) if report_every else None
+    try:
+        return await service.run(duration)
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest many camera streams and score parking occupancy")
+    parser.add_argument("sources", nargs="+",
+                        help="[name=]source: video file, webcam index, RTSP/HTTP URL or test:WIDTHxHEIGHT[@FPS][,fail=N]")
+    parser.add_argument("--fps", type=float, default=DEFAULT_MAX_FPS, help="Frames per second per stream (0 = unlimited)")
+    parser.add_argument("--loop", action="store_true", help="Restart video files when they end")
+    parser.add_argument("--workers", type=int, help="Frames processed at once (default: one per CPU)")
+    parser.add_argument("--processes", action="store_true", help="Process frames in worker processes instead of threads")
+    parser.add_argument("--read-threads", type=int, help="Threads for blocking capture calls")
+    parser.add_argument("--max-retries", type=int, help="Give up on a stream after this many reconnects in a row")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between status reports (0 = off)")
+    parser.add_argument("--config-dir", default="config", help="Directory holding the parking layouts")
+    parser.add_argument("--reference-image", help="Parking layout applied to every stream")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_FILL_RATIO, help="Fill ratio threshold (0-1)")
+    args = parser.parse_args(argv)
+
+    from utils.resource_manager import load_parking_layout, load_preprocess_params
+
+    layout = None
+    if args.reference_image:
+        layout = load_parking_layout(args.config_dir, args.reference_image)
+        if layout is None:
+            print(f"No parking layout for {args.reference_image}")
+            return 1
+    params = load_preprocess_params(args.config_dir)
+
+    service = IngestionService(workers=args.workers, processes=args.processes, read_threads=args.read_threads)
+    for index, text in enumerate(args.sources):
+        name, source = parse_source(text, index)
+        service.add_stream(CameraStream(
+            name, source, max_fps=args.fps, loop=args.loop, max_retries=args.max_retries, params=params,
+            threshold=args.threshold,
+            positions=layout.positions if layout is not None else None,
+            reference_dimensions=layout.reference_dimensions if layout is not None else None,
+            space_thresholds=layout.thresholds if layout is not None and layout.has_thresholds() else None))
+
+    try:
+        statuses = asyncio.run(_run_cli(service, args.duration, args.report_every))
+    except KeyboardInterrupt:
+        statuses = service.status()
+    print(format_status(statuses))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Hot-path instrumentation for the frame pipeline
+
+Stages are timed with a context manager or decorator:
+
+    with pipeline.stage("detection"):
+        detections = detector.detect_vehicles(frame)
+
+    @timed("allocation_request")
+    def allocate_parking(...): ...
+
+Latencies go into fixed log-spaced histograms (about 19% wide buckets
+from 10 us to 2 min), so recording is a bisect and a few integer
+increments with no lock and no per-sample storage. Percentiles are read
+from the buckets. Counters track frames processed and dropped, and gauges
+hold current values such as queue depths.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Pipeline stages in frame order
+STAGES = ("capture", "preprocess", "occupancy", "detection", "tracking", "allocation", "annotate", "display")
+
+# Upper bounds (seconds) of the histogram buckets: 4 per doubling from 10 us
+BUCKET_BOUNDS = tuple(1e-5 * 2 ** (i / 4) for i in range(96))
+
+DEFAULT_FPS_WINDOW = 60
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency distribution
+
+    Recording takes no lock. Concurrent writers can very rarely lose a
+    sample, which is fine for monitoring.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # Last bucket holds anything slower
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """
+        Latency below which q percent of the samples fall
+
+        Returns:
+            Upper bound of the bucket holding that rank (capped at the max), in seconds
+        """
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q / 100.0 * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds):
+        """Number of samples at or below each bound (bounds must be in BUCKET_BOUNDS order)"""
+        counts = list(self.counts)
+        result = []
+        cumulative = 0
+        i = 0
+        for bound in bounds:
+            while i < len(BUCKET_BOUNDS) and BUCKET_BOUNDS[i] <= bound:
+                cumulative += counts[i]
+                i += 1
+            result.append(cumulative)
+        return result
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class Instrumentation:
+    """Named latency histograms, counters and gauges for one pipeline"""
+
+    def __init__(self, fps_window=DEFAULT_FPS_WINDOW):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.frame_times = deque(maxlen=fps_window)
+        self.started = time.time()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of a with block as one sample of a stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name=None):
+        """Decorator timing every call of a function as a stage (default: the function name)"""
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage_name, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def frame_done(self, seconds=None):
+        """Mark the end of a processed frame, optionally with its total time"""
+        self.frame_times.append(time.perf_counter())
+        self.count("frames")
+        if seconds is not None:
+            self.record("frame", seconds)
+
+    def frame_dropped(self, amount=1):
+        self.count("frames_dropped", amount)
+
+    @property
+    def dropped_frames(self):
+        return self.counters.get("frames_dropped", 0)
+
+    def fps(self):
+        """Frames per second over the recent window"""
+        times = list(self.frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def snapshot(self):
+        """Plain-dict copy of everything recorded, for logs and exporters"""
+        return {
+            "stages": {name: histogram.snapshot() for name, histogram in list(self.histograms.items())},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "fps": self.fps(),
+            "uptime": time.time() - self.started,
+        }
+
+    def summary(self, title="Pipeline timings"):
+        """Text table of the stage latencies in milliseconds"""
+        names = [name for name in STAGES if name in self.histograms]
+        names += sorted(name for name in self.histograms if name not in STAGES)
+        lines = [
+            f"{title}: {self.counters.get('frames', 0)} frames, {self.dropped_frames} dropped, "
+            f"{self.fps():.1f} FPS",
+            f"{'stage':<20} {'count':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}",
+        ]
+        for name in names:
+            s = self.histograms[name].snapshot()
+            lines.append(f"{name:<20} {s['count']:>8} {s['mean'] * 1000:>8.1f} {s['p50'] * 1000:>8.1f} "
+                         f"{s['p95'] * 1000:>8.1f} {s['p99'] * 1000:>8.1f} {s['max'] * 1000:>8.1f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+        self.frame_times.clear()
+        self.started = time.time()
+
+
+# Shared instance for the application's frame pipeline
+pipeline = Instrumentation()
+stage = pipeline.stage
+timed = pipeline.timed
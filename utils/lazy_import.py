@@ -0,0 +1,133 @@
+"""
+Deferred imports and import-time profiling
+
+Heavy libraries (torch, xgboost, pandas, matplotlib) are only needed by
+features the operator may never open. lazy_import() returns a stand-in
+that imports the real module the first time one of its attributes is
+used, so module-level code can keep writing `xgb.XGBClassifier`.
+
+ImportProfiler records how long every first-time import takes, including
+the lazy ones triggered later, for the startup report in main.py.
+"""
+
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+_lazy_modules = {}
+_lazy_lock = threading.RLock()
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_module = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            with _lazy_lock:
+                if self._lazy_module is None:
+                    # Through __import__ so the profiler sees the import
+                    __import__(self._lazy_name)
+                    self._lazy_module = sys.modules[self._lazy_name]
+        return self._lazy_module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def is_loaded(self):
+        return self._lazy_module is not None
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+def lazy_import(name):
+    """Module stand-in for name; the import happens on first use"""
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            _lazy_modules[name] = LazyModule(name)
+        return _lazy_modules[name]
+
+
+def is_available(name):
+    """Whether a module can be imported, without importing it"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class ImportProfiler:
+    """Measures the cost of every first-time import while active"""
+
+    def __init__(self):
+        self.start_time = None
+        self.records = {}  # module -> [inclusive seconds, self seconds, seconds after start]
+        self._original_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._original_import is not None:
+            return
+        self.start_time = time.perf_counter()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        started = time.perf_counter()
+        stack.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                record = self.records.setdefault(name, [0.0, 0.0, started - self.start_time])
+                record[0] += elapsed
+                record[1] += elapsed - children
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+
+    def report(self, limit=25, title="Import profile"):
+        """Text table of the slowest imports by inclusive time"""
+        with self._lock:
+            records = sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)
+
+        top_level = sum(self_time for _, (_, self_time, _) in records)
+        lines = [
+            f"{title}: {len(records)} modules, {top_level:.3f}s importing, {self.elapsed():.3f}s since start",
+            f"{'module':<48} {'total ms':>10} {'self ms':>10} {'at s':>8}",
+        ]
+        for name, (inclusive, self_time, offset) in records[:limit]:
+            lines.append(f"{name:<48} {inclusive * 1000:>10.1f} {self_time * 1000:>10.1f} {offset:>8.2f}")
+        return "\n".join(lines)
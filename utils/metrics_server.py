@@ -0,0 +1,163 @@
+"""
+Embedded Prometheus metrics endpoint
+
+MetricsServer serves GET /metrics from a stdlib HTTP server on a daemon
+thread. Each scrape calls the registered collectors, which write samples
+into a MetricsWriter. Collectors run on the server thread, so they must
+only read state that is safe to read from another thread (no Tk calls).
+
+    server = MetricsServer(port=9108)
+    server.add_collector(collect_pipeline_metrics)
+    server.start()
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.instrumentation import BUCKET_BOUNDS, pipeline
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_PORT = 9108
+DEFAULT_HOST = "127.0.0.1"
+
+# One exported bucket per doubling (10 us .. ~80 s) keeps the series count down
+EXPORT_BOUNDS = BUCKET_BOUNDS[::4]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value is True or value is False:
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsWriter:
+    """Collects samples and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}  # name -> (type, help, [sample lines]), in first-seen order
+
+    def _metric(self, name, kind, help_text):
+        if name not in self.metrics:
+            self.metrics[name] = (kind, help_text, [])
+        return self.metrics[name][2]
+
+    def _line(self, name, value, labels):
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            return f"{name}{{{label_text}}} {_format_value(value)}"
+        return f"{name} {_format_value(value)}"
+
+    def gauge(self, name, value, help_text="", **labels):
+        self._metric(name, "gauge", help_text).append(self._line(name, value, labels))
+
+    def counter(self, name, value, help_text="", **labels):
+        self._metric(name, "counter", help_text).append(self._line(name, value, labels))
+
+    def histogram(self, name, histogram, help_text="", **labels):
+        """Export a LatencyHistogram as cumulative buckets, _sum and _count"""
+        lines = self._metric(name, "histogram", help_text)
+        for bound, count in zip(EXPORT_BOUNDS, histogram.cumulative_counts(EXPORT_BOUNDS)):
+            lines.append(self._line(f"{name}_bucket", count, dict(labels, le=f"{bound:.6g}")))
+        lines.append(self._line(f"{name}_bucket", histogram.count, dict(labels, le="+Inf")))
+        lines.append(self._line(f"{name}_sum", histogram.total, labels))
+        lines.append(self._line(f"{name}_count", histogram.count, labels))
+
+    def text(self):
+        output = []
+        for name, (kind, help_text, lines) in self.metrics.items():
+            if help_text:
+                output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+def collect_pipeline_metrics(writer, instrumentation=pipeline):
+    """Stage latencies, frame counters, FPS and gauges of an Instrumentation"""
+    snapshot_histograms = list(instrumentation.histograms.items())
+    for name, histogram in snapshot_histograms:
+        writer.histogram("parking_stage_latency_seconds", histogram,
+                         "Latency of each pipeline stage (allocation_request is the allocation latency)",
+                         stage=name)
+
+    writer.counter("parking_frames_total", instrumentation.counters.get("frames", 0), "Frames processed")
+    writer.counter("parking_frames_dropped_total", instrumentation.dropped_frames,
+                   "Frames that could not be read or processed")
+    writer.gauge("parking_pipeline_fps", instrumentation.fps(), "Frames per second over the recent window")
+    for name, value in list(instrumentation.gauges.items()):
+        writer.gauge("parking_pipeline_gauge", value, "Other pipeline gauges", gauge=name)
+
+
+class MetricsServer:
+    """Serves /metrics on a background thread"""
+
+    def __init__(self, port=DEFAULT_PORT, host=DEFAULT_HOST, collectors=(collect_pipeline_metrics,)):
+        self.port = port
+        self.host = host
+        self.collectors = list(collectors)
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def add_collector(self, collector):
+        """Add a callable(writer) run on every scrape"""
+        with self.lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        writer = MetricsWriter()
+        with self.lock:
+            collectors = list(self.collectors)
+        for collector in collectors:
+            try:
+                collector(writer)
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        return writer.text()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+        """Start serving; returns self"""
+        if self._server is not None:
+            return self
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics_server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # Resolves port 0
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Serving metrics on {self.url}")
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
@@ -0,0 +1,158 @@
+"""
+Background loading and warm-up of detection models
+
+Constructing a detector can download weights, compile kernels and fall
+back through several backends, which takes seconds. ModelLoader does it on
+a worker thread, runs a few inferences on dummy frames so the first real
+frame is not slow, and exposes progress that the UI polls. Ready models
+are cached by name so switching back to one is instant.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+IDLE = "idle"
+LOADING = "loading"
+WARMING_UP = "warming up"
+READY = "ready"
+FAILED = "failed"
+
+DEFAULT_WARMUP_FRAMES = 3
+DEFAULT_WARMUP_SIZE = (360, 640)
+
+# Share of the progress bar used by construction; warm-up fills the rest
+_LOAD_SHARE = 0.6
+
+
+def default_warmup(model, frame):
+    """Run one inference through whichever interface the model has"""
+    if hasattr(model, "detect_vehicles"):
+        model.detect_vehicles(frame)
+    elif callable(model):
+        model(frame)
+
+
+class ModelLoader:
+    """Builds models on a background thread and reports progress"""
+
+    def __init__(self, warmup_frames=DEFAULT_WARMUP_FRAMES):
+        self.warmup_frames = warmup_frames
+        self.lock = threading.Lock()
+        self.cache = {}
+
+        self.name = None
+        self.state = IDLE
+        self.progress = 0.0
+        self.message = ""
+        self.error = None
+        self.model = None
+        self.load_time = 0.0
+
+        # Bumped on every load/cancel; results of older requests are discarded
+        self._generation = 0
+
+    def load(self, name, factory, warmup=default_warmup, frame_size=DEFAULT_WARMUP_SIZE):
+        """
+        Start loading a model, replacing any load in progress
+
+        Args:
+            name: Cache key, e.g. the detection method
+            factory: Callable returning the model; returning None counts as failure
+            warmup: Callable(model, frame) running one inference, or None to skip warm-up
+            frame_size: (height, width) of the dummy warm-up frames
+        """
+        with self.lock:
+            self._generation += 1
+            generation = self._generation
+            self.name = name
+            self.error = None
+            self.model = None
+
+            if name in self.cache:
+                self._set(READY, 1.0, f"{name} ready (cached)")
+                self.model = self.cache[name]
+                return
+
+            self._set(LOADING, 0.0, f"Loading {name}...")
+
+        thread = threading.Thread(target=self._run, args=(generation, name, factory, warmup, frame_size),
+                                  daemon=True)
+        thread.start()
+
+    def cancel(self):
+        """Forget the current load; its result will be dropped"""
+        with self.lock:
+            self._generation += 1
+            self.name = None
+            self.model = None
+            self._set(IDLE, 0.0, "")
+
+    def evict(self, name):
+        with self.lock:
+            self.cache.pop(name, None)
+
+    def status(self):
+        """(state, progress 0-1, message) snapshot for the UI"""
+        with self.lock:
+            return self.state, self.progress, self.message
+
+    def _set(self, state, progress, message):
+        self.state = state
+        self.progress = progress
+        self.message = message
+
+    def _update(self, generation, state, progress, message):
+        with self.lock:
+            if generation != self._generation:
+                return False
+            self._set(state, progress, message)
+            return True
+
+    def _run(self, generation, name, factory, warmup, frame_size):
+        started = time.time()
+        try:
+            model = factory()
+            if model is None:
+                raise RuntimeError(f"{name} could not be initialized")
+
+            if not self._update(generation, WARMING_UP, _LOAD_SHARE, f"Warming up {name}..."):
+                return
+
+            def on_frame(done):
+                return self._update(generation, WARMING_UP,
+                                    _LOAD_SHARE + (1 - _LOAD_SHARE) * done / max(1, self.warmup_frames),
+                                    f"Warming up {name} ({done}/{self.warmup_frames})")
+
+            self._warm_up(model, warmup, frame_size, on_frame)
+        except Exception as e:
+            with self.lock:
+                if generation == self._generation:
+                    self.error = str(e)
+                    self._set(FAILED, 0.0, f"Failed to load {name}: {str(e)}")
+            return
+
+        with self.lock:
+            self.cache[name] = model
+            if generation != self._generation:
+                return
+            self.model = model
+            self.load_time = time.time() - started
+            self._set(READY, 1.0, f"{name} ready in {self.load_time:.1f}s")
+
+    def _warm_up(self, model, warmup, frame_size, on_frame=None):
+        if warmup is None:
+            return
+        height, width = frame_size
+        rng = np.random.default_rng(0)
+        for i in range(self.warmup_frames):
+            frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+            try:
+                warmup(model, frame)
+            except Exception as e:
+                # A failing warm-up only costs the first real frame some latency
+                print(f"Warm-up inference failed: {str(e)}")
+                break
+            if on_frame is not None and not on_frame(i + 1):
+                return
@@ -0,0 +1,204 @@
+"""
+Area-normalized occupancy scoring for parking spaces
+"""
+
+import cv2
+import numpy as np
+
+# Fraction of a space's pixels that must be foreground for it to count as occupied.
+# Roughly matches the old 500 pixel default on a ~125x48 space.
+DEFAULT_FILL_RATIO = 0.08
+
+# Calibration needs at least this much spread between the emptiest and fullest
+# frame of a space before it trusts the learned split point.
+MIN_CALIBRATION_SPREAD = 0.05
+# ...and the samples must be clearly bimodal: the split has to explain most of
+# the variance (a single Gaussian noise band only reaches 2/pi ~ 0.64) and both
+# states must have been seen in a fair share of the frames.
+MIN_CALIBRATION_SEPARABILITY = 0.8
+MIN_CALIBRATION_CLASS_FRACTION = 0.05
+DEFAULT_CALIBRATION_FRAMES = 150
+
+
+def positions_to_array(pos_list):
+    """Convert a list of (x, y, w, h) tuples to an (N, 4) int32 array"""
+    if isinstance(pos_list, np.ndarray):
+        return pos_list.reshape(-1, 4).astype(np.int32, copy=False)
+    if len(pos_list) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+    return np.asarray(pos_list, dtype=np.int32).reshape(-1, 4)
+
+
+def space_areas(positions):
+    """Pixel area of every space"""
+    positions = positions_to_array(positions)
+    return positions[:, 2].astype(np.int64) * positions[:, 3].astype(np.int64)
+
+
+def count_foreground_pixels(img_pro, positions):
+    """
+    Count non-zero pixels inside every space with a single integral image
+
+    Args:
+        img_pro: Preprocessed single-channel image
+        positions: (N, 4) array or list of (x, y, w, h)
+
+    Returns:
+        counts: (N,) int64 foreground pixel counts (0 for out-of-bounds spaces)
+        valid: (N,) bool mask of spaces that lie inside the image
+    """
+    positions = positions_to_array(positions)
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+    height, width = img_pro.shape[:2]
+    x, y, w, h = positions[:, 0], positions[:, 1], positions[:, 2], positions[:, 3]
+
+    # Same bounds rule the per-space loop used
+    valid = (x >= 0) & (y >= 0) & (x + w < width) & (y + h < height)
+
+    integral = cv2.integral((img_pro > 0).astype(np.uint8))
+    x1 = np.clip(x, 0, width)
+    y1 = np.clip(y, 0, height)
+    x2 = np.clip(x + w, 0, width)
+    y2 = np.clip(y + h, 0, height)
+
+    counts = (integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]).astype(np.int64)
+    counts[~valid] = 0
+    return counts, valid
+
+
+def fill_ratios(counts, areas):
+    """Foreground fill ratio of every space"""
+    return counts / np.maximum(areas, 1)
+
+
+def resolve_thresholds(num_spaces, space_thresholds=None, default=DEFAULT_FILL_RATIO):
+    """
+    Build a full per-space threshold vector
+
+    Spaces without a learned threshold (NaN entries, or no thresholds at all)
+    fall back to the global default. A vector that no longer matches the
+    number of spaces is ignored.
+    """
+    thresholds = np.full(num_spaces, float(default), dtype=np.float64)
+    if space_thresholds is None:
+        return thresholds
+
+    space_thresholds = np.asarray(space_thresholds, dtype=np.float64)
+    if space_thresholds.shape != (num_spaces,):
+        return thresholds
+
+    learned = ~np.isnan(space_thresholds)
+    thresholds[learned] = space_thresholds[learned]
+    return thresholds
+
+
+def score_parking_spaces(img_pro, positions, threshold=DEFAULT_FILL_RATIO, space_thresholds=None):
+    """
+    Classify every space in one pass
+
+    Returns:
+        occupied: (N,) bool, out-of-bounds spaces are reported as occupied
+        ratios: (N,) float fill ratios
+        valid: (N,) bool mask of spaces inside the image
+    """
+    positions = positions_to_array(positions)
+    counts, valid = count_foreground_pixels(img_pro, positions)
+    ratios = fill_ratios(counts, space_areas(positions))
+    thresholds = resolve_thresholds(len(positions), space_thresholds, threshold)
+    occupied = (ratios >= thresholds) | ~valid
+    return occupied, ratios, valid
+
+
+def occupancy_confidence(ratios, thresholds):
+    """
+    Confidence of each occupancy decision, 0 at the threshold and 1 once the
+    fill ratio is as far from the threshold as the threshold is from 0
+    """
+    thresholds = np.maximum(np.asarray(thresholds, dtype=np.float64), 1e-6)
+    return np.clip(np.abs(ratios - thresholds) / thresholds, 0.0, 1.0)
+
+
+def calibrate_thresholds(ratio_window, min_spread=MIN_CALIBRATION_SPREAD,
+                         min_separability=MIN_CALIBRATION_SEPARABILITY,
+                         min_class_fraction=MIN_CALIBRATION_CLASS_FRACTION):
+    """
+    Learn a per-space threshold from a window of fill ratios
+
+    For each space the samples are split into two groups at the point that
+    maximizes the between-group variance (Otsu's method on a 1-D sample),
+    and the threshold is placed halfway across that gap. Spaces whose
+    samples are not clearly bimodal (they stayed free or occupied for the
+    whole window, however noisy) get NaN, so they keep following the
+    global threshold.
+
+    Args:
+        ratio_window: (frames, spaces) array of fill ratios
+        min_spread: Minimum max-min ratio spread to trust the learned split
+        min_separability: Minimum between-group / total variance of the split
+        min_class_fraction: Minimum fraction of frames on each side of the split
+
+    Returns:
+        (spaces,) float array of thresholds, NaN where none was learned
+    """
+    samples = np.sort(np.asarray(ratio_window, dtype=np.float64), axis=0)
+    num_frames, num_spaces = samples.shape
+    thresholds = np.full(num_spaces, np.nan, dtype=np.float64)
+    if num_frames < 2 or num_spaces == 0:
+        return thresholds
+
+    cumulative = np.cumsum(samples, axis=0)
+    total = cumulative[-1]
+
+    # Candidate split after the k-th lowest sample, k = 1..frames-1
+    k = np.arange(1, num_frames)[:, None]
+    low_mean = cumulative[:-1] / k
+    high_mean = (total - cumulative[:-1]) / (num_frames - k)
+    between_variance = (k / num_frames) * (1 - k / num_frames) * (low_mean - high_mean) ** 2
+
+    best = np.argmax(between_variance, axis=0)
+    columns = np.arange(num_spaces)
+    split = (samples[best, columns] + samples[best + 1, columns]) / 2
+
+    spread = samples[-1] - samples[0]
+    total_variance = samples.var(axis=0)
+    separability = between_variance[best, columns] / np.maximum(total_variance, 1e-12)
+    smaller_class = np.minimum(best + 1, num_frames - best - 1) / num_frames
+    learned = ((spread >= min_spread) & (separability >= min_separability) &
+               (smaller_class >= min_class_fraction))
+    thresholds[learned] = split[learned]
+    return thresholds
+
+
+class ThresholdCalibrator:
+    """Collects fill ratios over a window of frames and learns per-space thresholds"""
+
+    def __init__(self, num_spaces, num_frames=DEFAULT_CALIBRATION_FRAMES):
+        self.num_spaces = num_spaces
+        self.num_frames = num_frames
+        self.window = np.zeros((num_frames, num_spaces), dtype=np.float32)
+        self.frames_collected = 0
+
+    @property
+    def done(self):
+        return self.frames_collected >= self.num_frames
+
+    @property
+    def progress(self):
+        return self.frames_collected / self.num_frames if self.num_frames else 1.0
+
+    def add(self, ratios):
+        """Add the fill ratios of one frame; returns True once the window is full"""
+        if self.done:
+            return True
+        if len(ratios) != self.num_spaces:
+            raise ValueError(f"Expected {self.num_spaces} ratios, got {len(ratios)}")
+
+        self.window[self.frames_collected] = ratios
+        self.frames_collected += 1
+        return self.done
+
+    def thresholds(self):
+        """Per-space thresholds learned from the frames collected so far, NaN where none was learned"""
+        return calibrate_thresholds(self.window[:self.frames_collected])
@@ -0,0 +1,258 @@
+"""
+Embedded time-series store for lot and section occupancy
+
+Samples are written to SQLite by a background thread. Every sample is
+folded into 1-minute, 1-hour and 1-day rollup rows as it is inserted, so
+statistics and exports read precomputed aggregates instead of scanning
+raw samples.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+
+# Resolution name -> bucket width in seconds
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Section name used for whole-lot rows
+LOT_TOTAL = '*'
+
+DEFAULT_SAMPLE_INTERVAL = 1.0
+DEFAULT_RAW_RETENTION = 2 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    lot TEXT NOT NULL,
+    section TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    occupied INTEGER NOT NULL,
+    vehicles INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    lot TEXT NOT NULL,
+    section TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    occupied_sum INTEGER NOT NULL,
+    occupied_min INTEGER NOT NULL,
+    occupied_max INTEGER NOT NULL,
+    vehicles_max INTEGER NOT NULL,
+    PRIMARY KEY (resolution, lot, section, bucket)
+);
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, bucket, lot, section, samples, total,
+                     occupied_sum, occupied_min, occupied_max, vehicles_max)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, lot, section, bucket) DO UPDATE SET
+    samples = samples + 1,
+    total = excluded.total,
+    occupied_sum = occupied_sum + excluded.occupied_sum,
+    occupied_min = MIN(occupied_min, excluded.occupied_min),
+    occupied_max = MAX(occupied_max, excluded.occupied_max),
+    vehicles_max = MAX(vehicles_max, excluded.vehicles_max)
+"""
+
+
+class OccupancyStore:
+    """SQLite-backed occupancy time series with automatic rollups"""
+
+    def __init__(self, db_path, sample_interval=DEFAULT_SAMPLE_INTERVAL, raw_retention=DEFAULT_RAW_RETENTION,
+                 commit_interval=2.0):
+        """
+        Args:
+            db_path: SQLite database file
+            sample_interval: Minimum seconds between stored samples of a lot
+            raw_retention: Seconds of raw samples to keep (rollups are kept forever)
+            commit_interval: Seconds between write transactions
+        """
+        self.db_path = db_path
+        self.sample_interval = sample_interval
+        self.raw_retention = raw_retention
+        self.commit_interval = commit_interval
+
+        self._last_sample = {}
+        self._pending = queue.Queue()
+        self._closed = threading.Event()
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, lot, sections, vehicles=0, timestamp=None):
+        """
+        Queue a sample; calls faster than sample_interval per lot are dropped
+
+        Args:
+            lot: Lot name
+            sections: {section: (total, occupied)}; the whole-lot row is derived
+            vehicles: Vehicles counted so far
+            timestamp: Unix time, defaults to now
+
+        Returns:
+            True if the sample was queued
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if timestamp - self._last_sample.get(lot, float('-inf')) < self.sample_interval:
+            return False
+        self._last_sample[lot] = timestamp
+
+        rows = [(section, int(total), int(occupied)) for section, (total, occupied) in sections.items()
+                if section != LOT_TOTAL]
+        rows.append((LOT_TOTAL, sum(row[1] for row in rows), sum(row[2] for row in rows)))
+        self._pending.put((timestamp, lot, rows, int(vehicles)))
+        return True
+
+    def _writer_loop(self):
+        conn = self._connect()
+        last_trim = 0
+        try:
+            while not self._closed.wait(self.commit_interval):
+                self._write_pending(conn)
+
+                # Trim raw samples about once a minute; rollups keep the history
+                if time.time() - last_trim > 60:
+                    conn.execute("DELETE FROM samples WHERE ts < ?", (time.time() - self.raw_retention,))
+                    conn.commit()
+                    last_trim = time.time()
+            self._write_pending(conn)
+        finally:
+            conn.close()
+
+    def _write_pending(self, conn):
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+
+        try:
+            with conn:
+                for timestamp, lot, rows, vehicles in batch:
+                    conn.executemany(
+                        "INSERT INTO samples (ts, lot, section, total, occupied, vehicles) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(timestamp, lot, section, total, occupied, vehicles) for section, total, occupied in rows])
+
+                    rollups = []
+                    for resolution, width in RESOLUTIONS.items():
+                        bucket = int(timestamp // width) * width
+                        for section, total, occupied in rows:
+                            rollups.append((resolution, bucket, lot, section, total,
+                                            occupied, occupied, occupied, vehicles))
+                    conn.executemany(_UPSERT_ROLLUP, rollups)
+        except sqlite3.Error as e:
+            print(f"Error writing occupancy samples: {str(e)}")
+
+    def query(self, resolution='1h', start=None, end=None, lot=None, section=LOT_TOTAL):
+        """
+        Read rollups for a time range
+
+        Args:
+            resolution: One of RESOLUTIONS
+            start: Optional Unix time lower bound (inclusive)
+            end: Optional Unix time upper bound (exclusive)
+            lot: Optional lot name (all lots when None)
+            section: Section name, LOT_TOTAL for whole lots, None for every section
+
+        Returns:
+            List of dicts ordered by bucket, newest first
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {list(RESOLUTIONS)}")
+
+        sql = ("SELECT bucket, lot, section, samples, total, occupied_sum, occupied_min, occupied_max, vehicles_max "
+               "FROM rollups WHERE resolution = ?")
+        params = [resolution]
+        if start is not None:
+            sql += " AND bucket >= ?"
+            params.append(int(start // RESOLUTIONS[resolution]) * RESOLUTIONS[resolution])
+        if end is not None:
+            sql += " AND bucket < ?"
+            params.append(end)
+        if lot is not None:
+            sql += " AND lot = ?"
+            params.append(lot)
+        if section is not None:
+            sql += " AND section = ?"
+            params.append(section)
+        sql += " ORDER BY bucket DESC, lot, section"
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        results = []
+        for bucket, lot_name, section_name, samples, total, occupied_sum, occupied_min, occupied_max, vehicles \
+                in rows:
+            occupied_avg = occupied_sum / samples if samples else 0
+            results.append({
+                'bucket': bucket,
+                'lot': lot_name,
+                'section': section_name,
+                'samples': samples,
+                'total': total,
+                'occupied_avg': occupied_avg,
+                'occupied_min': occupied_min,
+                'occupied_max': occupied_max,
+                'free_avg': total - occupied_avg,
+                'vehicles': vehicles,
+            })
+        return results
+
+    def clear(self):
+        """Delete all samples and rollups"""
+        self._write_pending_now()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM samples")
+                conn.execute("DELETE FROM rollups")
+        finally:
+            conn.close()
+
+    def _write_pending_now(self):
+        conn = self._connect()
+        try:
+            self._write_pending(conn)
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Write queued samples immediately"""
+        self._write_pending_now()
+
+    @property
+    def queue_depth(self):
+        """Samples waiting for the writer"""
+        return self._pending.qsize()
+
+    def close(self):
+        """Stop the writer after it has stored everything queued"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._writer_thread.join(timeout=5)
@@ -0,0 +1,194 @@
+"""
+Versioned binary layout files for parking spaces
+
+A layout file is a small JSON header followed by a packed little-endian
+int32 body with one row per space:
+
+    magic (8 bytes) | header length (uint32) | JSON header | padding | body
+
+The body starts on a 64 byte boundary so it can be memory-mapped straight
+into a NumPy array without copying.
+"""
+
+import io
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b"PKLAYOUT"
+SCHEMA_VERSION = 1
+LAYOUT_EXTENSION = ".layout"
+BODY_ALIGNMENT = 64
+BODY_DTYPE = np.dtype("<i4")
+COLUMNS = ("x", "y", "w", "h", "section", "threshold_ppm")
+
+# Thresholds are stored as fill ratio parts-per-million; -1 means "use the global default"
+THRESHOLD_SCALE = 1_000_000
+NO_THRESHOLD = -1
+
+_HEADER_PREFIX = struct.Struct("<8sI")
+
+
+class ParkingLayout:
+    """Parking space geometry backed by a single (N, 6) int32 array"""
+
+    def __init__(self, body, reference_dimensions=None, sections=None, schema_version=SCHEMA_VERSION):
+        self.body = body
+        self.reference_dimensions = tuple(reference_dimensions) if reference_dimensions else None
+        self.sections = list(sections) if sections else []
+        self.schema_version = schema_version
+
+    @classmethod
+    def from_positions(cls, positions, reference_dimensions=None, thresholds=None):
+        """Build a layout from (x, y, w, h) positions at reference dimensions"""
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 4)
+        body = np.zeros((len(positions), len(COLUMNS)), dtype=BODY_DTYPE)
+        body[:, :4] = positions
+
+        # Quadrant sections, the same split the allocation system uses
+        if reference_dimensions:
+            ref_width, ref_height = reference_dimensions
+        else:
+            ref_width = int((positions[:, 0] + positions[:, 2]).max()) if len(positions) else 0
+            ref_height = int((positions[:, 1] + positions[:, 3]).max()) if len(positions) else 0
+        sections = ["A1", "A2", "B1", "B2"]
+        right = positions[:, 0] >= ref_width / 2
+        bottom = positions[:, 1] >= ref_height / 2
+        body[:, 4] = right * 2 + bottom
+
+        layout = cls(body, reference_dimensions, sections)
+        layout.set_thresholds(thresholds)
+        return layout
+
+    def __len__(self):
+        return len(self.body)
+
+    @property
+    def positions(self):
+        """(N, 4) view of x, y, w, h"""
+        return self.body[:, :4]
+
+    @property
+    def section_index(self):
+        """(N,) index into sections for every space"""
+        return self.body[:, 4]
+
+    @property
+    def thresholds(self):
+        """(N,) per-space fill ratio thresholds, NaN where none was learned"""
+        ppm = self.body[:, 5]
+        thresholds = ppm / THRESHOLD_SCALE
+        thresholds[ppm == NO_THRESHOLD] = np.nan
+        return thresholds
+
+    def has_thresholds(self):
+        return bool(np.any(self.body[:, 5] != NO_THRESHOLD))
+
+    def set_thresholds(self, thresholds):
+        """Store per-space fill ratio thresholds (None or NaN entries clear them)"""
+        if not self.body.flags.writeable:
+            self.body = np.array(self.body)
+
+        if thresholds is None:
+            self.body[:, 5] = NO_THRESHOLD
+            return
+
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        if thresholds.shape != (len(self.body),):
+            raise ValueError(f"Expected {len(self.body)} thresholds, got {thresholds.shape[0]}")
+
+        learned = ~np.isnan(thresholds)
+        ppm = np.full(len(thresholds), NO_THRESHOLD, dtype=np.int64)
+        ppm[learned] = np.round(thresholds[learned] * THRESHOLD_SCALE)
+        self.body[:, 5] = ppm
+
+    def space_sections(self):
+        """Section name of every space"""
+        return [self.sections[i] for i in self.section_index]
+
+    def to_pos_list(self):
+        """Positions as the list of (x, y, w, h) tuples the UI edits"""
+        return [tuple(row) for row in self.positions.tolist()]
+
+    def header(self):
+        return {
+            "schema_version": self.schema_version,
+            "reference_dimensions": list(self.reference_dimensions) if self.reference_dimensions else None,
+            "sections": self.sections,
+            "num_spaces": len(self.body),
+            "columns": list(COLUMNS),
+            "dtype": BODY_DTYPE.str,
+        }
+
+
+def write_layout(path, layout):
+    """Write a layout file atomically"""
+    header = json.dumps(layout.header()).encode("utf-8")
+    header_end = _HEADER_PREFIX.size + len(header)
+    padding = (-header_end) % BODY_ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\0" * padding)
+        f.write(np.ascontiguousarray(layout.body, dtype=BODY_DTYPE).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_layout(path, mmap=True):
+    """
+    Read a layout file
+
+    Args:
+        path: Layout file path
+        mmap: Map the body read-only instead of reading it into memory
+
+    Returns:
+        ParkingLayout
+    """
+    with open(path, "rb") as f:
+        magic, header_length = _HEADER_PREFIX.unpack(f.read(_HEADER_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a parking layout file")
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    version = header.get("schema_version")
+    if version is None or version > SCHEMA_VERSION:
+        raise ValueError(f"Unsupported layout schema version {version} in {path}")
+
+    header_end = _HEADER_PREFIX.size + header_length
+    offset = header_end + (-header_end) % BODY_ALIGNMENT
+    shape = (header["num_spaces"], len(header["columns"]))
+
+    if shape[0] == 0:
+        body = np.zeros((0, len(COLUMNS)), dtype=BODY_DTYPE)
+    elif mmap:
+        body = np.memmap(path, dtype=BODY_DTYPE, mode="r", offset=offset, shape=shape)
+    else:
+        body = np.fromfile(path, dtype=BODY_DTYPE, count=shape[0] * shape[1], offset=offset).reshape(shape)
+
+    return ParkingLayout(body, header.get("reference_dimensions"), header.get("sections"), version)
+
+
+class _PositionsUnpickler(pickle.Unpickler):
+    """Unpickler that only accepts plain containers of numbers"""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a position file")
+
+
+def import_pickle_positions(pickle_path, reference_dimensions=None, thresholds=None):
+    """
+    Convert a legacy pickled position list to a layout
+
+    Only lists/tuples of numbers are accepted; any pickled object
+    reference is rejected instead of being executed.
+    """
+    with open(pickle_path, "rb") as f:
+        positions = _PositionsUnpickler(io.BytesIO(f.read())).load()
+
+    return ParkingLayout.from_positions(list(positions), reference_dimensions, thresholds)
@@ -1,6 +1,11 @@
 import os
-import pickle
+import json
 from datetime import datetime
+from utils.image_processor import PreprocessParams
+from utils.parking_layout import (LAYOUT_EXTENSION, ParkingLayout, import_pickle_positions, read_layout,
+                                  write_layout)
+
+PREPROCESS_PARAMS_FILE = "preprocess_params.json"
 
 
 def ensure_directories_exist(directories):
@@ -10,32 +15,71 @@ def ensure_directories_exist(directories):
             os.makedirs(directory)
 
 
-def load_parking_positions(config_dir, reference_image):
-    """Load parking positions from file"""
+def layout_file_path(config_dir, reference_image):
+    """Path of the layout file for a reference image"""
+    return os.path.join(config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}{LAYOUT_EXTENSION}')
+
+
+def legacy_positions_path(config_dir, reference_image):
+    """Path of the old pickled position list for a reference image"""
+    return os.path.join(config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}')
+
+
+def load_parking_layout(config_dir, reference_image, reference_dimensions=None, persist=True):
+    """
+    Load the parking layout for a reference image
+
+    Layout files are memory-mapped. A legacy pickled position file is
+    imported once and written out as a layout file next to it, unless
+    persist is False (read-only callers such as the benchmarks).
+
+    Returns:
+        ParkingLayout, or None if no positions were saved for this image
+    """
     try:
-        pos_file = os.path.join(config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}')
+        layout_file = layout_file_path(config_dir, reference_image)
+        if os.path.exists(layout_file):
+            return read_layout(layout_file)
+
+        pos_file = legacy_positions_path(config_dir, reference_image)
+        if not os.path.exists(pos_file):
+            return None
 
-        if os.path.exists(pos_file):
-            with open(pos_file, 'rb') as f:
-                return pickle.load(f)
-        else:
-            return []
+        layout = import_pickle_positions(pos_file, reference_dimensions)
+        if persist:
+            write_layout(layout_file, layout)
+            print(f"Imported {len(layout)} parking positions from {pos_file}")
+        return layout
 
     except Exception as e:
-        print(f"Error loading parking positions: {str(e)}")
-        return []
+        print(f"Error loading parking layout: {str(e)}")
+        return None
 
 
-def save_parking_positions(pos_list, config_dir, reference_image):
-    """Save parking positions to file"""
+def save_parking_layout(layout, config_dir, reference_image):
+    """Save a parking layout"""
     try:
-        pos_file = os.path.join(config_dir, f'CarParkPos_{os.path.splitext(reference_image)[0]}')
-        with open(pos_file, 'wb') as f:
-            pickle.dump(pos_list, f)
+        write_layout(layout_file_path(config_dir, reference_image), layout)
         return True
+    except Exception as e:
+        print(f"Error saving parking layout: {str(e)}")
+        return False
+
+
+def load_parking_positions(config_dir, reference_image):
+    """Load parking positions from file"""
+    layout = load_parking_layout(config_dir, reference_image)
+    return layout.to_pos_list() if layout is not None else []
+
+
+def save_parking_positions(pos_list, config_dir, reference_image, reference_dimensions=None, thresholds=None):
+    """Save parking positions to file"""
+    try:
+        layout = ParkingLayout.from_positions(pos_list, reference_dimensions, thresholds)
     except Exception as e:
         print(f"Error saving parking positions: {str(e)}")
         return False
+    return save_parking_layout(layout, config_dir, reference_image)
 
 
 def save_log(log_data, log_dir):
@@ -69,4 +113,28 @@ def export_statistics(stats_data, log_dir):
         return filename
     except Exception as e:
         print(f"Error exporting statistics: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+def load_preprocess_params(config_dir):
+    """Preprocessing settings saved by a parameter sweep, or the defaults"""
+    params_file = os.path.join(config_dir, PREPROCESS_PARAMS_FILE)
+    if not os.path.exists(params_file):
+        return PreprocessParams()
+    try:
+        with open(params_file, 'r') as f:
+            return PreprocessParams.from_dict(json.load(f))
+    except Exception as e:
+        print(f"Error loading preprocessing settings: {str(e)}")
+        return PreprocessParams()
+
+
+def save_preprocess_params(params, config_dir):
+    """Save preprocessing settings for the detection tab"""
+    try:
+        with open(os.path.join(config_dir, PREPROCESS_PARAMS_FILE), 'w') as f:
+            json.dump(params.as_dict(), f, indent=2)
+        return True
+    except Exception as e:
+        print(f"Error saving preprocessing settings: {str(e)}")
+        return False
\ No newline at end of file
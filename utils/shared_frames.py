@@ -0,0 +1,386 @@
+"""
+Frames shared between processes without pickling
+
+A SharedArray is a NumPy array backed by a named shared memory block.
+The creating process owns the block and unlinks it when done; other
+processes attach by name and see the same pixels, zero-copy:
+
+    frames = SharedArray.create((count, height, width, 3))
+    frames.array[i] = frame
+    pool = ProcessPoolExecutor(initializer=attach, initargs=(frames.spec(),))
+    ...
+    frames.unlink()
+
+A FrameRing streams frames from one writer (e.g. a capture process) to a
+fixed set of readers (occupancy, detection, recording ...):
+
+    ring = FrameRing.create((720, 1280, 3), slots=8, readers=2)
+    # capture process
+    seq, slot = ring.acquire()
+    ok, _ = cap.read(slot)           # decode straight into the ring
+    ring.commit()
+    # consumer process, reader 0
+    reader = FrameRing.attach(spec).reader(0)
+    with reader.read() as frame:
+        detect(frame.array)          # view into the slot, no copy
+
+Every frame gets a sequence number. Each slot records the sequence of
+the frame it holds, and each reader has a cursor in shared memory (the
+next sequence it wants). A writer that may overwrite (the default, for
+live cameras) never waits: readers that fall more than a ring behind
+skip ahead and count the skipped frames as dropped. A writer created
+with overwrite=False waits until every attached reader has released a
+slot before reusing it, for consumers such as recorders that must see
+every frame. Waiting is done by polling; there are no cross-process
+locks, so a crashed reader can at worst stall a non-overwriting writer
+until detach() or its timeout.
+
+Before Python 3.13, attaching temporarily replaces the module-global
+resource_tracker.register. A block created on another thread during
+that window would never be registered (and so never cleaned up after a
+crash), so attaching and creating blocks share a lock. Blocks created
+with shared_memory directly, outside this module, are not covered.
+"""
+
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Held while resource_tracker.register is swapped out, and while blocks are created
+_tracker_lock = threading.Lock()
+
+
+def _open_block(name):
+    """Attach to an existing block without making this process responsible for unlinking it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    # Before 3.13 attaching registers the block with the resource tracker, which would
+    # unlink it when this process exits (or, in a child sharing the parent's tracker,
+    # drop the parent's registration); skip that registration
+    with _tracker_lock:
+        # Read under the lock so a concurrent attach's replacement is never kept
+        register = resource_tracker.register
+
+        def register_except_shared_memory(name, rtype):
+            if rtype != "shared_memory":
+                register(name, rtype)
+
+        resource_tracker.register = register_except_shared_memory
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _create_block(size, name=None):
+    """New block registered with the resource tracker, never while an attach has it patched"""
+    with _tracker_lock:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+class SharedArray:
+    """NumPy array in a named shared memory block"""
+
+    def __init__(self, block, shape, dtype, owner):
+        self.block = block
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf)
+
+    @classmethod
+    def create(cls, shape, dtype=np.uint8, name=None):
+        """New zero-filled block owned by this process"""
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        block = _create_block(size, name)
+        shared = cls(block, shape, dtype, owner=True)
+        shared.array.fill(0)
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to a block created elsewhere, from its spec()"""
+        name, shape, dtype = spec
+        return cls(_open_block(name), shape, dtype, owner=False)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def spec(self):
+        """Picklable (name, shape, dtype) for attaching from another process"""
+        return self.block.name, self.shape, self.dtype.str
+
+    def close(self):
+        """Detach this process; views of the array must not be used afterwards"""
+        self.array = None
+        self.block.close()
+
+    def unlink(self):
+        """Close and, if this process created the block, free it"""
+        self.close()
+        if self.owner:
+            self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+
+
+# Control block layout (int64 words) at the start of a FrameRing's shared memory
+_WRITE_SEQ = 0  # Sequence number the next frame will get
+_CLOSED = 1
+_HEADER_WORDS = 2
+_DATA_ALIGNMENT = 64
+_FREE = -1  # Reader cursor not attached / slot being written or empty
+
+POLL_INTERVAL = 0.0005  # Seconds between checks while waiting
+
+
+class RingFrame:
+    """One frame read from a FrameRing; release it (or use with) when done"""
+
+    def __init__(self, reader, seq, slot, timestamp):
+        self.reader = reader
+        self.seq = seq
+        self.slot = slot
+        self.timestamp = timestamp
+        self.array = reader.ring.slots[slot]
+
+    def valid(self):
+        """False if an overwriting writer has reused the slot since the frame was read"""
+        return int(self.reader.ring.slot_seq[self.slot]) == self.seq
+
+    def copy(self):
+        return self.array.copy()
+
+    def release(self):
+        self.reader.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameReader:
+    """A reader's cursor into a FrameRing"""
+
+    def __init__(self, ring, index, start="latest"):
+        if not 0 <= index < ring.num_readers:
+            raise ValueError(f"Reader index must be 0..{ring.num_readers - 1}, got {index}")
+        self.ring = ring
+        self.index = index
+        self.dropped = 0
+        # New readers start with the next frame ("latest") or the oldest one still held ("oldest")
+        write_seq = int(ring.control[_WRITE_SEQ])
+        ring.cursors[index] = write_seq if start == "latest" else max(0, write_seq - ring.num_slots)
+
+    @property
+    def cursor(self):
+        return int(self.ring.cursors[self.index])
+
+    @property
+    def behind(self):
+        """Frames published but not read yet"""
+        return int(self.ring.control[_WRITE_SEQ]) - self.cursor
+
+    def read(self, timeout=None, latest=False):
+        """
+        Next frame for this reader
+
+        Args:
+            timeout: Seconds to wait for a frame (None = wait until the ring is closed)
+            latest: Skip straight to the newest frame; skipped frames count as dropped
+
+        Returns:
+            RingFrame viewing the slot, or None on timeout or when the ring is closed and drained
+        """
+        ring = self.ring
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            write_seq = int(ring.control[_WRITE_SEQ])
+            cursor = self.cursor
+            oldest = write_seq - ring.num_slots
+            if latest and write_seq - 1 > cursor:
+                oldest = write_seq - 1
+            if cursor < oldest:
+                self.dropped += oldest - cursor
+                cursor = oldest
+                ring.cursors[self.index] = cursor
+
+            if cursor < write_seq:
+                slot = cursor % ring.num_slots
+                if int(ring.slot_seq[slot]) == cursor:
+                    timestamp = float(ring.slot_time[slot])
+                    if int(ring.slot_seq[slot]) == cursor:  # Not reused while reading the timestamp
+                        return RingFrame(self, cursor, slot, timestamp)
+                continue  # Overwritten between the checks; catch up
+
+            if ring.control[_CLOSED]:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def release(self, frame):
+        """Let the writer reuse the frame's slot"""
+        if self.cursor <= frame.seq:
+            self.ring.cursors[self.index] = frame.seq + 1
+
+    def detach(self):
+        """Stop holding back a non-overwriting writer"""
+        self.ring.cursors[self.index] = _FREE
+
+
+class FrameRing:
+    """Shared memory ring buffer of fixed-size frames with one writer and several readers"""
+
+    def __init__(self, block, shape, dtype, num_slots, num_readers, overwrite, owner):
+        self.block = block
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.num_slots = num_slots
+        self.num_readers = num_readers
+        self.overwrite = overwrite
+        self.owner = owner
+
+        control_words = _HEADER_WORDS + 2 * num_slots + num_readers
+        self.control = np.ndarray((control_words,), dtype=np.int64, buffer=block.buf)
+        self.slot_seq = self.control[_HEADER_WORDS:_HEADER_WORDS + num_slots]
+        self.slot_time = self.control[_HEADER_WORDS + num_slots:_HEADER_WORDS + 2 * num_slots].view(np.float64)
+        self.cursors = self.control[_HEADER_WORDS + 2 * num_slots:]
+        self.slots = np.ndarray((num_slots,) + self.shape, dtype=self.dtype, buffer=block.buf,
+                                offset=self._data_offset(num_slots, num_readers))
+        self._pending = None
+
+    @staticmethod
+    def _data_offset(num_slots, num_readers):
+        control_bytes = (_HEADER_WORDS + 2 * num_slots + num_readers) * 8
+        return -(-control_bytes // _DATA_ALIGNMENT) * _DATA_ALIGNMENT
+
+    @classmethod
+    def create(cls, shape, dtype=np.uint8, slots=8, readers=1, overwrite=True, name=None):
+        """
+        New ring owned by this process
+
+        Args:
+            shape: Shape of every frame, e.g. (height, width, 3)
+            slots: Frames held at once
+            readers: Number of reader cursors; readers attach by index
+            overwrite: Reuse the oldest slot without waiting for slow readers
+        """
+        if slots < 2:
+            raise ValueError("A frame ring needs at least 2 slots")
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        size = cls._data_offset(slots, readers) + slots * frame_bytes
+        block = _create_block(size, name)
+        ring = cls(block, shape, dtype, slots, readers, overwrite, owner=True)
+        ring.control[:] = 0
+        ring.slot_seq[:] = _FREE
+        ring.cursors[:] = _FREE
+        return ring
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to a ring created elsewhere, from its spec()"""
+        name, shape, dtype, num_slots, num_readers, overwrite = spec
+        return cls(_open_block(name), shape, dtype, num_slots, num_readers, overwrite, owner=False)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def spec(self):
+        """Picklable description for attaching from another process"""
+        return self.block.name, self.shape, self.dtype.str, self.num_slots, self.num_readers, self.overwrite
+
+    @property
+    def published(self):
+        """Number of frames committed so far"""
+        return int(self.control[_WRITE_SEQ])
+
+    @property
+    def closed(self):
+        return bool(self.control[_CLOSED])
+
+    def reader(self, index, start="latest"):
+        """Attach reader number index; its cursor lives in shared memory"""
+        return FrameReader(self, index, start)
+
+    def acquire(self, timeout=None):
+        """
+        Slot for the next frame, to be filled in place and then commit()ed
+
+        Args:
+            timeout: Seconds a non-overwriting writer waits for readers (None = forever)
+
+        Returns:
+            (sequence number, writable view of the slot), or None on timeout
+        """
+        seq = int(self.control[_WRITE_SEQ])
+        slot = seq % self.num_slots
+        if not self.overwrite:
+            # Every attached reader must have moved past the frame this slot holds
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                attached = self.cursors[self.cursors != _FREE]
+                if not len(attached) or int(attached.min()) > seq - self.num_slots:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                time.sleep(POLL_INTERVAL)
+
+        self.slot_seq[slot] = _FREE  # Readers skip the slot while it is being written
+        self._pending = (seq, slot)
+        return seq, self.slots[slot]
+
+    def commit(self, timestamp=None):
+        """Publish the frame written into the acquired slot"""
+        seq, slot = self._pending
+        self._pending = None
+        self.slot_time[slot] = time.time() if timestamp is None else timestamp
+        self.slot_seq[slot] = seq
+        self.control[_WRITE_SEQ] = seq + 1
+        return seq
+
+    def publish(self, frame, timestamp=None, timeout=None):
+        """
+        Copy a frame into the ring
+
+        Returns:
+            Its sequence number, or None if a non-overwriting writer timed out
+        """
+        acquired = self.acquire(timeout)
+        if acquired is None:
+            return None
+        acquired[1][...] = frame
+        return self.commit(timestamp)
+
+    def close_stream(self):
+        """Tell readers no more frames are coming"""
+        self.control[_CLOSED] = 1
+
+    def close(self):
+        """Detach this process; frame views must not be used afterwards"""
+        self.control = self.slot_seq = self.slot_time = self.cursors = self.slots = None
+        self.block.close()
+
+    def unlink(self):
+        """Close and, if this process created the ring, free it"""
+        self.close()
+        if self.owner:
+            self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
@@ -8,6 +8,9 @@ import os
 import numpy as np
 from pathlib import Path
 
+from models.detector_backends import COCO_CLASSES, VEHICLE_CLASSES, load_backend, resolve_device
+from utils.detection_postprocess import to_list
+
 
 def download_models():
     """
@@ -48,104 +51,75 @@ def download_models():
     return yolo_model_path, deepsort_model_path
 
 
-import cv2
-import numpy as np
+class YOLODeepSORTWrapper:
+    """Detection backend and DeepSORT tracker behind one callable"""
+
+    def __init__(self, backend, deepsort_tracker, confidence_threshold):
+        self.backend = backend
+        self.model = backend.model
+        self.tracker = deepsort_tracker
+        self.confidence_threshold = confidence_threshold
+        self.classes = COCO_CLASSES
+        self.vehicle_classes = list(VEHICLE_CLASSES)
+        self.count = 0
+
+    def detect_vehicles(self, frame):
+        """Vehicle detections as a structured array (see utils.detection_postprocess)"""
+        return self.backend.detect(frame, self.confidence_threshold)
+
+    def __call__(self, frame):
+        """Process frame with the detector and DeepSORT"""
+        detections = self.detect_vehicles(frame).copy()
+
+        # DeepSORT takes left, top, width, height
+        detections['box'][:, 2:] -= detections['box'][:, :2]
+        detections = to_list(detections)
+        boxes = [box for box, _, _ in detections]
+        confidence_scores = [confidence for _, confidence, _ in detections]
+        class_ids = [class_id for _, _, class_id in detections]
+
+        # Update tracker
+        tracks = self.tracker.update_tracks(detections, frame=frame)
+
+        return tracks, boxes, confidence_scores, class_ids
+
+    def reset_count(self):
+        """Reset vehicle counter"""
+        self.count = 0
+
+    def set_confidence_threshold(self, threshold):
+        """Update the confidence threshold"""
+        self.confidence_threshold = threshold
+        print(f"Updated confidence threshold to {threshold}")
 
 
 def initialize_tracker(confidence_threshold=0.5, use_cuda=False):
-    """Initialize the DeepSORT tracker with YOLO detector"""
+    """Initialize the DeepSORT tracker with a YOLO detector, or the best available backend"""
     try:
-        # Try to import YOLOv8 with Ultralytics
         try:
-            from ultralytics import YOLO
-
-            # Load YOLO model
-            model = YOLO('yolov8n.pt')
-            print("YOLO model loaded successfully")
-
-            # Import DeepSORT
-            try:
-                from deep_sort_realtime.deepsort_tracker import DeepSort
-
-                # Create tracker instance - removing the use_cuda parameter
-                tracker = DeepSort(
-                    max_age=30,
-                    n_init=2,
-                    nms_max_overlap=0.5,
-                    max_cosine_distance=0.3,
-                    nn_budget=100
-                )
-
-                print("DeepSORT tracker initialized")
-
-                # Create a wrapper object that contains both detector and tracker
-                class YOLODeepSORTWrapper:
-                    def __init__(self, yolo_model, deepsort_tracker, confidence_threshold):
-                        self.model = yolo_model
-                        self.tracker = deepsort_tracker
-                        self.confidence_threshold = confidence_threshold
-                        self.classes = {
-                            0: 'person', 1: 'bicycle', 2: 'car', 3: 'motorcycle',
-                            4: 'airplane', 5: 'bus', 6: 'train', 7: 'truck', 8: 'boat'
-                        }
-                        self.vehicle_classes = [2, 5, 7]  # car, bus, truck
-                        self.count = 0
-
-                    def __call__(self, frame):
-                        """Process frame with YOLO and DeepSORT"""
-                        # Run YOLO detection
-                        results = self.model(frame, verbose=False)
-
-                        # Extract detections for DeepSORT
-                        detections = []
-                        boxes = []
-                        confidence_scores = []
-                        class_ids = []
-
-                        for result in results:
-                            if hasattr(result, 'boxes') and len(result.boxes) > 0:
-                                for box in result.boxes:
-                                    # Get coordinates, confidence and class
-                                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                    confidence = float(box.conf)
-                                    class_id = int(box.cls)
-
-                                    # Filter out non-vehicles and low confidence
-                                    if confidence >= self.confidence_threshold and class_id in self.vehicle_classes:
-                                        boxes.append([int(x1), int(y1), int(x2) - int(x1), int(y2) - int(y1)])
-                                        confidence_scores.append(confidence)
-                                        class_ids.append(class_id)
-
-                                        # Add to detections list for DeepSORT
-                                        detections.append(([int(x1), int(y1), int(x2) - int(x1), int(y2) - int(y1)],
-                                                           confidence,
-                                                           class_id))
-
-                        # Update tracker
-                        tracks = self.tracker.update_tracks(detections, frame=frame)
-
-                        return tracks, boxes, confidence_scores, class_ids
-
-                    def reset_count(self):
-                        """Reset vehicle counter"""
-                        self.count = 0
-
-                    def set_confidence_threshold(self, threshold):
-                        """Update the confidence threshold"""
-                        self.confidence_threshold = threshold
-                        print(f"Updated confidence threshold to {threshold}")
-
-                # Create and return the wrapper
-                return YOLODeepSORTWrapper(model, tracker, confidence_threshold)
-
-            except ImportError as e:
-                print(f"Could not import DeepSORT: {e}")
-                return None
-
+            from deep_sort_realtime.deepsort_tracker import DeepSort
         except ImportError as e:
-            print(f"Could not import YOLO: {e}")
+            print(f"Could not import DeepSORT: {e}")
+            return None
+
+        backend = load_backend(prefer="yolov8", device=resolve_device(use_cuda))
+        if backend is None:
             return None
 
+        # Create tracker instance - removing the use_cuda parameter
+        tracker = DeepSort(
+            max_age=30,
+            n_init=2,
+            nms_max_overlap=0.5,
+            max_cosine_distance=0.3,
+            nn_budget=100
+        )
+
+        print("DeepSORT tracker initialized")
+
+        # Create and return the wrapper
+        return YOLODeepSORTWrapper(backend, tracker, confidence_threshold)
+
     except Exception as e:
         print(f"Error initializing tracker: {e}")
         return None
@@ -83,4 +83,44 @@ def check_camera_available(camera_index=0):
         cap.release()
         return available
     except:
-        return False
\ No newline at end of file
+        return False
+
+
+def capture_into_ring(cap, ring, max_frames=0, stop_event=None, timeout=None):
+    """
+    Decode frames from a capture straight into a FrameRing
+
+    Frames whose size differs from the ring's frame shape are resized.
+    Readers are told the stream ended when the capture runs out.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        ring: utils.shared_frames.FrameRing sized for the capture's frames
+        max_frames: Stop after this many frames (0 = until the capture ends)
+        stop_event: Optional threading/multiprocessing Event that stops the loop
+        timeout: Seconds to wait for slow readers of a non-overwriting ring before giving up
+
+    Returns:
+        Number of frames published
+    """
+    published = 0
+    height, width = ring.shape[:2]
+    try:
+        while not max_frames or published < max_frames:
+            if stop_event is not None and stop_event.is_set():
+                break
+            acquired = ring.acquire(timeout)
+            if acquired is None:
+                break
+            _, slot = acquired
+            # read() decodes into slot when the shape matches, avoiding a copy
+            ret, frame = cap.read(slot)
+            if not ret:
+                break
+            if frame is not slot:
+                slot[...] = frame if frame.shape == slot.shape else cv2.resize(frame, (width, height))
+            ring.commit()
+            published += 1
+    finally:
+        ring.close_stream()
+    return published
\ No newline at end of file